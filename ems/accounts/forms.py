@@ -0,0 +1,31 @@
+import unicodedata
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.forms import PasswordResetForm
+
+from employee.passwords import awaits_first_password
+
+USER_MODEL = get_user_model()
+
+
+def same_email(first, second):
+    # Unicode-safe case-insensitive comparison, as Django's reset form does
+    return unicodedata.normalize('NFKC', first).casefold() == unicodedata.normalize('NFKC', second).casefold()
+
+
+'''
+Password reset form that also reaches users imported without a password
+(see employee/passwords.py), so they can set their first one. Django leaves
+out every user without a usable password; other accounts disabled with
+`set_unusable_password()` stay left out.
+'''
+class SetPasswordResetForm(PasswordResetForm):
+
+    def get_users(self, email):
+        email_field = USER_MODEL.get_email_field_name()
+        users = USER_MODEL._default_manager.filter(**{f'{email_field}__iexact': email, 'is_active': True})
+        return (
+            user for user in users
+            if (user.has_usable_password() or awaits_first_password(user))
+            and same_email(email, getattr(user, email_field))
+        )
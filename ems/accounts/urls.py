@@ -1,5 +1,6 @@
 from django.urls import path,include
 from . import views
+from .forms import SetPasswordResetForm
 from django.contrib.auth import views as auth_views
 
 urlpatterns = [
@@ -11,4 +12,18 @@ urlpatterns = [
     path('password_change/', auth_views.PasswordChangeView.as_view(
         template_name='accounts/password_change.html', success_url='/'
     ), name='password_change'),
+    # also how imported employees without a password set their first one
+    path('password_reset/', auth_views.PasswordResetView.as_view(
+        template_name='accounts/password_reset.html', form_class=SetPasswordResetForm,
+        email_template_name='accounts/password_reset_email.txt', subject_template_name='accounts/password_reset_subject.txt',
+    ), name='password_reset'),
+    path('password_reset/done/', auth_views.PasswordResetDoneView.as_view(
+        template_name='accounts/password_reset_done.html'
+    ), name='password_reset_done'),
+    path('reset/<uidb64>/<token>/', auth_views.PasswordResetConfirmView.as_view(
+        template_name='accounts/password_reset_confirm.html'
+    ), name='password_reset_confirm'),
+    path('reset/done/', auth_views.PasswordResetCompleteView.as_view(
+        template_name='accounts/password_reset_complete.html'
+    ), name='password_reset_complete'),
 ]
\ No newline at end of file
@@ -2,9 +2,26 @@
 
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from django.db.models import F
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from . import versions
+from .bulk import MAX_OPERATIONS, BulkEmployeeOperations
+from .changes import DEFAULT_LIMIT, MAX_LIMIT, InvalidCursor, change_feed
+from .conditional import ConditionalGetMixin, make_etag, representation_key
+from .exporter import CONTENT_TYPES, EXPORT_FORMATS, stream_export
+from .facets import employee_facets
+from .filters import filter_employees
+from .importer import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, EmployeeImporter, guess_format, read_rows
 from .models import DynamicFormFields, EmployeeData
+from .ordering import order_before
+from .pagination import EmployeeCursorPagination
+from .passwords import PASSWORD_MODES, PLAIN
+from .rollups import headcount_report, report_dimensions
+from .routers import ReplicaReadMixin, read_alias
+from .schema import get_schema, schema_change
+from .search import AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT, autocomplete_employees
 from .serializers import (
     DynamicFormFieldSerializer,
     EmployeeDataSerializer,
@@ -12,19 +29,30 @@ from .serializers import (
     EmployeeCreateSerializer,
 )
 
-class DynamicFormFieldViewSet(viewsets.ModelViewSet):
+class DynamicFormFieldViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = DynamicFormFields.objects.all().order_by('field_order')
     serializer_class = DynamicFormFieldSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    # every field write bumps the schema version
+    def list_validators(self, request):
+        token, updated_on = versions.stamp(versions.SCHEMA)
+        return make_etag('fields', token, representation_key(request)), updated_on
+
+    def detail_validators(self, request):
+        token, updated_on = versions.stamp(versions.SCHEMA)
+        return make_etag('field', self.kwargs.get('pk'), token, representation_key(request)), updated_on
+
     @action(detail=False, methods=['put'])
     def update_order(self, request):
         payload = request.data
         field = DynamicFormFields.objects.filter(id=payload.get('id')).first()
         if field:
-            DynamicFormFields.objects.filter(field_order__gte=int(payload["field_order"])).update(field_order = F('field_order')+1)
-            field.field_order = int(payload["field_order"])
-            field.save()
+            # single row write, neighbours keep their order values
+            with transaction.atomic(), schema_change():
+                field.field_order = order_before(int(payload["field_order"]), exclude_id=field.id)
+                field.save(update_fields=['field_order', 'updated_on'])
+            return Response({'detail': 'Order updated successfully', 'field_order': field.field_order})
         return Response({'detail': 'Order updated successfully'})
     
 
@@ -37,29 +65,154 @@ class DynamicFormFieldViewSet(viewsets.ModelViewSet):
         field_type = payload.get('field_type')
         field_order = int(payload.get('field_order',"0"))
         field_is_required = payload.get('field_is_required',False)
+        indexed = bool(payload.get('indexed',False))
         options = ''
         if field_type in ['select','radio']:
             options = payload.get('options')
             if isinstance(options,list):
                 options = ','.join(options)
-        DynamicFormFields.objects.filter(field_order__gte=field_order).update(field_order = F('field_order')+1)
-        DynamicFormFields.objects.create(
-            field_label = field_label,
-            field_type = field_type,
-            field_order = field_order,
-            field_is_required=field_is_required,
-            extra = {'options':options}
-        )
+        with transaction.atomic(), schema_change():
+            DynamicFormFields.objects.create(
+                field_label = field_label,
+                field_type = field_type,
+                field_order = order_before(field_order),
+                field_is_required=field_is_required,
+                indexed=indexed,
+                extra = {'options':options}
+            )
         return Response({'detail': 'Field added successfully'})
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = EmployeeData.objects.select_related('uid').all().order_by('-id')
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EmployeeCursorPagination
+    replica_actions = ('list', 'retrieve', 'autocomplete', 'facets', 'export')
+
+    # employee and user writes bump the employees version, field edits
+    # change how lists filter and sort
+    def list_validators(self, request):
+        token, updated_on = versions.stamps(versions.EMPLOYEES, versions.SCHEMA)
+        return make_etag('employees', token, representation_key(request)), updated_on
+
+    def detail_validators(self, request):
+        # user renames touch updated_on too (migration 0011)
+        pk = str(self.kwargs.get('pk'))
+        updated_on = None
+        if pk.isdigit():
+            updated_on = EmployeeData.objects.filter(pk=pk).values_list('updated_on', flat=True).first()
+        if updated_on is None:
+            return None, None
+        return make_etag('employee', pk, updated_on.isoformat(), representation_key(request)), updated_on
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = filter_employees(queryset, self.request.query_params)
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
-            return EmployeeCreateSerializer
+            return EmployeeCreateSerializer.for_schema()
         elif self.request.method in ['PUT', 'PATCH']:
             return EmployeeCreateUpdateSerializer
-        return EmployeeDataSerializer
\ No newline at end of file
+        return EmployeeDataSerializer
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        try:
+            limit = int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            return Response({'detail': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MAX_AUTOCOMPLETE_LIMIT))
+        return Response({'results': autocomplete_employees(request.query_params.get('q'), limit)})
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'detail': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MAX_LIMIT))
+        try:
+            feed = change_feed(request.query_params.get('since'), limit, EmployeeDataSerializer)
+        except InvalidCursor as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(feed)
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        return Response({'facets': employee_facets(request.query_params)})
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'detail': 'Expected a file upload'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or guess_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            return Response({'detail': f'Unsupported file format {file_format}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            batch_size = int(request.data.get('batch_size', DEFAULT_BATCH_SIZE))
+        except ValueError:
+            return Response({'detail': 'batch_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        password_mode = request.data.get('password_mode') or PLAIN
+        if password_mode not in PASSWORD_MODES:
+            return Response({'detail': f'Unsupported password mode {password_mode}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = EmployeeImporter(batch_size=batch_size, password_mode=password_mode)
+        result = importer.run(read_rows(upload, file_format))
+        return Response(result.as_dict())
+
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        file_format = request.query_params.get('export_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({'detail': f'Unsupported export format {file_format}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        schema = get_schema()
+        # rows are streamed after the request's routing state is gone
+        employees = filter_employees(EmployeeData.objects.using(read_alias()), request.query_params, schema)
+        response = StreamingHttpResponse(
+            stream_export(employees, file_format, schema),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="employees.{file_format}"'
+        return response
+
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        operations = request.data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return Response({'detail': 'Expected a list of operations'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > MAX_OPERATIONS:
+            return Response({'detail': f'At most {MAX_OPERATIONS} operations per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        atomic = request.data.get('atomic', True) not in (False, 'false', '0', 0)
+        result = BulkEmployeeOperations(operations, atomic=atomic).run()
+        response_status = status.HTTP_200_OK if result.applied else status.HTTP_400_BAD_REQUEST
+        return Response(result.as_dict(), status=response_status)
+
+
+class EmployeeReportViewSet(viewsets.ViewSet):
+    '''
+    Headcount reports read from the rollup table, one query per report
+    whatever the number of employees.
+    '''
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        reports = [
+            {'report': name, 'label': report['label']}
+            for name, report in report_dimensions().items()
+        ]
+        return Response({'reports': reports})
+
+    def retrieve(self, request, pk=None):
+        report = headcount_report(pk)
+        if report is None:
+            return Response({'detail': 'Unknown report'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(report)
@@ -0,0 +1,140 @@
+'''
+Async variants of the hot read endpoints of the API.
+
+Under ASGI a sync view holds a worker thread for its whole run; these views
+only await the database, so one worker process can serve many concurrent
+clients. They return the same payloads, ETags and status codes as their
+`api_views.py` counterparts and authenticate with the same DRF
+authentication classes, and are mounted under `api/async/`.
+'''
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import versions
+from .conditional import make_etag, not_modified, representation_key, set_validators
+from .facets import aemployee_facets
+from .filters import filter_employees
+from .models import DynamicFormFields, EmployeeData
+from .pagination import EmployeeCursorPagination
+from .routers import prefer_replica
+from .schema import aget_schema
+from .search import trigram_available
+from .serializers import DynamicFormFieldSerializer, EmployeeDataSerializer
+
+
+def render_json(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def error_response(exc):
+    response = render_json({'detail': exc.detail}, status=exc.status_code)
+    if getattr(exc, 'auth_header', None):
+        response['WWW-Authenticate'] = exc.auth_header
+    return response
+
+
+'''
+Base class of the async API views: DRF authentication, IsAuthenticated
+permission and JSON rendering. Views setting `replica` read the replica
+once the user is authenticated.
+'''
+class AsyncAPIView(View):
+    replica = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.request = request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+        )
+        try:
+            # authenticators look the user up with the sync ORM
+            user = await sync_to_async(lambda: request.user)()
+            if not (user and user.is_authenticated):
+                exc = exceptions.NotAuthenticated()
+                authenticators = request.authenticators
+                exc.auth_header = authenticators[0].authenticate_header(request) if authenticators else None
+                raise exc
+            if self.replica:
+                prefer_replica()
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+
+    def representation_key(self):
+        return representation_key(self.request, 'json')
+
+    async def filtered_employees(self, queryset, schema):
+        params = self.request.query_params
+        if params.get('q') and params.get('fuzzy'):
+            # checked once per process, with a query
+            await sync_to_async(trigram_available)(queryset.db)
+        return filter_employees(queryset, params, schema)
+
+
+class AsyncEmployeeListView(AsyncAPIView):
+    pagination_class = EmployeeCursorPagination
+    replica = True
+
+    async def get(self, request):
+        token, updated_on = await versions.astamps(versions.EMPLOYEES, versions.SCHEMA)
+        etag = make_etag('employees', token, self.representation_key())
+        response = not_modified(request, etag)
+        if response is None:
+            schema = await aget_schema()
+            employees = EmployeeData.objects.select_related('uid').order_by('-id')
+            employees = await self.filtered_employees(employees, schema)
+            paginator = self.pagination_class()
+            page = await paginator.apaginate_queryset(employees, request)
+            data = EmployeeDataSerializer(page, many=True).data
+            response = render_json(paginator.get_paginated_response(data).data)
+        return set_validators(response, etag, updated_on)
+
+
+class AsyncEmployeeDetailView(AsyncAPIView):
+    replica = True
+
+    async def get(self, request, pk):
+        # one query serves both the validators and the body
+        employee = await EmployeeData.objects.select_related('uid').filter(pk=pk).afirst()
+        if employee is None:
+            raise exceptions.NotFound('No EmployeeData matches the given query.')
+        updated_on = employee.updated_on
+        etag = make_etag('employee', pk, updated_on.isoformat(), self.representation_key())
+        response = not_modified(request, etag)
+        if response is None:
+            response = render_json(EmployeeDataSerializer(employee).data)
+        return set_validators(response, etag, updated_on)
+
+
+class AsyncEmployeeFacetsView(AsyncAPIView):
+    replica = True
+
+    async def get(self, request):
+        schema = await aget_schema()
+        return render_json({'facets': await aemployee_facets(request.query_params, schema)})
+
+
+class AsyncFieldListView(AsyncAPIView):
+    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+
+    async def get(self, request):
+        token, updated_on = await versions.astamp(versions.SCHEMA)
+        etag = make_etag('fields', token, self.representation_key())
+        response = not_modified(request, etag)
+        if response is None:
+            # a handful of rows, paginated in memory
+            fields = [field async for field in DynamicFormFields.objects.order_by('field_order').aiterator()]
+            paginator = self.pagination_class() if self.pagination_class else None
+            page = paginator.paginate_queryset(fields, request, self) if paginator else None
+            if page is None:
+                response = render_json(DynamicFormFieldSerializer(fields, many=True).data)
+            else:
+                data = DynamicFormFieldSerializer(page, many=True).data
+                response = render_json(paginator.get_paginated_response(data).data)
+        return set_validators(response, etag, updated_on)
@@ -0,0 +1,186 @@
+'''
+In-process load generator for the HTTP endpoints.
+
+Requests are sent straight to the project's ASGI application (`run_load`)
+or to its WSGI application from a pool of threads, like a threaded WSGI
+server (`run_wsgi_load`). The numbers include Django's request handling,
+middleware and the database but no network or server overhead.
+`client_delay` makes every ASGI client wait that long before reading each
+response chunk, like a client on a slow network. `time_calls` times any
+request, writes included, one after the other.
+'''
+
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def _scope(url, headers):
+    parts = urlsplit(url)
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': parts.path,
+        'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')] + [
+            (name.lower().encode(), value.encode()) for name, value in headers.items()
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+
+
+async def timed_request(app, url, headers=None, client_delay=0):
+    '''
+    Send one GET to `app`, returning `(status, seconds)`.
+    '''
+    status = None
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # the client stays connected until the response is complete
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body' and client_delay:
+            await asyncio.sleep(client_delay)
+
+    started = time.perf_counter()
+    await app(_scope(url, headers or {}), receive, send)
+    return status, time.perf_counter() - started
+
+
+def timed_wsgi_request(app, url, headers=None):
+    '''
+    Send one GET to the WSGI `app`, returning `(status, seconds)`.
+    '''
+    parts = urlsplit(url)
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    status = None
+
+    def start_response(status_line, response_headers, exc_info=None):
+        nonlocal status
+        status = int(status_line.split()[0])
+
+    started = time.perf_counter()
+    body = app(environ, start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return status, time.perf_counter() - started
+
+
+def _percentile(latencies, fraction):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def _summary(url, requests, concurrency, elapsed, latencies, errors, **extra):
+    latencies.sort()
+    return {
+        'url': url,
+        'requests': requests,
+        'concurrency': concurrency,
+        **extra,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(requests / elapsed, 1),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def run_load(app, url, requests=200, concurrency=20, headers=None, client_delay=0):
+    '''
+    Send `requests` GETs to `url` from `concurrency` concurrent clients.
+    Returns a dict of throughput and latency figures (milliseconds).
+    '''
+    pending = iter(range(requests))
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        for _ in pending:
+            status, seconds = await timed_request(app, url, headers, client_delay)
+            latencies.append(seconds)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return _summary(url, requests, concurrency, elapsed, latencies, errors, client_delay_ms=client_delay * 1000)
+
+
+def run_wsgi_load(app, url, requests=200, concurrency=20, headers=None):
+    '''
+    `run_load` for a WSGI application, `concurrency` threads each serving
+    requests one after the other and keeping their database connection.
+    '''
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(lambda _: timed_wsgi_request(app, url, headers), range(requests)))
+    elapsed = time.perf_counter() - started
+    errors = sum(1 for status, _ in results if status != 200)
+    return _summary(url, requests, concurrency, elapsed, [seconds for _, seconds in results], errors)
+
+
+def time_calls(call, repeat=5, warmup=1, label=''):
+    '''
+    Time `repeat` sequential `call(iteration)`s returning a response (eg.
+    through `django.test.Client`), after `warmup` untimed ones. Streamed
+    bodies are read to the end. Responses other than 2xx count as errors.
+    '''
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for iteration in range(-warmup, repeat):
+        call_started = time.perf_counter()
+        response = call(iteration)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        seconds = time.perf_counter() - call_started
+        if iteration < 0:
+            started = time.perf_counter()
+            continue
+        latencies.append(seconds)
+        if not 200 <= response.status_code < 300:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    return _summary(label, repeat, 1, elapsed, latencies, errors)
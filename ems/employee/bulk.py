@@ -0,0 +1,225 @@
+'''
+Batch create/update/delete of employees for the `bulk` API action.
+
+All operations are validated against one schema snapshot, then applied with
+one `bulk_create` per table, one `bulk_update` per table and a single
+`User` delete query (employee rows follow through the cascade).
+'''
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import versions
+from .models import EmployeeData
+from .schema import get_schema
+from .serializers import EmployeeCreateSerializer
+from .services import bulk_create_employees
+from .values import sync_field_values
+
+USER_MODEL = get_user_model()
+
+MAX_OPERATIONS = 1000
+
+OPERATIONS = ('create', 'update', 'delete')
+
+USER_UPDATE_FIELDS = ('first_name', 'last_name', 'email')
+
+# fields of the create serializer that cannot be changed by an update
+READ_ONLY_UPDATE_FIELDS = ('username', 'password')
+
+
+class BulkResult:
+
+    def __init__(self, count):
+        self.items = [None] * count
+        self.applied = False
+
+    @property
+    def has_errors(self):
+        return any(item and item['status'] == 'error' for item in self.items)
+
+    def ok(self, index, op, status, pk):
+        self.items[index] = {'index': index, 'op': op, 'status': status, 'id': pk}
+
+    def error(self, index, op, errors):
+        self.items[index] = {'index': index, 'op': op, 'status': 'error', 'errors': errors}
+
+    def as_dict(self):
+        return {'applied': self.applied, 'results': self.items}
+
+
+class BulkEmployeeOperations:
+    '''
+    With `atomic` any invalid operation rejects the whole batch, otherwise
+    the valid operations are applied and the invalid ones reported.
+    '''
+
+    def __init__(self, operations, atomic=True):
+        self.operations = operations
+        self.atomic = atomic
+        self.result = BulkResult(len(operations))
+
+    def run(self):
+        schema = get_schema()
+        self.serializer_class = EmployeeCreateSerializer.for_schema(schema)
+        self.labels = {field['name']: field['field_label'] for field in schema}
+
+        creates, updates, deletes = self._validate()
+        pending = (
+            [(index, 'create') for index, _ in creates]
+            + [(index, 'update') for index, _ in updates]
+            + [(index, 'delete') for index, _ in deletes]
+        )
+        if self.atomic and self.result.has_errors:
+            for index, op in pending:
+                self.result.error(index, op, {'non_field_errors': ["Not applied, the batch has errors."]})
+            return self.result
+
+        try:
+            # deletes cascade with signals, one version bump for the batch
+            with transaction.atomic(), versions.bump_once(versions.EMPLOYEES):
+                self._apply(creates, updates, deletes)
+        except DatabaseError as exc:
+            for index, op in pending:
+                self.result.error(index, op, {'non_field_errors': [f"Not applied: {exc}"]})
+            return self.result
+
+        self.result.applied = True
+        return self.result
+
+    def _validate(self):
+        creates, updates, deletes = [], [], []
+        targets = self._load_targets()
+        targeted = {}
+        usernames = set()
+
+        for index, operation in enumerate(self.operations):
+            op = operation.get('op') if isinstance(operation, dict) else None
+            if op not in OPERATIONS:
+                self.result.error(index, op, {'op': [f"Expected one of {', '.join(OPERATIONS)}."]})
+                continue
+
+            if op == 'create':
+                serializer = self.serializer_class(data=operation.get('data') or {})
+                if not serializer.is_valid():
+                    self.result.error(index, op, serializer.errors)
+                    continue
+                username = serializer.validated_data['username']
+                if username in usernames:
+                    self.result.error(index, op, {'username': ["Duplicated in this batch."]})
+                    continue
+                usernames.add(username)
+                creates.append((index, serializer))
+                continue
+
+            employee, errors = self._resolve(operation, targets)
+            if errors:
+                self.result.error(index, op, errors)
+                continue
+            if employee.pk in targeted:
+                self.result.error(index, op, {'id': [f"Already targeted by operation {targeted[employee.pk]}."]})
+                continue
+            targeted[employee.pk] = index
+
+            if op == 'delete':
+                deletes.append((index, employee))
+                continue
+
+            data = operation.get('data') or {}
+            read_only = [name for name in READ_ONLY_UPDATE_FIELDS if name in data]
+            if read_only:
+                self.result.error(index, op, {name: ["Cannot be changed by an update."] for name in read_only})
+                continue
+            serializer = self.serializer_class(data=data, partial=True)
+            if not serializer.is_valid():
+                self.result.error(index, op, serializer.errors)
+                continue
+            updates.append((index, (employee, serializer)))
+
+        taken = set(USER_MODEL.objects.filter(username__in=usernames).values_list('username', flat=True))
+        for index, serializer in list(creates):
+            if serializer.validated_data['username'] in taken:
+                self.result.error(index, 'create', {'username': ["A user with that username already exists."]})
+                creates.remove((index, serializer))
+        return creates, updates, deletes
+
+    def _load_targets(self):
+        ids, employee_ids = set(), set()
+        for operation in self.operations:
+            if isinstance(operation, dict) and operation.get('op') in ('update', 'delete'):
+                if operation.get('id') is not None:
+                    ids.add(str(operation['id']))
+                elif operation.get('employee_id'):
+                    employee_ids.add(str(operation['employee_id']))
+
+        valid_ids = [int(pk) for pk in ids if pk.isdigit()]
+        if not valid_ids and not employee_ids:
+            return {'id': {}, 'employee_id': {}}
+
+        by_id, by_employee_id = {}, {}
+        employees = EmployeeData.objects.select_related('uid').filter(
+            Q(id__in=valid_ids) | Q(employee_id__in=employee_ids)
+        )
+        for employee in employees:
+            by_id[str(employee.pk)] = employee
+            by_employee_id.setdefault(employee.employee_id, []).append(employee)
+        return {'id': by_id, 'employee_id': by_employee_id}
+
+    def _resolve(self, operation, targets):
+        if operation.get('id') is not None:
+            employee = targets['id'].get(str(operation['id']))
+            if employee is None:
+                return None, {'id': ["Employee not found."]}
+            return employee, None
+
+        if operation.get('employee_id'):
+            matches = targets['employee_id'].get(str(operation['employee_id']), [])
+            if not matches:
+                return None, {'employee_id': ["Employee not found."]}
+            if len(matches) > 1:
+                return None, {'employee_id': ["Matches several employees, use id."]}
+            return matches[0], None
+
+        return None, {'id': ["Expected an id or employee_id."]}
+
+    def _apply(self, creates, updates, deletes):
+        pairs = [serializer.build_instances(serializer.validated_data) for _, serializer in creates]
+        created = bulk_create_employees(pairs)
+        for (index, _), employee in zip(creates, created):
+            self.result.ok(index, 'create', 'created', employee.pk)
+
+        now = timezone.now()
+        employees, users = [], []
+        for index, (employee, serializer) in updates:
+            self._merge(employee, serializer)
+            employee.updated_on = now
+            employees.append(employee)
+            users.append(employee.uid)
+            self.result.ok(index, 'update', 'updated', employee.pk)
+        if employees:
+            EmployeeData.objects.bulk_update(employees, ['employee_id', 'extra_data', 'updated_on'])
+            USER_MODEL.objects.bulk_update(users, list(USER_UPDATE_FIELDS))
+            sync_field_values(employees)
+            versions.bump(versions.EMPLOYEES)
+
+        if deletes:
+            USER_MODEL.objects.filter(id__in=[employee.uid_id for _, employee in deletes]).delete()
+            for index, employee in deletes:
+                self.result.ok(index, 'delete', 'deleted', employee.pk)
+
+    def _merge(self, employee, serializer):
+        data = dict(serializer.validated_data)
+        for name in USER_UPDATE_FIELDS:
+            if name in data:
+                setattr(employee.uid, name, data.pop(name))
+        if 'employee_id' in data:
+            employee.employee_id = data.pop('employee_id')
+
+        extra_data = dict(employee.extra_data or {})
+        for key, value in serializer.dynamic_values(data).items():
+            # values saved from the form are keyed by label, keep one key
+            extra_data.pop(self.labels[key], None)
+            extra_data[key] = value
+        employee.extra_data = extra_data
@@ -0,0 +1,123 @@
+'''
+Incremental change feed over `DirectoryChange`.
+
+Changes are read in (txid, id) order, and only once every transaction that
+could still add a change before the cursor has finished: rows of
+transactions at or above the snapshot's xmin are held back until then. A
+client resuming from its last cursor therefore never skips a change that
+committed late, and syncing costs one index range scan over the changes
+since that cursor, whatever the size of the directory.
+'''
+
+import datetime
+
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import DirectoryChange, EmployeeData
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# changes of finished transactions only. A reader's own uncommitted
+# changes are left out too: a cursor past them would skip the changes of
+# transactions still running below it.
+_SETTLED = RawSQL(
+    "employee_directorychange.txid < txid_snapshot_xmin(txid_current_snapshot())",
+    [],
+    output_field=BooleanField(),
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(txid, pk):
+    return f"{txid}.{pk}"
+
+
+def decode_cursor(cursor):
+    txid, sep, pk = (cursor or '').partition('.')
+    if not sep or not txid.isdigit() or not pk.isdigit():
+        raise InvalidCursor(f"Invalid cursor {cursor!r}")
+    return int(txid), int(pk)
+
+
+def change_cursor(change):
+    return encode_cursor(change.txid, change.id)
+
+
+def latest_cursor():
+    '''
+    Cursor of the newest settled change, None while the log is empty.
+    '''
+    change = DirectoryChange.objects.filter(_SETTLED).order_by('-txid', '-id').first()
+    return change_cursor(change) if change else None
+
+
+def read_changes(since=None, limit=DEFAULT_LIMIT, resource=None, collapse=True):
+    '''
+    Changes after the `since` cursor, the whole log when it is None,
+    optionally of one resource only. Returns `(changes, cursor, has_more)`:
+    the `DirectoryChange` rows of the page in feed order, with the last
+    change of each object only unless `collapse` is False, and the cursor
+    to resume from.
+    '''
+    changes = DirectoryChange.objects.filter(_SETTLED).order_by('txid', 'id')
+    if resource:
+        changes = changes.filter(resource=resource)
+    if since:
+        txid, pk = decode_cursor(since)
+        changes = changes.filter(Q(txid__gt=txid) | Q(txid=txid, id__gt=pk))
+
+    page = list(changes[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    if not page:
+        return [], since, False
+    if not collapse:
+        return page, change_cursor(page[-1]), has_more
+
+    latest = {}
+    for change in page:
+        key = (change.resource, change.object_pk)
+        latest.pop(key, None)
+        latest[key] = change
+    return list(latest.values()), change_cursor(page[-1]), has_more
+
+
+def change_feed(since=None, limit=DEFAULT_LIMIT, serializer_class=None):
+    '''
+    One page of the employee feed as a dict. Creates and updates are
+    reported as upserts carrying the employee as serialized by
+    `serializer_class`. An upsert whose employee has since been deleted is
+    left out, its tombstone follows later in the feed.
+    '''
+    changes, cursor, has_more = read_changes(since, limit, DirectoryChange.EMPLOYEE)
+    upserted = [change.object_pk for change in changes if change.action != DirectoryChange.DELETE]
+    employees = EmployeeData.objects.select_related('uid').in_bulk(upserted)
+
+    results = []
+    for change in changes:
+        item = {'id': change.object_pk, 'action': 'delete', 'changed_on': change.changed_on, 'employee': None}
+        if change.action != DirectoryChange.DELETE:
+            employee = employees.get(change.object_pk)
+            if employee is None:
+                continue
+            item['action'] = 'upsert'
+            if serializer_class is not None:
+                item['employee'] = serializer_class(employee).data
+        results.append(item)
+    return {'cursor': cursor, 'has_more': has_more, 'results': results}
+
+
+def prune_changes(days):
+    '''
+    Delete changes older than `days`. Clients whose cursor is older than
+    that must resync from a full export.
+    '''
+    horizon = timezone.now() - datetime.timedelta(days=days)
+    deleted, _ = DirectoryChange.objects.filter(changed_on__lt=horizon).delete()
+    return deleted
@@ -0,0 +1,76 @@
+'''
+Conditional GET support (ETag / Last-Modified) for the API viewsets.
+
+Validators are computed before the view does any work, from values that
+change with the data: the version token of a cache scope for lists, or the
+modification time of a single row for details. A request whose
+`If-None-Match` still matches gets a 304 without running the queryset or
+the serializer.
+
+Only the ETag decides: HTTP dates have a one second resolution, and a row
+written twice within a second would keep its Last-Modified, so a client
+revalidating with `If-Modified-Since` alone could be told a stale copy is
+fresh. Last-Modified is still sent next to the ETag, rounded up to the next
+second so it never predates the change.
+'''
+
+import hashlib
+import math
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+def representation_key(request, renderer_format=None):
+    # same data rendered differently (json, browsable api, query params)
+    # must not share an ETag
+    renderer_format = renderer_format or request.accepted_renderer.format
+    return f"{renderer_format}?{request.META.get('QUERY_STRING', '')}"
+
+
+def not_modified(request, etag):
+    '''
+    The 304 response when the request's If-None-Match matches `etag`, else
+    None. If-Modified-Since is ignored, see above.
+    '''
+    return get_conditional_response(request, etag=etag)
+
+
+def set_validators(response, etag, last_modified):
+    if etag and (200 <= response.status_code < 300 or response.status_code == 304):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(math.ceil(last_modified.timestamp()))
+    return response
+
+
+class ConditionalGetMixin:
+    '''
+    Answers list and retrieve requests with 304 Not Modified when the
+    validators returned by `list_validators` / `detail_validators` match the
+    request headers. Validators are `(etag, last_modified)` pairs, either may
+    be None.
+    '''
+
+    def list_validators(self, request):
+        return None, None
+
+    def detail_validators(self, request):
+        return None, None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.list_validators(request), super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.detail_validators(request), super().retrieve, *args, **kwargs)
+
+    def conditional_response(self, request, validators, handler, *args, **kwargs):
+        etag, last_modified = validators
+        response = not_modified(request, etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
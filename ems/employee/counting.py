@@ -0,0 +1,67 @@
+'''
+Cheap row counts for large employee tables.
+
+Counts above `EMPLOYEE_EXACT_COUNT_THRESHOLD` rows are estimated from the
+planner statistics instead of running `COUNT(*)`: unfiltered querysets read
+`pg_class.reltuples`, filtered ones the row estimate of `EXPLAIN`. Below the
+threshold an exact count is cheap enough and is used instead.
+'''
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+DEFAULT_EXACT_COUNT_THRESHOLD = 10000
+
+
+def exact_count_threshold():
+    return getattr(settings, 'EMPLOYEE_EXACT_COUNT_THRESHOLD', DEFAULT_EXACT_COUNT_THRESHOLD)
+
+
+def _table_estimate(queryset):
+    table = queryset.model._meta.db_table
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+def _plan_estimate(queryset):
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _estimate(queryset):
+    if queryset.query.where:
+        return _plan_estimate(queryset)
+    return _table_estimate(queryset)
+
+
+def estimate_count(queryset, exact=False):
+    '''
+    Return `(count, is_exact)` for the queryset.
+    '''
+    if exact or connections[queryset.db].vendor != 'postgresql':
+        return queryset.count(), True
+
+    estimate = _estimate(queryset)
+
+    # reltuples is -1 until the table has been analysed
+    if estimate < exact_count_threshold():
+        return queryset.count(), True
+    return estimate, False
+
+
+async def aestimate_count(queryset, exact=False):
+    '''
+    Async variant of `estimate_count`.
+    '''
+    if exact or connections[queryset.db].vendor != 'postgresql':
+        return await queryset.acount(), True
+
+    estimate = await sync_to_async(_estimate)(queryset)
+    if estimate < exact_count_threshold():
+        return await queryset.acount(), True
+    return estimate, False
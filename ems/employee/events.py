@@ -0,0 +1,264 @@
+'''
+Server-sent events of directory changes (employees and form fields).
+
+Each event loop (one per ASGI worker process) runs a single broadcaster
+while it has subscribers. The broadcaster reads new `DirectoryChange` rows
+when the database sends a `directory_changes` notification, or every
+`EMPLOYEE_SSE_POLL_INTERVAL` seconds for changes held back by running
+transactions, and keeps the recent events in memory. Subscribers are plain
+coroutines waiting on that buffer, so idle clients hold neither a thread
+nor a database connection. Unlike the change feed, every create, update
+and delete is an event of its own. Event ids are change feed cursors: a
+client reconnecting with `Last-Event-ID` gets the events it missed,
+replayed from the database when they are no longer buffered.
+
+A database error doesn't end the broadcaster: it logs it, waits (longer
+after each consecutive failure) and carries on from its cursor, reopening
+the listening connection when that is the one that broke.
+'''
+
+import asyncio
+import json
+import logging
+import weakref
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+from .changes import (
+    DEFAULT_LIMIT,
+    InvalidCursor,
+    change_cursor,
+    decode_cursor,
+    encode_cursor,
+    latest_cursor,
+    read_changes,
+)
+
+CHANNEL = 'directory_changes'
+
+BUFFER_SIZE = 1000
+
+RETRY_MS = 3000
+
+# seconds between attempts after a database error, doubling up to the max
+BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+logger = logging.getLogger('employee.events')
+
+
+def _key(cursor):
+    return decode_cursor(cursor) if cursor else (0, 0)
+
+
+def format_event(change):
+    data = {
+        'resource': change.resource,
+        'action': change.action,
+        'id': change.object_pk,
+        'changed_on': change.changed_on.isoformat(),
+    }
+    return f"id: {change_cursor(change)}\nevent: {change.resource}\ndata: {json.dumps(data)}\n\n"
+
+
+def _open_listener():
+    # a dedicated connection, never one from a pool
+    wrapper = connections['default']
+    listener = wrapper.Database.connect(**wrapper.get_connection_params())
+    listener.autocommit = True
+    with listener.cursor() as cursor:
+        cursor.execute(f'LISTEN {CHANNEL}')
+    return listener
+
+
+def _drain_notifications(listener):
+    if is_psycopg3:
+        listener.pgconn.consume_input()
+        while listener.pgconn.notifies() is not None:
+            pass
+    else:
+        listener.poll()
+        listener.notifies.clear()
+
+
+def _read_changes(cursor):
+    # close_old_connections() without request boundaries: the broadcaster
+    # outlives requests, which otherwise drop broken and expired connections.
+    # A connection in a transaction is never closed.
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close_if_unusable_or_obsolete()
+    return read_changes(cursor, DEFAULT_LIMIT, collapse=False)
+
+
+class DirectoryBroadcaster:
+
+    def __init__(self):
+        self.events = deque()
+        # events after this key are all in the buffer
+        self.floor = None
+        self.cursor = None
+        self.subscribers = 0
+        self.task = None
+        self.backoff = BACKOFF
+        self._listener_lost = False
+        self._published = asyncio.Event()
+        self._wakeup = asyncio.Event()
+
+    def events_after(self, key):
+        '''
+        Buffered `(key, frame)` pairs after `key`, None when the buffer
+        doesn't reach back that far.
+        '''
+        if self.floor is None or key < self.floor:
+            return None
+        return [(event_key, event) for event_key, event in self.events if event_key > key]
+
+    def publish(self, changes):
+        for change in changes:
+            if len(self.events) >= BUFFER_SIZE:
+                self.floor = self.events.popleft()[0]
+            self.events.append(((change.txid, change.id), format_event(change)))
+        published, self._published = self._published, asyncio.Event()
+        published.set()
+
+    async def run(self):
+        self.events.clear()
+        self.cursor = None
+        self.backoff = BACKOFF
+        while True:
+            try:
+                await self.follow()
+            except Exception:
+                logger.exception("Directory event broadcaster failed, retrying in %ss", self.backoff)
+            await asyncio.sleep(self.backoff)
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+
+    async def follow(self):
+        '''
+        Publish new changes from `self.cursor` on, until the listening
+        connection breaks or a query fails.
+        '''
+        loop = asyncio.get_running_loop()
+        self._listener_lost = False
+        listener = None
+        try:
+            listener = await sync_to_async(_open_listener)()
+            fileno = listener.fileno()
+            loop.add_reader(fileno, self._notified, listener, fileno)
+        except NotImplementedError:
+            # no add_reader on this event loop, polling only
+            listener.close()
+            listener = None
+
+        try:
+            if self.cursor is None:
+                self.cursor = await sync_to_async(latest_cursor)()
+                self.floor = _key(self.cursor)
+            while not self._listener_lost:
+                self._wakeup.clear()
+                changes, self.cursor, has_more = await sync_to_async(_read_changes)(self.cursor)
+                self.backoff = BACKOFF
+                if changes:
+                    self.publish(changes)
+                if has_more:
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.EMPLOYEE_SSE_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if listener is not None:
+                if not self._listener_lost:
+                    loop.remove_reader(fileno)
+                listener.close()
+
+    def _notified(self, listener, fileno):
+        try:
+            _drain_notifications(listener)
+        except Exception:
+            # a closed socket stays readable, stop watching it before the
+            # event loop spins on it; follow() returns and run() reopens it
+            logger.warning("Directory event listener lost, reconnecting", exc_info=True)
+            asyncio.get_running_loop().remove_reader(fileno)
+            self._listener_lost = True
+        self._wakeup.set()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+            self.task.add_done_callback(self._stopped)
+
+    def _stopped(self, task):
+        # cancelled with the last subscriber, or crashed: the next
+        # subscriber starts a new one
+        if self.task is task:
+            self.task = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Directory event broadcaster stopped", exc_info=task.exception())
+
+    async def stream(self, last_event_id=None):
+        '''
+        Async iterator of SSE frames, starting after `last_event_id` or with
+        the changes made from now on. Ends after `EMPLOYEE_SSE_MAX_AGE`
+        seconds, clients reconnect with their last event id.
+        '''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.EMPLOYEE_SSE_MAX_AGE
+        cursor = last_event_id or await sync_to_async(latest_cursor)()
+        key = _key(cursor)
+
+        self.subscribers += 1
+        self.start()
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while loop.time() < deadline:
+                published = self._published
+                events = self.events_after(key)
+                if events is None:
+                    # missed events are older than the buffer, replay them
+                    changes, _, _ = await sync_to_async(read_changes)(cursor, DEFAULT_LIMIT, collapse=False)
+                    events = [((change.txid, change.id), format_event(change)) for change in changes]
+                if events:
+                    for event_key, event in events:
+                        yield event
+                        key = event_key
+                    cursor = encode_cursor(*key)
+                    continue
+                self.start()
+                timeout = min(settings.EMPLOYEE_SSE_KEEPALIVE, max(deadline - loop.time(), 0))
+                try:
+                    await asyncio.wait_for(published.wait(), timeout)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers and self.task is not None:
+                self.task.cancel()
+                self.task = None
+
+
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_broadcaster():
+    '''
+    The broadcaster of the running event loop.
+    '''
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        broadcaster = _broadcasters[loop] = DirectoryBroadcaster()
+    return broadcaster
+
+
+def valid_event_id(event_id):
+    try:
+        decode_cursor(event_id)
+    except InvalidCursor:
+        return False
+    return True
@@ -0,0 +1,91 @@
+'''
+Streaming export of the employee directory as CSV or NDJSON.
+
+Rows are read through a server-side cursor (`QuerySet.iterator`) and encoded
+one at a time, so memory stays flat and the first bytes go out as soon as
+the first chunk is fetched. Dynamic field values become one column per
+field, in form order.
+'''
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .schema import get_schema
+from .values import stored_value
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+BASE_COLUMNS = [
+    ('id', 'id'),
+    ('employee_id', 'employee_id'),
+    ('username', 'uid__username'),
+    ('first_name', 'uid__first_name'),
+    ('last_name', 'uid__last_name'),
+    ('email', 'uid__email'),
+    ('created_on', 'created_on'),
+    ('updated_on', 'updated_on'),
+]
+
+
+def export_columns(schema):
+    return [column for column, _ in BASE_COLUMNS] + [field['field_label'] for field in schema]
+
+
+def export_rows(queryset, schema=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Yield one flat dict per employee, keyed by `export_columns()`.
+    '''
+    schema = schema or get_schema()
+    lookups = [lookup for _, lookup in BASE_COLUMNS] + ['extra_data']
+    for values in queryset.order_by('-id').values(*lookups).iterator(chunk_size=chunk_size):
+        row = {column: values[lookup] for column, lookup in BASE_COLUMNS}
+        for field in schema:
+            row[field['field_label']] = stored_value(values['extra_data'], field)
+        yield row
+
+
+class _Echo:
+    '''
+    File-like object handing back what csv.writer writes to it.
+    '''
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_export(queryset, file_format, schema=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Yield the encoded export line by line.
+    '''
+    schema = schema or get_schema()
+    rows = export_rows(queryset, schema, chunk_size)
+    if file_format == 'csv':
+        columns = export_columns(schema)
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([_csv_value(row[column]) for column in columns])
+    elif file_format == 'ndjson':
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+    else:
+        raise ValueError(f"Unsupported export format: {file_format}")
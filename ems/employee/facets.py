@@ -0,0 +1,121 @@
+'''
+Option counts of the select/radio fields for the employee filter bar.
+
+Counts for every faceted field come from one grouped query: each filtered
+employee row is expanded into one (field, value) pair per faceted field with
+a `LATERAL (VALUES ...)` list, then grouped once. Results are cached per
+filter combination under the schema and employee version tokens, so any
+employee write or schema change starts from fresh counts.
+'''
+
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+from . import versions
+from .filters import filter_employees
+from .models import EmployeeData
+from .schema import get_schema
+
+FACET_FIELD_TYPES = ('select', 'radio')
+
+# query string parameters that don't change the filtered set
+NON_FILTER_PARAMS = ('cursor', 'count', 'page', 'format', 'facets', 'limit')
+
+
+def facet_fields(schema):
+    return [field for field in schema if field['field_type'] in FACET_FIELD_TYPES]
+
+
+def count_options(queryset, fields):
+    '''
+    `{field id: {value: count}}` over an `EmployeeData` queryset, in one query.
+    '''
+    counts = {field['id']: {} for field in fields}
+    if not fields:
+        return counts
+
+    try:
+        subquery, params = queryset.order_by().values('extra_data').query.sql_with_params()
+    except EmptyResultSet:
+        return counts
+    pairs, pair_params = [], []
+    for field in fields:
+        # form saves key by label, the API by name
+        pairs.append("(%s, coalesce(e.extra_data ->> %s, e.extra_data ->> %s))")
+        pair_params.extend([field['id'], field['field_label'], field['name']])
+
+    sql = (
+        f"SELECT facet.field_id, facet.value, count(*) FROM ({subquery}) e "
+        f"CROSS JOIN LATERAL (VALUES {', '.join(pairs)}) AS facet(field_id, value) "
+        "WHERE facet.value IS NOT NULL GROUP BY facet.field_id, facet.value"
+    )
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params + tuple(pair_params))
+        for field_id, value, count in cursor.fetchall():
+            counts[field_id][value] = count
+    return counts
+
+
+def build_facets(counts, fields):
+    return [
+        {
+            'field': field['field_label'],
+            'name': field['name'],
+            'options': [
+                {'value': option, 'count': counts[field['id']].get(option, 0)}
+                for option in field['options']
+            ],
+        }
+        for field in fields
+    ]
+
+
+def facet_cache_key(params, schema, employees_token=None):
+    filters = sorted(
+        (key, params.getlist(key) if hasattr(params, 'getlist') else [params[key]])
+        for key in params if key not in NON_FILTER_PARAMS
+    )
+    digest = hashlib.md5(json.dumps(filters).encode()).hexdigest()
+    if employees_token is None:
+        _, employees_token = versions.current(versions.EMPLOYEES)
+    return f"employee-facets:{schema.token}:{employees_token}:{digest}"
+
+
+def employee_facets(params, schema=None):
+    '''
+    Facets of the employees matching `params` (eg. `request.GET`), as a list
+    of `{'field', 'name', 'options': [{'value', 'count'}]}` dicts following
+    the schema order.
+    '''
+    schema = schema or get_schema()
+    key = facet_cache_key(params, schema)
+    facets = cache.get(key)
+    if facets is None:
+        fields = facet_fields(schema)
+        employees = filter_employees(EmployeeData.objects.all(), params, schema)
+        facets = build_facets(count_options(employees, fields), fields)
+        cache.set(key, facets, settings.EMPLOYEE_FACET_CACHE_TIMEOUT)
+    return facets
+
+
+async def aemployee_facets(params, schema):
+    '''
+    Async variant of `employee_facets`.
+    '''
+    _, employees_token = await versions.acurrent(versions.EMPLOYEES)
+    key = facet_cache_key(params, schema, employees_token)
+    facets = await cache.aget(key)
+    if facets is None:
+        fields = facet_fields(schema)
+        employees = filter_employees(EmployeeData.objects.all(), params, schema)
+        # raw SQL has no async API
+        counts = await sync_to_async(count_options)(employees, fields)
+        facets = build_facets(counts, fields)
+        await cache.aset(key, facets, settings.EMPLOYEE_FACET_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,200 @@
+'''
+Query string filters for employee lists, driven by the dynamic form schema.
+
+`?<label>=value` filters are rewritten to JSON containment (`@>`) so they
+can use the `jsonb_path_ops` GIN index on `EmployeeData.extra_data`. Fields
+flagged as `indexed` compare on the same expression their btree index is
+built on. `?<label>__gte=` style range filters on number and date fields
+run against the typed value table (values.py) when it is enabled, otherwise
+date fields compare their stored ISO text. With the typed values,
+`?ordering=<label>` (`-<label>` for descending) sorts by a number or date
+field, see `sort_employees`.
+'''
+
+import datetime
+import hashlib
+
+from django.db.models import Exists, F, FilteredRelation, Index, OuterRef, Q, Value
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Coalesce
+
+from .models import EmployeeFieldValue
+from .schema import get_schema
+from .search import search_employees
+from .values import parse_date, parse_number, typed_values_enabled
+
+RANGE_LOOKUPS = ('gt', 'gte', 'lt', 'lte')
+
+# types whose stored text sorts the same way as the value
+RANGE_FIELD_TYPES = ('date',)
+
+# typed value column and parser of the types with typed range filters
+TYPED_RANGE_COLUMNS = {
+    'number': ('value_num', parse_number),
+    'date': ('value_date', parse_date),
+}
+
+FIELD_INDEX_PREFIX = 'employee_xd_'
+
+ORDERING_PARAM = 'ordering'
+
+# annotation of the sorted value, EmployeeCursorPagination pages on it
+SORT_ANNOTATION = 'sort_value'
+
+# stand-ins for a missing value, sorting before every real one
+SORT_FLOORS = {
+    'number': float('-inf'),
+    'date': datetime.date.min,
+}
+
+
+def field_value_expression(field):
+    '''
+    Text value of a dynamic field. Values are keyed by label when saved
+    from the HTML form and by name when saved through the API.
+    '''
+    if field['name'] == field['field_label']:
+        return KeyTextTransform(field['field_label'], 'extra_data')
+    return Coalesce(
+        KeyTextTransform(field['field_label'], 'extra_data'),
+        KeyTextTransform(field['name'], 'extra_data'),
+    )
+
+
+def field_index(field):
+    '''
+    Btree expression index backing equality and range filters of an
+    indexed field. The name changes with the label, so a renamed field
+    gets a fresh index.
+    '''
+    suffix = hashlib.md5(field['field_label'].encode()).hexdigest()[:8]
+    return Index(
+        field_value_expression(field),
+        name=f"{FIELD_INDEX_PREFIX}{field['id']}_{suffix}",
+    )
+
+
+def _candidate_values(field, value):
+    '''
+    Query string values are text while the API stores typed JSON values,
+    match both.
+    '''
+    candidates = [value]
+    if field['field_type'] == 'number':
+        try:
+            candidates.append(int(value))
+        except ValueError:
+            pass
+    elif field['field_type'] == 'checkbox' and value.lower() in ('true', 'false', 'on'):
+        candidates.append(value.lower() != 'false')
+    return candidates
+
+
+def _containment(field, value):
+    keys = {field['field_label'], field['name']}
+    condition = Q()
+    for key in keys:
+        for candidate in _candidate_values(field, value):
+            condition |= Q(extra_data__contains={key: candidate})
+    return condition
+
+
+def _typed_range(field, params):
+    '''
+    Range lookups of a field as one `EXISTS` over its typed values, or None
+    when there are none. Unparsable bounds match nothing.
+    '''
+    column, parse = TYPED_RANGE_COLUMNS[field['field_type']]
+    bounds = {}
+    for lookup in RANGE_LOOKUPS:
+        value = params.get(f"{field['field_label']}__{lookup}")
+        if value:
+            bounds[f"{column}__{lookup}"] = parse(value)
+    if not bounds:
+        return None
+    if None in bounds.values():
+        return Q(pk__in=[])
+    values = EmployeeFieldValue.objects.filter(employee=OuterRef('pk'), field_id=field['id'], **bounds)
+    return Exists(values)
+
+
+def filter_employees(queryset, params, schema=None):
+    '''
+    Apply the `q` search and the dynamic field filters found in `params`
+    (eg. `request.GET`) to an `EmployeeData` queryset.
+    '''
+    schema = schema or get_schema()
+    typed = typed_values_enabled()
+    if params.get('q'):
+        fuzzy = params.get('fuzzy', '').lower() in ('1', 'true', 'yes')
+        queryset = search_employees(queryset, params['q'], fuzzy=fuzzy)
+
+    for field in schema:
+        label = field['field_label']
+        alias = f"dyn_{field['id']}"
+        annotated = False
+
+        value = params.get(label)
+        if value:
+            if field['indexed']:
+                queryset = queryset.alias(**{alias: field_value_expression(field)})
+                queryset = queryset.filter(**{alias: value})
+                annotated = True
+            else:
+                queryset = queryset.filter(_containment(field, value))
+
+        if typed and field['field_type'] in TYPED_RANGE_COLUMNS:
+            condition = _typed_range(field, params)
+            if condition is not None:
+                queryset = queryset.filter(condition)
+            continue
+        if field['field_type'] not in RANGE_FIELD_TYPES:
+            continue
+        for lookup in RANGE_LOOKUPS:
+            value = params.get(f"{label}__{lookup}")
+            if not value:
+                continue
+            if not annotated:
+                queryset = queryset.alias(**{alias: field_value_expression(field)})
+                annotated = True
+            queryset = queryset.filter(**{f"{alias}__{lookup}": value})
+    return sort_employees(queryset, params, schema)
+
+
+def sort_field(params, schema):
+    '''
+    `(field, descending)` of the `?ordering=` parameter, None unless it
+    names a number or date field by label or API name.
+    '''
+    ordering = params.get(ORDERING_PARAM) or ''
+    descending = ordering.startswith('-')
+    name = ordering[1:] if descending else ordering
+    for field in schema:
+        if name in (field['field_label'], field['name']) and field['field_type'] in TYPED_RANGE_COLUMNS:
+            return field, descending
+    return None
+
+
+def sort_employees(queryset, params, schema=None):
+    '''
+    Annotate an `EmployeeData` queryset with the typed value of the
+    `?ordering=` field as `sort_value`, for the pagination to order and
+    page on. Each employee joins its one typed value row of that field
+    through the `(employee, field)` unique index; employees without a
+    value get the type's floor so they sort first (last when descending)
+    and still have a cursor position. Without the typed values, or for
+    other fields, the queryset is returned unchanged.
+    '''
+    if not typed_values_enabled():
+        return queryset
+    sort = sort_field(params, schema or get_schema())
+    if sort is None:
+        return queryset
+    field = sort[0]
+    column = TYPED_RANGE_COLUMNS[field['field_type']][0]
+    queryset = queryset.alias(
+        sort_row=FilteredRelation('field_values', condition=Q(field_values__field_id=field['id'])),
+    )
+    return queryset.annotate(**{
+        SORT_ANNOTATION: Coalesce(F(f'sort_row__{column}'), Value(SORT_FLOORS[field['field_type']])),
+    })
@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from .models import EmployeeData
+from .serializers import DynamicFieldsSerializer
 
 USER_MODEL = get_user_model()
 
@@ -23,27 +25,47 @@ class EmployeeForm(forms.Form):
             # Remove password field for update
             self.fields.pop('password')
 
+    def clean(self):
+        cleaned_data = super().clean()
+
+        # Dynamic fields are posted by label, validate them with the same
+        # compiled validator as the API.
+        validator_class = DynamicFieldsSerializer.for_schema()
+        values = {}
+        for field in validator_class.schema:
+            value = self.data.get(field['field_label'])
+            if value not in (None, ''):
+                values[field['name']] = value
+
+        validator = validator_class(data=values)
+        if validator.is_valid():
+            cleaned_data['extra_data'] = validator.dynamic_values(validator.validated_data, key='field_label')
+        else:
+            labels = {field['name']: field['field_label'] for field in validator_class.schema}
+            for name, errors in validator.errors.items():
+                for error in errors:
+                    self.add_error(None, f"{labels.get(name, name)}: {error}")
+        return cleaned_data
+
     def save(self):
         data = self.cleaned_data
 
-        # Create user
-        user, created = USER_MODEL.objects.update_or_create(
-            username=data['username'],
-            defaults={
-                'first_name': data.get('first_name', ''),
-                'last_name': data.get('last_name', ''),
-                'email': data.get('email', ''),
-            }
-        )
+        # Create user, the password goes in the same write
+        defaults = {
+            'first_name': data.get('first_name', ''),
+            'last_name': data.get('last_name', ''),
+            'email': data.get('email', ''),
+        }
         if data.get('password'):
-            user.set_password(data['password'])
-            user.save()
+            defaults['password'] = make_password(data['password'])
+        user, created = USER_MODEL.objects.update_or_create(username=data['username'], defaults=defaults)
 
         # Then Create employee instance
         employee, emp_created = EmployeeData.objects.update_or_create(
             uid=user,
             defaults={
-                'employee_id': data.get('employee_id')
+                'employee_id': data.get('employee_id'),
+                'extra_data': data.get('extra_data', {}),
             }
         )
 
@@ -0,0 +1,174 @@
+'''
+Streaming bulk import of employees from CSV or NDJSON files.
+
+Rows are read one at a time, validated against the current dynamic field
+schema and written in batches with `bulk_create`, one transaction per batch.
+Invalid rows are reported and skipped, so a bad row never aborts the load
+and memory use depends on the batch size only: past `MAX_REPORTED_ERRORS`,
+rejected rows are only counted.
+'''
+
+import codecs
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, transaction
+
+from .passwords import PLAIN
+from .schema import get_schema
+from .serializers import EmployeeCreateSerializer
+from .services import bulk_create_employees
+
+USER_MODEL = get_user_model()
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+DEFAULT_BATCH_SIZE = 500
+
+# errors kept in an ImportResult, the rest are counted in `failed` only
+MAX_REPORTED_ERRORS = 100
+
+
+class InvalidRecord:
+    '''
+    Placeholder yielded for a record that could not be parsed.
+    '''
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_rows(stream, file_format):
+    '''
+    Yield one dict per record of a binary stream, or an `InvalidRecord`.
+    '''
+    text = codecs.getreader('utf-8-sig')(stream)
+    if file_format == 'csv':
+        for row in csv.DictReader(text):
+            row.pop(None, None)
+            # empty cells mean "not provided"
+            yield {key: value for key, value in row.items() if value not in ('', None)}
+    elif file_format == 'ndjson':
+        for line in text:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                yield InvalidRecord(f"Invalid JSON: {exc}")
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+def guess_format(filename, default='csv'):
+    for file_format in IMPORT_FORMATS:
+        if filename.lower().endswith('.' + file_format):
+            return file_format
+    if filename.lower().endswith('.jsonl'):
+        return 'ndjson'
+    return default
+
+
+class ImportResult:
+
+    def __init__(self, max_errors=MAX_REPORTED_ERRORS):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.errors_omitted = 0
+        self.max_errors = max_errors
+
+    def add_error(self, row_number, errors):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row_number, 'errors': errors})
+        else:
+            self.errors_omitted += 1
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_omitted': self.errors_omitted,
+        }
+
+
+class EmployeeImporter:
+    '''
+    `on_error(row_number, errors)` is called for every rejected row. Without
+    it the errors of the first `max_errors` rejected rows are collected in
+    `ImportResult.errors`, later ones are only counted. `password_mode`
+    tells whether the password column holds passwords (`plain`), password
+    hashes (`hashed`) or is ignored (`unusable`), see passwords.py.
+    '''
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, on_error=None, password_mode=PLAIN,
+                 max_errors=MAX_REPORTED_ERRORS):
+        self.batch_size = max(1, int(batch_size))
+        self.on_error = on_error
+        self.password_mode = password_mode
+        self.max_errors = max_errors
+
+    def run(self, rows):
+        self.result = ImportResult(self.max_errors)
+        schema = get_schema()
+        serializer_class = EmployeeCreateSerializer.for_schema(schema)
+        # columns may carry the field label (eg. an export) or the API name
+        self.label_names = {f['field_label']: f['name'] for f in schema if f['field_label'] != f['name']}
+
+        batch = []
+        row_number = 0
+        try:
+            for row_number, row in enumerate(rows, start=1):
+                if isinstance(row, InvalidRecord):
+                    self._reject(row_number, {'non_field_errors': [row.message]})
+                    continue
+                serializer = serializer_class(data=self._normalise(row), context={'password_mode': self.password_mode})
+                if not serializer.is_valid():
+                    self._reject(row_number, serializer.errors)
+                    continue
+                batch.append((row_number, serializer.build_instances(serializer.validated_data)))
+                if len(batch) >= self.batch_size:
+                    self._write(batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # the rest of the file cannot be trusted, keep what was read so far
+            self._reject(row_number + 1, {'non_field_errors': [f"Unreadable file: {exc}"]})
+        self._write(batch)
+        return self.result
+
+    def _normalise(self, row):
+        if not isinstance(row, dict):
+            return {}
+        return {self.label_names.get(key, key): value for key, value in row.items()}
+
+    def _reject(self, row_number, errors):
+        self.result.failed += 1
+        if self.on_error:
+            self.on_error(row_number, errors)
+        else:
+            self.result.add_error(row_number, errors)
+
+    def _write(self, batch):
+        if not batch:
+            return
+
+        names = [user.username for _, (user, _) in batch]
+        taken = set(USER_MODEL.objects.filter(username__in=names).values_list('username', flat=True))
+        accepted = []
+        for row_number, (user, employee) in batch:
+            if user.username in taken:
+                self._reject(row_number, {'username': ["A user with that username already exists."]})
+                continue
+            taken.add(user.username)
+            accepted.append((row_number, (user, employee)))
+
+        try:
+            with transaction.atomic():
+                bulk_create_employees([pair for _, pair in accepted], self.password_mode)
+        except DatabaseError as exc:
+            for row_number, _ in accepted:
+                self._reject(row_number, {'non_field_errors': [f"Batch failed: {exc}"]})
+            return
+        self.result.created += len(accepted)
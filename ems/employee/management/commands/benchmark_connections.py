@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# connection setting: environment overrides
+MODES = {
+    'per-request': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '60', 'DB_CONN_HEALTH_CHECKS': 'true'},
+    'pool': {'DB_POOL': 'true'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure /employee/api/fields/ latency with a new database connection "
+        "per request, with persistent connections and with the psycopg 3 pool. "
+        "Each setting runs benchmark_read_views in a fresh process configured "
+        "through the DB_* environment variables, behind both the WSGI and the "
+        "ASGI application."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('modes', nargs='*', help=f"Settings to compare: {', '.join(MODES)}. Defaults to all.")
+        parser.add_argument('--endpoint', default='fields', help="benchmark_read_views endpoint to load.")
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--server', choices=['asgi', 'wsgi'], action='append', help="Defaults to both.")
+        parser.add_argument('--username')
+
+    def handle(self, *args, **options):
+        modes = options['modes'] or list(MODES)
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(sorted(unknown))}.")
+
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_read_views', options['endpoint'], '--json',
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+        ]
+        if options['username']:
+            command += ['--username', options['username']]
+
+        for server in options['server'] or ['wsgi', 'asgi']:
+            baseline = {}
+            for mode in modes:
+                process = subprocess.run(
+                    command + ['--server', server], env={**os.environ, **MODES[mode]}, capture_output=True, text=True,
+                )
+                if process.returncode:
+                    self.stderr.write(f"{server} {mode}: {process.stderr.strip().splitlines()[-1]}")
+                    continue
+                for result in json.loads(process.stdout):
+                    first = baseline.setdefault(result['mode'], result)
+                    self.stdout.write(
+                        f"{server} {mode:<12} {result['mode']:<5} {result['requests_per_second']:>8} req/s  "
+                        f"mean {result['mean_ms']:>7} ms  p50 {result['p50_ms']:>7} ms  p95 {result['p95_ms']:>7} ms  "
+                        f"({first['mean_ms'] / result['mean_ms']:.2f}x vs {modes[0]})"
+                    )
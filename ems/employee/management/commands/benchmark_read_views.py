@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from employee.benchmark import run_load, run_wsgi_load
+from employee.models import EmployeeData
+
+# endpoint: (sync url name, async url name, needs an employee id)
+ENDPOINTS = {
+    'fields': ('api-fields-list', 'api-async-fields-list', False),
+    'employees': ('api-employees-list', 'api-async-employees-list', False),
+    'employee': ('api-employees-detail', 'api-async-employees-detail', True),
+    'facets': ('api-employees-facets', 'api-async-employees-facets', False),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync API read views with their async variants under "
+        "concurrent load, through the ASGI application and the configured "
+        "database. With --server wsgi only the sync views are loaded, from "
+        "a pool of threads. Run it against a copy of production sized data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help=f"Endpoints to compare: {', '.join(ENDPOINTS)}. Defaults to all.")
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument(
+            '--client-delay', type=float, default=0,
+            help="Seconds each client waits before reading a response chunk, to model slow clients.",
+        )
+        parser.add_argument('--username', help="User to authenticate as, defaults to the first superuser.")
+        parser.add_argument('--server', choices=['asgi', 'wsgi'], default='asgi')
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['endpoints']) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}.")
+
+        User = get_user_model()
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError("No user to authenticate as, pass --username.")
+        headers = {'Authorization': f"Bearer {AccessToken.for_user(user)}"}
+        employee_id = EmployeeData.objects.order_by('-id').values_list('id', flat=True).first()
+
+        if options['server'] == 'wsgi':
+            app = get_wsgi_application()
+        else:
+            app = get_asgi_application()
+        report = []
+        for name in options['endpoints'] or list(ENDPOINTS):
+            sync_name, async_name, detail = ENDPOINTS[name]
+            if detail and employee_id is None:
+                self.stderr.write(f"Skipping {name}, there are no employees.")
+                continue
+            args = [employee_id] if detail else []
+            views = [('sync', sync_name)]
+            if options['server'] == 'asgi':
+                views.append(('async', async_name))
+            results = {}
+            for mode, url_name in views:
+                url = reverse(url_name, args=args)
+                if options['server'] == 'wsgi':
+                    result = run_wsgi_load(app, url, options['requests'], options['concurrency'], headers)
+                else:
+                    result = asyncio.run(run_load(
+                        app, url, options['requests'], options['concurrency'], headers, options['client_delay'],
+                    ))
+                results[mode] = result
+                report.append({'endpoint': name, 'server': options['server'], 'mode': mode, **result})
+                if not options['json']:
+                    self.stdout.write(
+                        f"{name:<10} {mode:<5} {result['requests_per_second']:>8} req/s  "
+                        f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  errors {result['errors']}"
+                    )
+            if 'async' in results and not options['json']:
+                speedup = results['async']['requests_per_second'] / results['sync']['requests_per_second']
+                self.stdout.write(self.style.SUCCESS(f"{name:<10} async/sync throughput {speedup:.2f}x"))
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from employee.exporter import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, stream_export
+from employee.filters import filter_employees
+from employee.models import EmployeeData
+from employee.schema import get_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream the employee directory as CSV or NDJSON. Accepts the same "
+        "dynamic field filters as the employee list, eg. --filter Department=IT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help="File to write, defaults to stdout.")
+        parser.add_argument('--filter', action='append', default=[], metavar='LABEL=VALUE')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            label, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Invalid filter {item!r}, expected LABEL=VALUE.")
+            params[label] = value
+
+        schema = get_schema()
+        employees = filter_employees(EmployeeData.objects.all(), params, schema)
+        chunks = stream_export(employees, options['format'], schema, options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as handle:
+                handle.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
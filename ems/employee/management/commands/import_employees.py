@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employee.importer import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, EmployeeImporter, guess_format, read_rows
+from employee.passwords import PASSWORD_MODES, PLAIN
+
+
+class Command(BaseCommand):
+    help = (
+        "Import employees from a CSV or NDJSON file. Rows are validated against "
+        "the dynamic form schema and inserted in batches; invalid rows are "
+        "reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import.")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--password-mode', choices=PASSWORD_MODES, default=PLAIN,
+            help="'hashed' when the password column holds password hashes, "
+                 "'unusable' to create the users without a password.",
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or guess_format(options['path'])
+
+        def report(row_number, errors):
+            self.stderr.write(f"Row {row_number}: {json.dumps(errors)}")
+
+        importer = EmployeeImporter(
+            batch_size=options['batch_size'], on_error=report, password_mode=options['password_mode'],
+        )
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = importer.run(read_rows(stream, file_format))
+        except OSError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} employee(s), {result.failed} row(s) rejected."
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from employee.changes import prune_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete employee change feed entries, tombstones included, older than "
+        "--days. Sync clients must resume within that window."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change(s)."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from employee.ordering import rebalance_field_order
+from employee.schema import schema_change
+
+
+class Command(BaseCommand):
+    help = "Renumber the dynamic form fields with even gaps, keeping their order."
+
+    def handle(self, *args, **options):
+        with schema_change():
+            changed = rebalance_field_order()
+        self.stdout.write(self.style.SUCCESS(f"Renumbered {changed} field(s)."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from employee.models import DynamicFormFields
+from employee.values import DEFAULT_CHUNK_SIZE, rebuild_field_values
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the typed copy of the dynamic field values from "
+        "EmployeeData.extra_data, for every field or the given field ids."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('field_ids', nargs='*', type=int)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        fields = None
+        if options['field_ids']:
+            fields = list(DynamicFormFields.objects.filter(id__in=options['field_ids']))
+        written = rebuild_field_values(fields, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} value(s)."))
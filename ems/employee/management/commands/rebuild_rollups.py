@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from employee.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the employee headcount rollups from scratch, correcting any "
+        "drift. Meant to run periodically, eg. nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'dimensions', nargs='*',
+            help="Dimensions to recount, eg. created_month or field:3. Defaults to all.",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(options['dimensions'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Recounted {written} bucket(s)."))
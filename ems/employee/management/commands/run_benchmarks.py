@@ -0,0 +1,198 @@
+import datetime
+import json
+import platform
+import subprocess
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils.http import urlencode
+from rest_framework_simplejwt.tokens import AccessToken
+
+from employee.benchmark import time_calls
+from employee.models import DynamicFormFields, EmployeeData
+from employee.schema import get_schema, schema_change
+from employee.seeding import DEFAULT_BATCH_SIZE, USERNAME_PREFIX, seed_directory
+
+PATHS = ('list_view', 'api_list', 'create', 'form_config_save', 'field_reorder', 'export')
+
+# users created by the create path, deleted after each size
+CREATED_PREFIX = 'bench-'
+
+
+def parse_size(value):
+    multipliers = {'k': 1000, 'm': 1000000}
+    value = value.strip().lower()
+    try:
+        if value[-1:] in multipliers:
+            return int(float(value[:-1]) * multipliers[value[-1]])
+        return int(value)
+    except ValueError:
+        raise CommandError(f"Invalid size {value!r}, expected eg. 10000, 100k or 1m.")
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain'], capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the directory to each size in turn (see seed_employees) and time "
+        "the key paths: the HTML list with filters, the API list, creating an "
+        "employee, saving the form configuration, reordering a field and a "
+        "full export. Writes JSON results that --compare reads back, to compare "
+        "commits. Seeded rows stay in the database. Run it against a scratch "
+        "database, never production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10k,100k,1m', help="Comma separated employee counts, eg. 10k,100k,1m.")
+        parser.add_argument('--fields', type=int, default=8)
+        parser.add_argument('--paths', help=f"Comma separated paths out of {', '.join(PATHS)}. Defaults to all.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed calls per path and size, after one warmup call.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--output', default='-', help="File to write the JSON results to, - for stdout.")
+        parser.add_argument('--compare', help="JSON results of an earlier run to compare p50 latencies with.")
+
+    def handle(self, *args, **options):
+        sizes = [parse_size(size) for size in options['sizes'].split(',') if size.strip()]
+        paths = options['paths'].split(',') if options['paths'] else list(PATHS)
+        unknown = set(paths) - set(PATHS)
+        if unknown:
+            raise CommandError(f"Unknown path(s): {', '.join(sorted(unknown))}.")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be positive.")
+        baseline = self.load_baseline(options['compare'])
+        # the report goes to stderr when the JSON takes stdout
+        log = self.stderr if options['output'] == '-' else self.stdout
+
+        commit, dirty = git_commit()
+        report = {
+            'commit': commit,
+            'dirty': dirty,
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': f"{connection.display_name} {getattr(connection, 'pg_version', '')}".strip(),
+            'fields': options['fields'],
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+            'results': [],
+        }
+        for size in sorted(sizes):
+            fields, employees = seed_directory(size, options['fields'], options['seed'], options['batch_size'])
+            # seeding only adds rows, a database seeded larger before stays larger
+            total = EmployeeData.objects.count()
+            log.write(f"{size} employees: seeded {employees} employee(s) and {fields} field(s), {total} in total")
+            for path in paths:
+                result = self.run_path(path, options['repeat'])
+                report['results'].append({'size': size, 'employees': total, 'path': path, **result})
+                line = (
+                    f"{size:>8} {path:<17} p50 {result['p50_ms']:>9} ms  p95 {result['p95_ms']:>9} ms  "
+                    f"errors {result['errors']}"
+                )
+                previous = baseline.get((size, path))
+                if previous:
+                    line += f"  ({result['p50_ms'] / previous:.2f}x baseline p50)"
+                log.write(line)
+            get_user_model().objects.filter(username__startswith=CREATED_PREFIX).delete()
+
+        output = json.dumps(report, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            log.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+    def load_baseline(self, path):
+        if not path:
+            return {}
+        try:
+            with open(path) as handle:
+                results = json.load(handle)['results']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Can't read {path}: {exc}")
+        return {(result['size'], result['path']): result['p50_ms'] for result in results if result['p50_ms']}
+
+    def clients(self):
+        user = get_user_model().objects.get(username=f'{USERNAME_PREFIX}0')
+        html = Client(HTTP_HOST='localhost')
+        html.force_login(user)
+        api = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return html, api
+
+    def run_path(self, path, repeat):
+        html, api = self.clients()
+        schema = get_schema()
+        select = next((field for field in schema if field['field_type'] == 'select' and field['options']), None)
+        if select is None:
+            raise CommandError("The benchmarks need a select field, seed at least one field.")
+        # the second option: common, but not most of the directory
+        option = select['options'][min(1, len(select['options']) - 1)]
+        fields = list(DynamicFormFields.objects.all())
+        run = datetime.datetime.now().strftime('%H%M%S%f')
+
+        if path == 'list_view':
+            url = reverse('employee_list') + '?' + urlencode({'q': 'python', select['field_label']: option})
+            return time_calls(lambda i: html.get(url), repeat, label=url)
+
+        if path == 'api_list':
+            url = reverse('api-employees-list') + '?' + urlencode({select['field_label']: option})
+            return time_calls(lambda i: api.get(url), repeat, label=url)
+
+        if path == 'create':
+            url = reverse('api-employees-list')
+
+            def create(i):
+                username = f'{CREATED_PREFIX}{run}-{i}'
+                return api.post(url, {
+                    'username': username, 'first_name': 'Bench', 'last_name': 'Mark',
+                    'email': f'{username}@example.com', 'password': 'bench-password', select['name']: option,
+                }, content_type='application/json')
+            return time_calls(create, repeat, label=url)
+
+        if path == 'form_config_save':
+            url = reverse('employee_form_config')
+
+            def payload(required):
+                return json.dumps({'fields': [
+                    {
+                        'id': field.id, 'label': field.field_label, 'field_type': field.field_type,
+                        'required': required if field is fields[-1] else field.field_is_required,
+                        'order': position, 'options': field.extra.get('options', ''),
+                    }
+                    for position, field in enumerate(fields)
+                ]})
+            # one field flips its required flag, the others are saved unchanged
+            result = time_calls(
+                lambda i: html.post(url, payload(i % 2 == 0), content_type='application/json'), repeat, label=url,
+            )
+            html.post(url, payload(fields[-1].field_is_required), content_type='application/json')
+            return result
+
+        if path == 'field_reorder':
+            url = reverse('api-fields-update-order')
+            moved = fields[-1]
+            last = fields[-1].field_order
+
+            # to the top and back to the bottom
+            def reorder(i):
+                target = fields[0].field_order if i % 2 == 0 else last + 1
+                return api.put(url, {'id': moved.id, 'field_order': target}, content_type='application/json')
+            result = time_calls(reorder, repeat, label=url)
+            with transaction.atomic(), schema_change():
+                DynamicFormFields.objects.filter(id=moved.id).update(field_order=moved.field_order)
+            return result
+
+        url = reverse('api-employees-export')
+        return time_calls(lambda i: api.get(url), repeat, label=url)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from employee.seeding import DEFAULT_BATCH_SIZE, DEFAULT_PASSWORD, USERNAME_PREFIX, seed_directory
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the directory with synthetic employees and dynamic form fields, "
+        "for benchmarks and local development. Tops up to the given totals, so "
+        "running it again with larger numbers only adds the difference. The "
+        "same --seed always generates the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=10000, help="Seeded employees to have in total.")
+        parser.add_argument('--fields', type=int, default=8, help="Seeded dynamic form fields to have in total.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--password', default=DEFAULT_PASSWORD,
+            help=f"Password of every seeded user ({USERNAME_PREFIX}0, {USERNAME_PREFIX}1, ...).",
+        )
+
+    def handle(self, *args, **options):
+        if options['employees'] < 0 or options['fields'] < 0 or options['batch_size'] < 1:
+            raise CommandError("--employees and --fields can't be negative, --batch-size must be positive.")
+
+        def report(done, total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{done}/{total} employees")
+
+        fields, employees = seed_directory(
+            options['employees'], options['fields'], options['seed'], options['batch_size'], options['password'], report,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Created {fields} field(s) and {employees} employee(s)."))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from employee.filters import FIELD_INDEX_PREFIX, field_index
+from employee.models import EmployeeData
+from employee.schema import get_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the btree expression indexes of dynamic fields flagged as "
+        "indexed and drop the ones no longer needed. Indexes are built and "
+        "dropped concurrently so the employee table stays writable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only print the planned changes.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Field indexes are only supported on PostgreSQL.")
+
+        table = EmployeeData._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname LIKE %s",
+                [table, FIELD_INDEX_PREFIX + '%'],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+
+        wanted = {}
+        for field in get_schema():
+            if field['indexed']:
+                index = field_index(field)
+                wanted[index.name] = index
+
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for name in sorted(existing - set(wanted)):
+                self.stdout.write(f"Dropping {name}")
+                if not options['dry_run']:
+                    schema_editor.execute(
+                        "DROP INDEX CONCURRENTLY IF EXISTS %s" % schema_editor.quote_name(name)
+                    )
+            for name in sorted(set(wanted) - existing):
+                self.stdout.write(f"Creating {name}")
+                if not options['dry_run']:
+                    schema_editor.add_index(EmployeeData, wanted[name], concurrently=True)
+
+        self.stdout.write(self.style.SUCCESS(f"{len(wanted)} field index(es) in place."))
@@ -0,0 +1,259 @@
+'''
+Request instrumentation: SQL queries, template and serializer time.
+
+With `EMPLOYEE_METRICS` on, `RequestMetricsMiddleware` times every request
+and the work done for it: the SQL queries run on each database, Django
+template renders and DRF serializer output. Each response reports them in
+a `Server-Timing` header (shown by the browser's network panel), eg.
+`db;dur=4.1;desc="6 queries", template;dur=12.0, total;dur=19.8`, and they
+are aggregated per URL name into in-memory histograms that
+`/metrics` serves in the Prometheus text format. Counts are per process:
+Prometheus should scrape every worker, or run a single one.
+
+When it is off the middleware removes itself from the chain and nothing is
+patched, so requests pay nothing for it.
+'''
+
+import contextvars
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+UNRESOLVED = 'unresolved'
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.serializer = 0.0
+        # nested serializer and template calls are timed once, at the top
+        self.depth = 0
+
+
+_timings = contextvars.ContextVar('employee_metrics', default=None)
+
+
+def _timed(kind, func):
+    def wrapper(*args, **kwargs):
+        timings = _timings.get()
+        if timings is None or timings.depth:
+            return func(*args, **kwargs)
+        timings.depth += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.depth -= 1
+            setattr(timings, kind, getattr(timings, kind) + time.perf_counter() - start)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install():
+    '''
+    Time Django template renders and DRF serializer output from now on.
+    Idempotent.
+    '''
+    global _installed
+    from django.template.backends.django import Template
+    from rest_framework.serializers import BaseSerializer
+
+    with _install_lock:
+        if _installed:
+            return
+        Template.render = _timed('template', Template.render)
+        # Serializer.data and ListSerializer.data both end up here
+        BaseSerializer.data = property(_timed('serializer', BaseSerializer.data.fget))
+        _installed = True
+
+
+def _query_timer(timings):
+    def execute(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings.queries += 1
+            timings.db += time.perf_counter() - start
+    return execute
+
+
+def _time_queries(stack, timings):
+    # connections are per thread: async requests call this through
+    # sync_to_async, on the thread their ORM queries run in
+    for alias in connections.settings:
+        stack.enter_context(connections[alias].execute_wrapper(_query_timer(timings)))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class ViewStats:
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db = 0.0
+        self.template = 0.0
+        self.serializer = 0.0
+
+
+# (metric name, type, help, ViewStats attribute), in output order
+METRICS = (
+    ('ems_request_duration_seconds', 'histogram', 'Time spent handling requests.', 'duration'),
+    ('ems_request_db_queries', 'histogram', 'SQL queries run per request.', 'queries'),
+    ('ems_request_db_seconds_total', 'counter', 'Time spent running SQL queries.', 'db'),
+    ('ems_request_template_seconds_total', 'counter', 'Time spent rendering templates.', 'template'),
+    ('ems_request_serializer_seconds_total', 'counter', 'Time spent in DRF serializers.', 'serializer'),
+)
+
+
+class MetricsRegistry:
+    '''
+    Request statistics per (URL name, method) of this process.
+    '''
+
+    def __init__(self):
+        self.views = {}
+        self.lock = threading.Lock()
+
+    def observe(self, view, method, duration, timings):
+        with self.lock:
+            stats = self.views.get((view, method))
+            if stats is None:
+                stats = self.views[(view, method)] = ViewStats()
+            stats.duration.observe(duration)
+            stats.queries.observe(timings.queries)
+            stats.db += timings.db
+            stats.template += timings.template
+            stats.serializer += timings.serializer
+
+    def clear(self):
+        with self.lock:
+            self.views = {}
+
+    def render(self):
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = []
+            for name, kind, description, attribute in METRICS:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {kind}')
+                for (view, method), stats in views:
+                    labels = f'view="{_escape(view)}",method="{_escape(method)}"'
+                    value = getattr(stats, attribute)
+                    if kind == 'histogram':
+                        lines.extend(value.lines(name, labels))
+                    else:
+                        lines.append(f'{name}{{{labels}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def server_timing(timings, duration):
+    entries = [f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"']
+    if timings.template:
+        entries.append(f'template;dur={timings.template * 1000:.1f}')
+    if timings.serializer:
+        entries.append(f'serializer;dur={timings.serializer * 1000:.1f}')
+    entries.append(f'total;dur={duration * 1000:.1f}')
+    return ', '.join(entries)
+
+
+'''
+Times each request, adds its `Server-Timing` header and records it in the
+registry under the URL name. Streamed responses are timed until the view
+returns them, their body is sent later. Runs as async middleware under
+ASGI, so async views stay on the event loop.
+'''
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.EMPLOYEE_METRICS:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                _time_queries(stack, timings)
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.record(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            stack = ExitStack()
+            await sync_to_async(_time_queries)(stack, timings)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _timings.reset(token)
+        return self.record(request, response, timings, time.perf_counter() - start)
+
+    def record(self, request, response, timings, duration):
+        match = request.resolver_match
+        view = match.view_name if match and match.view_name else UNRESOLVED
+        registry.observe(view, request.method, duration, timings)
+        response['Server-Timing'] = server_timing(timings, duration)
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:46
+
+from django.db import migrations, models
+import uuid
+
+
+def create_schema_version(apps, schema_editor):
+    CacheVersion = apps.get_model('employee', 'CacheVersion')
+    CacheVersion.objects.get_or_create(scope='schema')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0003_alter_employeedata_employee_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('scope', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('token', models.UUIDField(default=uuid.uuid4)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_schema_version, migrations.RunPython.noop),
+    ]
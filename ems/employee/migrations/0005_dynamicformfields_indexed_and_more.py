@@ -0,0 +1,27 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:47
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # building the GIN index concurrently keeps the table writable
+    atomic = False
+
+    dependencies = [
+        ('employee', '0004_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dynamicformfields',
+            name='indexed',
+            field=models.BooleanField(default=False),
+        ),
+        AddIndexConcurrently(
+            model_name='employeedata',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['extra_data'], name='employee_extra_data_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
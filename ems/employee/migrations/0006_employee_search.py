@@ -0,0 +1,110 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:55
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# The search columns combine employee and auth_user columns, so they are
+# kept up to date by triggers on both tables rather than by the application.
+CREATE_TRIGGERS = '''
+CREATE OR REPLACE FUNCTION employee_search_document() RETURNS trigger AS $$
+DECLARE
+    owner auth_user%ROWTYPE;
+    person text;
+    extra_text text := '';
+BEGIN
+    SELECT * INTO owner FROM auth_user WHERE id = NEW.uid_id;
+    person := concat_ws(' ', owner.username, owner.first_name, owner.last_name, owner.email, NEW.employee_id);
+    IF jsonb_typeof(NEW.extra_data) = 'object' THEN
+        SELECT coalesce(string_agg(value, ' '), '') INTO extra_text FROM jsonb_each_text(NEW.extra_data);
+    END IF;
+
+    NEW.search_text := lower(concat_ws(' ', person, extra_text));
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', regexp_replace(person, '[^[:alnum:]]+', ' ', 'g')), 'A') ||
+        setweight(to_tsvector('simple', regexp_replace(extra_text, '[^[:alnum:]]+', ' ', 'g')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER employee_search_update
+    BEFORE INSERT OR UPDATE OF uid_id, employee_id, extra_data ON employee_employeedata
+    FOR EACH ROW EXECUTE FUNCTION employee_search_document();
+
+CREATE OR REPLACE FUNCTION employee_search_user_changed() RETURNS trigger AS $$
+BEGIN
+    -- rewriting uid_id fires employee_search_update for the user's rows
+    UPDATE employee_employeedata SET uid_id = uid_id WHERE uid_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER employee_search_user_update
+    AFTER UPDATE OF username, first_name, last_name, email ON auth_user
+    FOR EACH ROW
+    WHEN (OLD.username IS DISTINCT FROM NEW.username
+          OR OLD.first_name IS DISTINCT FROM NEW.first_name
+          OR OLD.last_name IS DISTINCT FROM NEW.last_name
+          OR OLD.email IS DISTINCT FROM NEW.email)
+    EXECUTE FUNCTION employee_search_user_changed();
+
+UPDATE employee_employeedata SET uid_id = uid_id;
+'''
+
+DROP_TRIGGERS = '''
+DROP TRIGGER IF EXISTS employee_search_user_update ON auth_user;
+DROP FUNCTION IF EXISTS employee_search_user_changed();
+DROP TRIGGER IF EXISTS employee_search_update ON employee_employeedata;
+DROP FUNCTION IF EXISTS employee_search_document();
+'''
+
+
+def create_trigram_index(apps, schema_editor):
+    '''
+    Fuzzy search needs pg_trgm, which some servers don't ship. Without it
+    the search falls back to full text matching.
+    '''
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS employee_search_text_trgm "
+            "ON employee_employeedata USING gin (search_text gin_trgm_ops)"
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS employee_search_text_trgm")
+
+
+class Migration(migrations.Migration):
+
+    # indexes are built concurrently to keep the table writable
+    atomic = False
+
+    dependencies = [
+        ('employee', '0005_dynamicformfields_indexed_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeedata',
+            name='search_text',
+            field=models.TextField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='employeedata',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        AddIndexConcurrently(
+            model_name='employeedata',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='employee_search_vector_gin'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:58
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+# `istartswith` compiles to `UPPER(col::text) LIKE UPPER('abc%')`, which only
+# an index on the same expression with text_pattern_ops can serve whatever the
+# database collation is. auth_user belongs to contrib.auth, so its indexes
+# are plain SQL, one statement each as CONCURRENTLY can't share a query.
+USER_PREFIX_COLUMNS = ('username', 'first_name', 'last_name')
+
+USER_PREFIX_INDEXES = [
+    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS employee_user_{column}_prefix '
+    f'ON auth_user (UPPER({column}::text) text_pattern_ops)'
+    for column in USER_PREFIX_COLUMNS
+]
+
+DROP_USER_PREFIX_INDEXES = [
+    f'DROP INDEX CONCURRENTLY IF EXISTS employee_user_{column}_prefix'
+    for column in USER_PREFIX_COLUMNS
+]
+
+
+class Migration(migrations.Migration):
+
+    # indexes are built concurrently to keep the tables writable
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('employee', '0006_employee_search'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='employeedata',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('employee_id'), name='text_pattern_ops'), name='employee_id_prefix'),
+        ),
+        migrations.RunSQL(USER_PREFIX_INDEXES, DROP_USER_PREFIX_INDEXES),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:00
+
+import datetime
+import math
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copies of the parsing in employee.values as of this migration, so
+# later changes to the app code can't change what the backfill writes.
+TRUE_VALUES = ('true', 'on', '1', 'yes')
+FALSE_VALUES = ('false', 'off', '0', 'no')
+
+
+def parse_number(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    return None
+
+
+def typed_columns(field_type, value):
+    columns = {'value_text': value if isinstance(value, str) else str(value)}
+    if field_type == 'number':
+        columns['value_num'] = parse_number(value)
+    elif field_type == 'date':
+        columns['value_date'] = parse_date(value)
+    elif field_type == 'checkbox':
+        columns['value_bool'] = parse_bool(value)
+    return columns
+
+
+def stored_value(extra_data, label):
+    # form saves key values by label, the API by name
+    extra_data = extra_data or {}
+    value = extra_data.get(label)
+    if value is None:
+        value = extra_data.get(label.lower().replace(' ', '_'))
+    return value
+
+
+def backfill_field_values(apps, schema_editor):
+    DynamicFormFields = apps.get_model('employee', 'DynamicFormFields')
+    EmployeeData = apps.get_model('employee', 'EmployeeData')
+    EmployeeFieldValue = apps.get_model('employee', 'EmployeeFieldValue')
+
+    fields = [
+        (field_id, label, (field_type or 'text').lower())
+        for field_id, label, field_type in DynamicFormFields.objects.values_list('id', 'field_label', 'field_type')
+    ]
+    rows = []
+    for employee_id, extra_data in EmployeeData.objects.values_list('id', 'extra_data').iterator(chunk_size=2000):
+        for field_id, label, field_type in fields:
+            value = stored_value(extra_data, label)
+            if value is not None and value != '':
+                rows.append(EmployeeFieldValue(employee_id=employee_id, field_id=field_id, **typed_columns(field_type, value)))
+        if len(rows) >= 2000:
+            EmployeeFieldValue.objects.bulk_create(rows)
+            rows = []
+    EmployeeFieldValue.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0007_employee_autocomplete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeFieldValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value_text', models.TextField()),
+                ('value_num', models.FloatField(null=True)),
+                ('value_date', models.DateField(null=True)),
+                ('value_bool', models.BooleanField(null=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='field_values', to='employee.employeedata')),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='employee.dynamicformfields')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['field', 'value_num'], name='employee_value_num'), models.Index(fields=['field', 'value_date'], name='employee_value_date'), models.Index(fields=['field', 'value_bool'], name='employee_value_bool')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='employeefieldvalue',
+            constraint=models.UniqueConstraint(fields=('employee', 'field'), name='employee_field_value_unique'),
+        ),
+        migrations.RunPython(backfill_field_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:10
+
+from django.db import migrations
+
+
+def create_employees_version(apps, schema_editor):
+    CacheVersion = apps.get_model('employee', 'CacheVersion')
+    CacheVersion.objects.get_or_create(scope='employees')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0008_employeefieldvalue'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_employees_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+# One row per (dimension, bucket) an employee row counts in, with `sign` as
+# its weight. Select/radio values are read by label (form saves) or by name
+# (API saves), the name being the label in lower case with `_` for spaces.
+BUCKETS = '''
+SELECT 'total' AS dimension, '' AS bucket, {sign} AS delta FROM {rows} r
+UNION ALL
+SELECT 'created_month', to_char(r.created_on AT TIME ZONE 'UTC', 'YYYY-MM'), {sign} FROM {rows} r
+UNION ALL
+SELECT 'field:' || f.id, v.value, {sign}
+FROM {rows} r
+CROSS JOIN (
+    SELECT id, field_label, replace(lower(field_label), ' ', '_') AS name
+    FROM employee_dynamicformfields WHERE lower(field_type) IN ('select', 'radio')
+) f
+CROSS JOIN LATERAL (SELECT coalesce(r.extra_data ->> f.field_label, r.extra_data ->> f.name) AS value) v
+WHERE v.value IS NOT NULL
+'''
+
+# Sorted upserts keep concurrent writers locking rollup rows in one order.
+APPLY_DELTAS = '''
+INSERT INTO employee_employeerollup (dimension, bucket, count)
+SELECT dimension, bucket, sum(delta) FROM ({deltas}) d
+GROUP BY dimension, bucket HAVING sum(delta) <> 0
+ORDER BY dimension, bucket
+ON CONFLICT (dimension, bucket) DO UPDATE SET count = employee_employeerollup.count + EXCLUDED.count;
+'''
+
+INSERTED = BUCKETS.format(sign=1, rows='new_rows')
+DELETED = BUCKETS.format(sign=-1, rows='old_rows')
+
+# Statement level triggers with transition tables, so a bulk insert of N
+# employees costs one upsert per touched bucket rather than N.
+CREATE_TRIGGERS = f'''
+CREATE OR REPLACE FUNCTION employee_rollup_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {APPLY_DELTAS.format(deltas=INSERTED)}
+    ELSIF TG_OP = 'DELETE' THEN
+        {APPLY_DELTAS.format(deltas=DELETED)}
+    ELSE
+        {APPLY_DELTAS.format(deltas=INSERTED + ' UNION ALL ' + DELETED)}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER employee_rollup_insert AFTER INSERT ON employee_employeedata
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_rollup_apply();
+
+CREATE TRIGGER employee_rollup_update AFTER UPDATE ON employee_employeedata
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_rollup_apply();
+
+CREATE TRIGGER employee_rollup_delete AFTER DELETE ON employee_employeedata
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_rollup_apply();
+
+-- Recount the given dimensions (every one when NULL) from scratch. Employee
+-- writes wait for the recount so no delta is lost in between.
+CREATE OR REPLACE FUNCTION employee_rollup_rebuild(dimensions text[]) RETURNS bigint AS $$
+DECLARE
+    written bigint;
+BEGIN
+    LOCK TABLE employee_employeedata IN SHARE MODE;
+    DELETE FROM employee_employeerollup WHERE dimensions IS NULL OR dimension = ANY(dimensions);
+    INSERT INTO employee_employeerollup (dimension, bucket, count)
+    SELECT dimension, bucket, sum(delta)
+    FROM ({BUCKETS.format(sign=1, rows='employee_employeedata')}) d
+    WHERE dimensions IS NULL OR dimension = ANY(dimensions)
+    GROUP BY dimension, bucket;
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END
+$$ LANGUAGE plpgsql;
+
+SELECT employee_rollup_rebuild(NULL);
+'''
+
+DROP_TRIGGERS = '''
+DROP FUNCTION IF EXISTS employee_rollup_rebuild(text[]);
+DROP TRIGGER IF EXISTS employee_rollup_insert ON employee_employeedata;
+DROP TRIGGER IF EXISTS employee_rollup_update ON employee_employeedata;
+DROP TRIGGER IF EXISTS employee_rollup_delete ON employee_employeedata;
+DROP FUNCTION IF EXISTS employee_rollup_apply();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0009_employees_cache_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=50)),
+                ('bucket', models.TextField()),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='employeerollup',
+            constraint=models.UniqueConstraint(fields=('dimension', 'bucket'), name='employee_rollup_unique'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:20
+
+from django.db import migrations
+
+
+# Employee representations embed the user, so a user rename also moves the
+# employee's updated_on, which ETags and change tracking rely on.
+TOUCH_EMPLOYEES = '''
+CREATE OR REPLACE FUNCTION employee_search_user_changed() RETURNS trigger AS $$
+BEGIN
+    -- rewriting uid_id fires employee_search_update for the user's rows
+    UPDATE employee_employeedata SET uid_id = uid_id, updated_on = clock_timestamp() WHERE uid_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+RESTORE = '''
+CREATE OR REPLACE FUNCTION employee_search_user_changed() RETURNS trigger AS $$
+BEGIN
+    UPDATE employee_employeedata SET uid_id = uid_id WHERE uid_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0010_employeerollup'),
+    ]
+
+    operations = [
+        migrations.RunSQL(TOUCH_EMPLOYEES, RESTORE),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+# Statement level triggers log every written employee id, so bulk writes,
+# cascaded user deletes and the search triggers' updates are all captured.
+CREATE_TRIGGERS = '''
+CREATE OR REPLACE FUNCTION employee_change_log() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO employee_employeechange (employee_pk, action, txid, changed_on)
+        SELECT id, 'delete', txid_current(), clock_timestamp() FROM old_rows ORDER BY id;
+    ELSE
+        INSERT INTO employee_employeechange (employee_pk, action, txid, changed_on)
+        SELECT id, 'upsert', txid_current(), clock_timestamp() FROM new_rows ORDER BY id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER employee_change_insert AFTER INSERT ON employee_employeedata
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_change_log();
+
+CREATE TRIGGER employee_change_update AFTER UPDATE ON employee_employeedata
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_change_log();
+
+CREATE TRIGGER employee_change_delete AFTER DELETE ON employee_employeedata
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_change_log();
+'''
+
+DROP_TRIGGERS = '''
+DROP TRIGGER IF EXISTS employee_change_insert ON employee_employeedata;
+DROP TRIGGER IF EXISTS employee_change_update ON employee_employeedata;
+DROP TRIGGER IF EXISTS employee_change_delete ON employee_employeedata;
+DROP FUNCTION IF EXISTS employee_change_log();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0011_employee_updated_on_follows_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('employee_pk', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=10)),
+                ('txid', models.BigIntegerField()),
+                ('changed_on', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['txid', 'id'], name='employee_change_cursor'), models.Index(fields=['changed_on'], name='employee_change_changed_on')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+# The change log now covers form fields too, and tells creates from updates.
+# `resource` and the row id come from trigger arguments, the action from
+# TG_OP. pg_notify wakes up the server-sent event broadcasters, see events.py.
+CREATE_TRIGGERS = '''
+CREATE OR REPLACE FUNCTION employee_change_log() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO employee_directorychange (resource, object_pk, action, txid, changed_on)
+        SELECT TG_ARGV[0], id, 'delete', txid_current(), clock_timestamp() FROM old_rows ORDER BY id;
+    ELSE
+        INSERT INTO employee_directorychange (resource, object_pk, action, txid, changed_on)
+        SELECT TG_ARGV[0], id, CASE TG_OP WHEN 'INSERT' THEN 'create' ELSE 'update' END, txid_current(), clock_timestamp() FROM new_rows ORDER BY id;
+    END IF;
+    PERFORM pg_notify('directory_changes', TG_ARGV[0]);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER employee_change_insert ON employee_employeedata;
+DROP TRIGGER employee_change_update ON employee_employeedata;
+DROP TRIGGER employee_change_delete ON employee_employeedata;
+
+CREATE TRIGGER employee_change_insert AFTER INSERT ON employee_employeedata
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_change_log('employee');
+
+CREATE TRIGGER employee_change_update AFTER UPDATE ON employee_employeedata
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_change_log('employee');
+
+CREATE TRIGGER employee_change_delete AFTER DELETE ON employee_employeedata
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_change_log('employee');
+
+CREATE TRIGGER field_change_insert AFTER INSERT ON employee_dynamicformfields
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_change_log('field');
+
+CREATE TRIGGER field_change_update AFTER UPDATE ON employee_dynamicformfields
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_change_log('field');
+
+CREATE TRIGGER field_change_delete AFTER DELETE ON employee_dynamicformfields
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_change_log('field');
+
+UPDATE employee_directorychange SET action = 'update' WHERE action = 'upsert';
+'''
+
+DROP_TRIGGERS = '''
+DROP TRIGGER IF EXISTS field_change_insert ON employee_dynamicformfields;
+DROP TRIGGER IF EXISTS field_change_update ON employee_dynamicformfields;
+DROP TRIGGER IF EXISTS field_change_delete ON employee_dynamicformfields;
+DELETE FROM employee_directorychange WHERE resource = 'field';
+UPDATE employee_directorychange SET action = 'upsert' WHERE action <> 'delete';
+
+CREATE OR REPLACE FUNCTION employee_change_log() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO employee_employeechange (employee_pk, action, txid, changed_on)
+        SELECT id, 'delete', txid_current(), clock_timestamp() FROM old_rows ORDER BY id;
+    ELSE
+        INSERT INTO employee_employeechange (employee_pk, action, txid, changed_on)
+        SELECT id, 'upsert', txid_current(), clock_timestamp() FROM new_rows ORDER BY id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0012_employeechange'),
+    ]
+
+    operations = [
+        migrations.RenameModel('EmployeeChange', 'DirectoryChange'),
+        migrations.RenameField('directorychange', 'employee_pk', 'object_pk'),
+        migrations.AddField(
+            model_name='directorychange',
+            name='resource',
+            field=models.CharField(choices=[('employee', 'Employee'), ('field', 'Form field')], default='employee', max_length=10),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='directorychange',
+            name='action',
+            field=models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=10),
+        ),
+        migrations.RenameIndex(
+            model_name='directorychange',
+            new_name='directory_change_cursor',
+            old_name='employee_change_cursor',
+        ),
+        migrations.AddIndex(
+            model_name='directorychange',
+            index=models.Index(fields=['resource', 'txid', 'id'], name='directory_change_resource'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.25 on 2026-10-18 19:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+# The text_pattern_ops indexes of migration 0007 serve the prefix match but
+# not the ORDER BY of each autocomplete branch, which sorts in the database
+# collation: Postgres had to sort every match before the LIMIT. In the "C"
+# collation one plain btree index does both, so autocomplete now compares
+# and orders `UPPER(col::text) COLLATE "C"`. The tie breaker is part of the
+# index so the whole ORDER BY comes from it.
+USER_PREFIX_COLUMNS = ('username', 'first_name', 'last_name')
+
+USER_PREFIX_INDEXES = [
+    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS employee_user_{column}_prefix_c '
+    f'ON auth_user ((UPPER({column}::text) COLLATE "C"), id)'
+    for column in USER_PREFIX_COLUMNS
+]
+
+DROP_USER_PREFIX_INDEXES = [
+    f'DROP INDEX CONCURRENTLY IF EXISTS employee_user_{column}_prefix_c'
+    for column in USER_PREFIX_COLUMNS
+]
+
+# the indexes of migration 0007
+OLD_USER_PREFIX_INDEXES = [
+    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS employee_user_{column}_prefix '
+    f'ON auth_user (UPPER({column}::text) text_pattern_ops)'
+    for column in USER_PREFIX_COLUMNS
+]
+
+DROP_OLD_USER_PREFIX_INDEXES = [
+    f'DROP INDEX CONCURRENTLY IF EXISTS employee_user_{column}_prefix'
+    for column in USER_PREFIX_COLUMNS
+]
+
+
+class Migration(migrations.Migration):
+
+    # indexes are built concurrently to keep the tables writable
+    atomic = False
+
+    dependencies = [
+        ('employee', '0013_directorychange'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='employeedata',
+            index=models.Index(django.db.models.functions.comparison.Collate(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('employee_id', models.TextField())), 'C'), models.F('id'), name='employee_id_prefix_c'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='employeedata',
+            name='employee_id_prefix',
+        ),
+        migrations.RunSQL(USER_PREFIX_INDEXES, DROP_USER_PREFIX_INDEXES),
+        migrations.RunSQL(DROP_OLD_USER_PREFIX_INDEXES, OLD_USER_PREFIX_INDEXES),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.25 on 2026-10-18 20:05
+
+import uuid
+
+from django.db import migrations
+from django.db.models import F
+from django.utils import timezone
+
+# frozen copy of ordering.ORDER_GAP
+ORDER_GAP = 1024
+
+
+def renumber_negative_orders(apps, schema_editor):
+    '''
+    Inserting in front of the first field used to give it a negative order,
+    after which order 0 no longer meant the top. Renumber forms that have
+    one, like rebalance_field_order.
+    '''
+    DynamicFormFields = apps.get_model('employee', 'DynamicFormFields')
+    CacheVersion = apps.get_model('employee', 'CacheVersion')
+    if not DynamicFormFields.objects.filter(field_order__lt=0).exists():
+        return
+    fields = list(DynamicFormFields.objects.order_by('field_order', 'id'))
+    for position, field in enumerate(fields):
+        field.field_order = (position + 1) * ORDER_GAP
+    DynamicFormFields.objects.bulk_update(fields, ['field_order'])
+    # cached schemas hold the old order
+    CacheVersion.objects.filter(scope='schema').update(
+        version=F('version') + 1, token=uuid.uuid4(), updated_on=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0014_autocomplete_c_collation'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_negative_orders, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,10 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Cast, Collate, Upper
 
 # Create your models here.
 
@@ -16,6 +21,15 @@ FORM_FIELD_TYPES = [
     ("password","Password"),
 ]
 
+'''
+Default manager of employee data. The search columns are maintained by
+database triggers and only needed in search filters, don't load them.
+'''
+class EmployeeDataManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector', 'search_text')
+
+
 '''
 Model to store employee data
 '''
@@ -25,10 +39,24 @@ class EmployeeData(models.Model):
     created_on = models.DateTimeField(null=False,blank=False,auto_now_add=True)
     updated_on = models.DateTimeField(null=False,blank=False,auto_now=True)
     extra_data = models.JSONField(default=dict)
+    # filled by the employee_search_update triggers, see search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+    search_text = models.TextField(null=True, editable=False)
 
+    objects = EmployeeDataManager()
 
     class Meta:
         ordering = ['-id']
+        indexes = [
+            # serves `extra_data @> {...}` containment filters
+            GinIndex(fields=['extra_data'], opclasses=['jsonb_path_ops'], name='employee_extra_data_gin'),
+            GinIndex(fields=['search_vector'], name='employee_search_vector_gin'),
+            # serves the employee_id prefix branch of autocomplete, in its order
+            models.Index(
+                Collate(Upper(Cast('employee_id', models.TextField())), 'C'), models.F('id'),
+                name='employee_id_prefix_c',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.uid.username} - {self.employee_id}"
@@ -43,12 +71,117 @@ class DynamicFormFields(models.Model):
     field_is_required = models.BooleanField(default=False)
     field_order = models.IntegerField(null=False,blank=False)
     extra = models.JSONField(default=dict)
+    # opt-in btree expression index on the field value, see sync_field_indexes
+    indexed = models.BooleanField(default=False)
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the stored label and type, see signals.dynamic_field_retyped
+        instance._stored_definition = (instance.__dict__.get('field_label'), instance.__dict__.get('field_type'))
+        return instance
+
 
     class Meta:
         ordering = ['field_order', 'id']
 
     def __str__(self):
-        return f"{self.field_label} ({self.field_type})"
\ No newline at end of file
+        return f"{self.field_label} ({self.field_type})"
+
+
+'''
+Model to store cache version counters shared by every worker process.
+Each scope (eg. the dynamic form schema) has a single row whose counter
+and token change whenever the data cached under that scope changes.
+'''
+class CacheVersion(models.Model):
+    scope = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    token = models.UUIDField(default=uuid.uuid4)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.scope} (v{self.version})"
+
+
+'''
+Typed copy of the dynamic field values of an employee, one row per filled
+field. `extra_data` stays the source of truth, this table is rewritten from
+it on every employee write (see values.py) so number and date fields can be
+filtered, sorted and aggregated through plain btree indexes.
+'''
+class EmployeeFieldValue(models.Model):
+    employee = models.ForeignKey(EmployeeData, on_delete=models.CASCADE, related_name='field_values')
+    field = models.ForeignKey(DynamicFormFields, on_delete=models.CASCADE, related_name='values')
+    value_text = models.TextField()
+    value_num = models.FloatField(null=True)
+    value_date = models.DateField(null=True)
+    value_bool = models.BooleanField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'field'], name='employee_field_value_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['field', 'value_num'], name='employee_value_num'),
+            models.Index(fields=['field', 'value_date'], name='employee_value_date'),
+            models.Index(fields=['field', 'value_bool'], name='employee_value_bool'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.field_id}: {self.value_text}"
+
+
+'''
+Precomputed employee headcounts per report dimension and bucket, eg. the
+employees of each option of a select field or of each join month. Kept up to
+date by database triggers on every employee write, see rollups.py.
+'''
+class EmployeeRollup(models.Model):
+    dimension = models.CharField(max_length=50)
+    bucket = models.TextField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'bucket'], name='employee_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.bucket}: {self.count}"
+
+
+'''
+Append-only log of directory writes (employees and form fields) for
+incremental sync and push, including tombstones for deleted rows. Rows are
+written by database triggers, see changes.py.
+'''
+class DirectoryChange(models.Model):
+    EMPLOYEE = 'employee'
+    FIELD = 'field'
+    RESOURCES = [(EMPLOYEE, 'Employee'), (FIELD, 'Form field')]
+
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = [(CREATE, 'Create'), (UPDATE, 'Update'), (DELETE, 'Delete')]
+
+    id = models.BigAutoField(primary_key=True)
+    resource = models.CharField(max_length=10, choices=RESOURCES)
+    object_pk = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    # id of the writing transaction, orders the feed by commit visibility
+    txid = models.BigIntegerField()
+    changed_on = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['txid', 'id'], name='directory_change_cursor'),
+            models.Index(fields=['resource', 'txid', 'id'], name='directory_change_resource'),
+            models.Index(fields=['changed_on'], name='employee_change_changed_on'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.resource} {self.object_pk}"
@@ -0,0 +1,77 @@
+'''
+Sparse ordering of dynamic form fields.
+
+Fields are numbered with gaps of `ORDER_GAP`, so moving or inserting a field
+only writes that field: it takes a free value between its new neighbours.
+Neighbouring rows are renumbered only when a gap is exhausted, or on demand
+with the `rebalance_field_order` command.
+'''
+
+from django.db import transaction
+from django.db.models import Max, Min, Q
+
+from .models import DynamicFormFields
+
+ORDER_GAP = 1024
+
+
+def spaced_order(position):
+    '''
+    Order value of the field at a 0-based position in a full listing.
+    '''
+    return (position + 1) * ORDER_GAP
+
+
+def _neighbours(target, exclude_id):
+    fields = DynamicFormFields.objects.all()
+    if exclude_id:
+        fields = fields.exclude(id=exclude_id)
+    bounds = fields.aggregate(
+        before=Max('field_order', filter=Q(field_order__lt=target)),
+        after=Min('field_order', filter=Q(field_order__gte=target)),
+    )
+    return bounds['before'], bounds['after']
+
+
+def order_before(target, exclude_id=None):
+    '''
+    Order value placing a field after every field ordered below `target`
+    and before every field ordered at or above it, which is where the old
+    "shift everything >= target" renumbering put it. Rebalances first when
+    there is no free value left in between. Values never go below 0, so
+    `target=0` always means the top.
+    '''
+    target = max(target, 0)
+    before, after = _neighbours(target, exclude_id)
+    if after is None:
+        return target
+    if before is None:
+        # in front of the first field, halfway to 0
+        if after > 0:
+            return after // 2
+    elif after > target:
+        return target
+    elif after - before > 1:
+        return (before + after) // 2
+
+    # renumbering moves every value, follow the field we must precede
+    anchor = DynamicFormFields.objects.filter(field_order=after).exclude(id=exclude_id).order_by('id').first()
+    rebalance_field_order()
+    anchor.refresh_from_db(fields=['field_order'])
+    return order_before(anchor.field_order, exclude_id)
+
+
+def rebalance_field_order():
+    '''
+    Renumber every field with even gaps, keeping the current order.
+    '''
+    with transaction.atomic():
+        fields = list(DynamicFormFields.objects.select_for_update().order_by('field_order', 'id'))
+        changed = []
+        for position, field in enumerate(fields):
+            if field.field_order != spaced_order(position):
+                field.field_order = spaced_order(position)
+                changed.append(field)
+        if changed:
+            DynamicFormFields.objects.bulk_update(changed, ['field_order'])
+    return len(changed)
@@ -0,0 +1,187 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.response import Response
+
+from .counting import aestimate_count, estimate_count
+from .filters import ORDERING_PARAM, SORT_ANNOTATION
+
+
+'''
+Keyset pagination over the employee directory.
+
+Pages are fetched with `WHERE id < <cursor position> ORDER BY id DESC LIMIT n`,
+so deep pages cost the same as the first one. Search results are keyed on
+`(-search_rank, -id)` instead, and lists sorted by a dynamic field
+(`?ordering=`, see filters.sort_employees) on `(sort_value, id)`, both
+descending for `-<field>`. Unlike DRF's cursor, which only keeps the first
+ordering key and skips ties with an offset (capped at `offset_cutoff`), the
+cursor position holds every key of the ordering, so any number of equal ranks
+or values pages through. The total count is only computed when asked
+for with `?count=true` and is estimated on large tables, `?count=exact`
+forces a `COUNT(*)`. `apaginate_queryset` is the
+same pagination for async views.
+'''
+class EmployeeCursorPagination(CursorPagination):
+    ordering = '-id'
+    count_query_param = 'count'
+    count_by_default = False
+
+    def count_requested(self, request):
+        '''
+        Return `(count, exact)` flags of the request.
+        '''
+        requested = request.query_params.get(self.count_query_param, '').lower()
+        count = requested in ('1', 'true', 'yes', 'exact') or (self.count_by_default and not requested)
+        return count, requested == 'exact'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        self.count_is_exact = None
+        count, exact = self.count_requested(request)
+        if count:
+            self.count, self.count_is_exact = estimate_count(queryset, exact=exact)
+
+        queryset = self.page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        offset = self.cursor.offset if self.cursor else 0
+        return self.set_page(list(queryset[offset:offset + self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        '''
+        Async variant of `paginate_queryset`.
+        '''
+        self.count = None
+        self.count_is_exact = None
+        count, exact = self.count_requested(request)
+        if count:
+            self.count, self.count_is_exact = await aestimate_count(queryset, exact=exact)
+
+        queryset = self.page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        offset = self.cursor.offset if self.cursor else 0
+        return self.set_page([obj async for obj in queryset[offset:offset + self.page_size + 1]])
+
+    def page_queryset(self, queryset, request, view):
+        '''
+        The queryset ordered and filtered past the request cursor, following
+        the steps of `CursorPagination.paginate_queryset`. None when the
+        request isn't paginated.
+        '''
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor.reverse if self.cursor else False
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.cursor and self.cursor.position is not None:
+            queryset = self.past_position(queryset, self.cursor.position, reverse)
+        return queryset
+
+    def past_position(self, queryset, position, reverse):
+        '''
+        Filter the queryset past the cursor position with the row comparison
+        `(key1, key2, ...) > (value1, value2, ...)` of the ordering keys,
+        spelled out key by key so each can have its own direction: `key1 > value1 OR (key1 = value1 AND key2 > value2) ...`,
+        `<` for descending keys, flipped when paging backwards.
+        '''
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = {}
+        for order, value in zip(self.ordering, values):
+            attr = order.lstrip('-')
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{attr}__{lookup}': value})
+            equal[attr] = value
+        try:
+            return queryset.filter(condition)
+        except (TypeError, ValueError, ValidationError):
+            # values that don't fit the keys
+            raise NotFound(self.invalid_cursor_message)
+
+    def set_page(self, results):
+        offset = self.cursor.offset if self.cursor else 0
+        reverse = self.cursor.reverse if self.cursor else False
+        current_position = self.cursor.position if self.cursor else None
+        self.page = results[:self.page_size]
+
+        following_position = None
+        has_following_position = len(results) > len(self.page)
+        if has_following_position:
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        # every ordering key, as text like DRF's single key position
+        values = []
+        for order in ordering:
+            attr = order.lstrip('-')
+            values.append(str(instance[attr] if isinstance(instance, dict) else getattr(instance, attr)))
+        return json.dumps(values)
+
+    def get_ordering(self, request, queryset, view):
+        if SORT_ANNOTATION in queryset.query.annotations:
+            if request.query_params.get(ORDERING_PARAM, '').startswith('-'):
+                return (f'-{SORT_ANNOTATION}', '-id')
+            return (SORT_ANNOTATION, 'id')
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', '-id')
+        return super().get_ordering(request, queryset, view)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_exact'] = self.count_is_exact
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        response_schema['properties']['count_is_exact'] = {'type': 'boolean'}
+        return response_schema
+
+
+'''
+Cursor pagination for the HTML employee directory.
+'''
+class EmployeeListPagination(EmployeeCursorPagination):
+    page_size = 3
+    count_by_default = True
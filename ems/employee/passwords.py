@@ -0,0 +1,135 @@
+'''
+Password hashing for bulk user creation.
+
+Password hashers are slow on purpose (PBKDF2 runs hundreds of thousands of
+iterations) and a hash keeps one core busy, so hashing, not the database,
+bounds bulk onboarding. `hash_passwords` spreads a batch over a process
+pool of `EMPLOYEE_PASSWORD_HASH_WORKERS` processes, all cores by default.
+Workers are spawned rather than forked, so they never share the parent's
+database connections, and live as long as the parent process.
+
+Imports may also bring passwords already hashed (`HASHED`), or no password
+at all (`UNUSABLE`): such users set their first one through the password
+reset emails of the login page (`accounts.forms.SetPasswordResetForm`).
+Their unusable password carries `IMPORTED_PASSWORD_PREFIX`, so the reset
+form can tell them from accounts disabled with `set_unusable_password()`.
+'''
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    UNUSABLE_PASSWORD_PREFIX,
+    UNUSABLE_PASSWORD_SUFFIX_LENGTH,
+    identify_hasher,
+    make_password,
+)
+from django.utils.crypto import get_random_string
+
+PLAIN = 'plain'
+HASHED = 'hashed'
+UNUSABLE = 'unusable'
+
+PASSWORD_MODES = (PLAIN, HASHED, UNUSABLE)
+
+# unusable like any password starting with UNUSABLE_PASSWORD_PREFIX
+IMPORTED_PASSWORD_PREFIX = f'{UNUSABLE_PASSWORD_PREFIX}imported$'
+
+# smaller batches are hashed inline, shipping them costs more than it saves
+MIN_POOL_BATCH = 8
+
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+
+def hash_workers():
+    return settings.EMPLOYEE_PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+
+
+def _setup_worker():
+    # spawned workers start from scratch, DJANGO_SETTINGS_MODULE is inherited
+    import django
+    django.setup()
+
+
+def _get_executor(workers):
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context('spawn'), initializer=_setup_worker,
+            )
+            _executor_workers = workers
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def hash_passwords(passwords):
+    '''
+    `make_password` of every raw password, in order.
+    '''
+    passwords = list(passwords)
+    workers = hash_workers()
+    if workers < 2 or len(passwords) < MIN_POOL_BATCH:
+        return [make_password(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    try:
+        return list(_get_executor(workers).map(make_password, passwords, chunksize=chunksize))
+    except BrokenProcessPool:
+        # a worker died (eg. killed by the OOM killer), start afresh next time
+        _reset_executor()
+        return [make_password(password) for password in passwords]
+
+
+def imported_password():
+    '''
+    Unusable password of a user imported without one.
+    '''
+    return IMPORTED_PASSWORD_PREFIX + get_random_string(UNUSABLE_PASSWORD_SUFFIX_LENGTH)
+
+
+def awaits_first_password(user):
+    '''
+    True for users imported without a password who never set one.
+    '''
+    return (user.password or '').startswith(IMPORTED_PASSWORD_PREFIX)
+
+
+def is_password_hash(value):
+    try:
+        identify_hasher(value)
+    except ValueError:
+        return False
+    return True
+
+
+def prepare_passwords(values, mode=PLAIN):
+    '''
+    Values to store in `password` for a batch of users: `PLAIN` passwords
+    are hashed, `HASHED` ones kept as they are, `UNUSABLE` users get an
+    unusable password whatever the value, marked as imported.
+    '''
+    if mode == PLAIN:
+        return hash_passwords(values)
+    if mode == HASHED:
+        values = list(values)
+        for value in values:
+            if not is_password_hash(value):
+                raise ValueError("Password is not a hash of a configured hasher")
+        return values
+    if mode == UNUSABLE:
+        return [imported_password() for _ in values]
+    raise ValueError(f"Unknown password mode {mode!r}")
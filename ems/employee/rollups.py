@@ -0,0 +1,82 @@
+'''
+Headcount reports served from incrementally maintained rollups.
+
+`EmployeeRollup` holds one count per (dimension, bucket): the `total`
+headcount, employees per `created_month` (YYYY-MM) and employees per value
+of every select/radio field (`field:<id>`). Statement level triggers created
+in migration 0010 apply the deltas of every insert, update and delete of
+`employee_employeedata`, so reading a report costs one query over its
+buckets. `rebuild_rollups` recounts from scratch to correct any drift, and
+drops the buckets of deleted fields.
+'''
+
+from django.db import connection
+
+from .models import EmployeeRollup
+from .schema import get_schema
+
+TOTAL = 'total'
+CREATED_MONTH = 'created_month'
+
+ROLLUP_FIELD_TYPES = ('select', 'radio')
+
+
+def field_dimension(field_id):
+    return f'field:{field_id}'
+
+
+def report_dimensions(schema=None):
+    '''
+    Reports that can be read, keyed by the name used in the API.
+    '''
+    schema = schema or get_schema()
+    dimensions = {CREATED_MONTH: {'dimension': CREATED_MONTH, 'label': 'Join month', 'field': None}}
+    for field in schema:
+        if field['field_type'] in ROLLUP_FIELD_TYPES:
+            dimensions[field['name']] = {
+                'dimension': field_dimension(field['id']),
+                'label': field['field_label'],
+                'field': field,
+            }
+    return dimensions
+
+
+def headcount_report(name, schema=None):
+    '''
+    Buckets of one report with their headcount, or None for an unknown
+    report. Field reports list every option, counting employees without a
+    value as `unset`.
+    '''
+    report = report_dimensions(schema).get(name)
+    if report is None:
+        return None
+
+    counts, total = {}, 0
+    for dimension, bucket, count in EmployeeRollup.objects.filter(
+        dimension__in=[report['dimension'], TOTAL], count__gt=0
+    ).values_list('dimension', 'bucket', 'count'):
+        if dimension == TOTAL:
+            total = count
+        else:
+            counts[bucket] = count
+
+    field = report['field']
+    if field is None:
+        groups = [{'bucket': bucket, 'count': counts[bucket]} for bucket in sorted(counts)]
+    else:
+        # options first, in their configured order, then legacy values
+        buckets = list(field['options']) + sorted(set(counts) - set(field['options']))
+        groups = [{'bucket': bucket, 'count': counts.get(bucket, 0)} for bucket in buckets]
+        groups.append({'bucket': None, 'count': total - sum(counts.values())})
+
+    return {'report': name, 'label': report['label'], 'total': total, 'groups': groups}
+
+
+def rebuild_rollups(dimensions=None):
+    '''
+    Recount the given rollup dimensions, all of them by default. Employee
+    writes wait until the recount commits. Returns the number of buckets.
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT employee_rollup_rebuild(%s::text[])', [dimensions])
+        return cursor.fetchone()[0]
@@ -0,0 +1,186 @@
+'''
+Read replica routing.
+
+When a `replica` database is configured (`DB_REPLICA_HOST`), read only
+paths opt in with `prefer_replica()`, or `ReplicaReadMixin` for viewsets,
+and their ORM reads go to the replica. Everything else stays on the
+primary. The routing state belongs to the request (`DatabaseRoutingMiddleware`
+opens it): once the request writes, its reads go back to the primary, so a
+request always reads its own writes. Only read only paths opt in, never a
+read-modify-write transaction. After a write the response also sets a short lived cookie keeping
+that client's next requests on the primary while the replica catches up.
+'''
+
+import contextvars
+import logging
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+
+PRIMARY_COOKIE = 'ems_primary'
+
+logger = logging.getLogger('employee.routing')
+
+
+class RoutingState:
+
+    def __init__(self, pinned=False):
+        # the request asked for the replica
+        self.replica = False
+        # the request has written, or came back right after a write
+        self.wrote = False
+        self.pinned = pinned
+        # executed queries per database alias
+        self.queries = {}
+
+
+_state = contextvars.ContextVar('employee_routing', default=None)
+
+
+def _target(settings_dict):
+    return settings_dict['NAME'], settings_dict['HOST'], settings_dict['PORT']
+
+
+def replica_configured():
+    '''
+    Whether a replica distinct from the primary is configured. A test
+    mirror is the primary itself, reached through another connection that
+    can't see the test transaction.
+    '''
+    databases = connections.settings
+    return REPLICA in databases and _target(databases[REPLICA]) != _target(databases[DEFAULT_DB_ALIAS])
+
+
+def current_state():
+    return _state.get()
+
+
+@contextmanager
+def routing_scope(pinned=False):
+    state = RoutingState(pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def prefer_replica():
+    '''
+    Send the rest of the current request's reads to the replica.
+    '''
+    state = _state.get()
+    if state is not None:
+        state.replica = True
+
+
+def read_alias():
+    '''
+    Database the current request reads from.
+    '''
+    state = _state.get()
+    if state is None or not state.replica or state.wrote or state.pinned or not replica_configured():
+        return DEFAULT_DB_ALIAS
+    return REPLICA
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA:
+            return False
+        return None
+
+
+'''
+Viewset mixin reading the actions listed in `replica_actions` from the
+replica. Authentication and permission checks still read the primary, so a
+user created a moment ago can sign in before the replica has them.
+'''
+class ReplicaReadMixin:
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            prefer_replica()
+
+
+def _counter(alias, state):
+    def count(execute, sql, params, many, context):
+        state.queries[alias] = state.queries.get(alias, 0) + 1
+        return execute(sql, params, many, context)
+    return count
+
+
+def _count_queries(stack, state):
+    # connections are per thread: async requests call this through
+    # sync_to_async, on the thread their ORM queries run in
+    for alias in connections.settings:
+        stack.enter_context(connections[alias].execute_wrapper(_counter(alias, state)))
+
+
+'''
+Opens the routing state of each request and reports where its queries ran,
+in the `X-DB-Route` response header and the `employee.routing` log, eg.
+`replica=3, default=1; replica-preferred`. Flags tell the requests that
+asked for the replica, wrote, or came pinned to the primary. Runs as
+async middleware under ASGI, so async views stay on the event loop.
+'''
+class DatabaseRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_scope(PRIMARY_COOKIE in request.COOKIES) as state, ExitStack() as stack:
+            _count_queries(stack, state)
+            response = self.get_response(request)
+        return self.report(request, response, state)
+
+    async def __acall__(self, request):
+        with routing_scope(PRIMARY_COOKIE in request.COOKIES) as state:
+            stack = ExitStack()
+            await sync_to_async(_count_queries)(stack, state)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        return self.report(request, response, state)
+
+    def report(self, request, response, state):
+        route = ', '.join(f"{alias}={count}" for alias, count in sorted(state.queries.items())) or 'none'
+        flags = [name for name, on in (
+            ('replica-preferred', state.replica), ('wrote', state.wrote), ('pinned', state.pinned),
+        ) if on]
+        route = '; '.join([route] + flags)
+        response['X-DB-Route'] = route
+        logger.info("%s %s %s", request.method, request.path, route)
+        if state.wrote and replica_configured():
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.DB_REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,147 @@
+'''
+Process-wide registry of the dynamic form schema.
+
+The parsed `DynamicFormFields` rows are kept in memory and reused until the
+schema version counter (see `versions.py`) changes, so a request only pays
+for a single primary key lookup instead of re-reading and re-parsing the
+whole field table. Async views use `aget_schema`, which shares the same
+cache and lets a single coroutine per event loop reload it.
+'''
+
+import asyncio
+import threading
+import weakref
+
+from . import versions
+from .models import DynamicFormFields
+
+
+def parse_options(extra):
+    '''
+    Return the options of a select/radio field as a list of strings.
+    Options are stored either as a comma separated string or as a list.
+    '''
+    options = extra.get('options', '') if isinstance(extra, dict) else ''
+    if isinstance(options, str):
+        return [o.strip() for o in options.split(',') if o.strip()]
+    if isinstance(options, list):
+        return [str(o) for o in options]
+    return []
+
+
+def field_name(label):
+    '''
+    API name of a dynamic field, derived from its label.
+    '''
+    return label.lower().replace(" ", "_")
+
+
+'''
+Immutable snapshot of the dynamic fields for one schema version.
+'''
+class FormSchema:
+
+    def __init__(self, version, token, fields):
+        self.version = version
+        self.token = token
+        self.fields = tuple(fields)
+        self.by_label = {f['field_label']: f for f in self.fields}
+        self._compiled = {}
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def get(self, label):
+        return self.by_label.get(label)
+
+    def compiled(self, key, factory):
+        '''
+        Return the object built by `factory` for this schema version, building
+        it on first use. Dropped together with the schema when it changes.
+        '''
+        try:
+            return self._compiled[key]
+        except KeyError:
+            return self._compiled.setdefault(key, factory())
+
+
+def describe_field(row):
+    '''
+    Add the parsed keys (lower case type, API name, options list) to a
+    `DynamicFormFields` row dict.
+    '''
+    row['field_type'] = (row['field_type'] or 'text').lower()
+    row['name'] = field_name(row['field_label'])
+    row['options'] = parse_options(row['extra'])
+    return row
+
+
+def _load_fields():
+    return [describe_field(row) for row in DynamicFormFields.objects.order_by('field_order', 'id').values()]
+
+
+_lock = threading.Lock()
+_cached = None
+
+
+def get_schema():
+    '''
+    Return the current `FormSchema`, reloading it only when the schema
+    version stored in the database has moved on.
+    '''
+    global _cached
+    version, token = versions.current(versions.SCHEMA)
+    cached = _cached
+    if cached is not None and token is not None and cached.token == token:
+        return cached
+
+    schema = FormSchema(version, token, _load_fields())
+    with _lock:
+        _cached = schema
+    return schema
+
+
+async def _aload_fields():
+    return [describe_field(row) async for row in DynamicFormFields.objects.order_by('field_order', 'id').values()]
+
+
+_reload_locks = weakref.WeakKeyDictionary()
+
+
+async def aget_schema():
+    '''
+    Async variant of `get_schema`. Coroutines finding a stale schema wait
+    for the first one to reload it instead of all reading the field table.
+    '''
+    global _cached
+    version, token = await versions.acurrent(versions.SCHEMA)
+    cached = _cached
+    if cached is not None and token is not None and cached.token == token:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    reload_lock = _reload_locks.get(loop)
+    if reload_lock is None:
+        reload_lock = _reload_locks[loop] = asyncio.Lock()
+    async with reload_lock:
+        cached = _cached
+        if cached is not None and token is not None and cached.token == token:
+            return cached
+        schema = FormSchema(version, token, await _aload_fields())
+        with _lock:
+            _cached = schema
+    return schema
+
+
+def bump_schema_version():
+    versions.bump(versions.SCHEMA)
+
+
+def schema_change():
+    '''
+    Context manager for multi-row schema edits, bumps the version once.
+    '''
+    return versions.bump_once(versions.SCHEMA)
@@ -0,0 +1,143 @@
+'''
+Ranked `q` search over employees.
+
+`EmployeeData.search_vector` holds the username, names, email, employee id
+(weight A) and the dynamic field values (weight B), and `search_text` the
+same text in lower case for trigram matching. Both are maintained by the
+database triggers created in migration 0006.
+'''
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, FloatField, TextField, Value
+from django.db.models.functions import Cast, Collate, Upper
+
+from .models import EmployeeData
+
+SEARCH_CONFIG = 'simple'
+
+_trigram_available = {}
+
+
+def trigram_available(using='default'):
+    '''
+    Whether pg_trgm is installed, checked once per process.
+    '''
+    if using not in _trigram_available:
+        connection = connections[using]
+        available = False
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                available = cursor.fetchone() is not None
+        _trigram_available[using] = available
+    return _trigram_available[using]
+
+
+def search_terms(q):
+    # same word splitting as the trigger building the vector
+    return re.findall(r'[^\W_]+', q.lower())
+
+
+def search_employees(queryset, q, fuzzy=False):
+    '''
+    Filter an `EmployeeData` queryset by `q` and annotate it with
+    `search_rank`. Every word must match, the last one as a prefix so
+    partially typed queries already find results. `fuzzy` uses trigram
+    similarity instead, tolerating typos, when pg_trgm is available.
+    '''
+    q = (q or '').strip()
+    if not q:
+        return queryset
+
+    if fuzzy and trigram_available(queryset.db):
+        # `%>` can use the trigram index, the similarity only ranks.
+        # Ranks are cast to float8 so they survive the round trip through
+        # a pagination cursor.
+        rank = Cast(TrigramWordSimilarity(q.lower(), 'search_text'), FloatField())
+        return queryset.filter(search_text__trigram_word_similar=q.lower()).annotate(search_rank=rank)
+
+    terms = search_terms(q)
+    if not terms:
+        return queryset.none()
+    raw = ' & '.join(terms[:-1] + [terms[-1] + ':*'])
+    query = SearchQuery(raw, config=SEARCH_CONFIG, search_type='raw')
+    rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+    return queryset.filter(search_vector=query).annotate(search_rank=rank)
+
+
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+
+# (column, tie breaker) of each branch. Each column has a
+# `(UPPER(col::text) COLLATE "C", tie breaker)` index (migration 0014): in
+# the "C" collation a prefix is an index range and the index order is the
+# branch order, so every branch is an index scan stopping after `limit`
+# rows, with no sort. auth_user rows are ordered by user id, which the
+# join keeps as `uid`.
+AUTOCOMPLETE_COLUMNS = (
+    ('uid__username', 'uid'),
+    ('uid__first_name', 'uid'),
+    ('uid__last_name', 'uid'),
+    ('employee_id', 'id'),
+)
+
+AUTOCOMPLETE_VALUES = ('id', 'uid__username', 'uid__first_name', 'uid__last_name', 'employee_id')
+
+
+def prefix_key(column):
+    # the expression of the prefix indexes
+    return Collate(Upper(Cast(column, TextField())), 'C')
+
+
+def _prefix_branch(queryset, column, tie_breaker, prefix, limit):
+    # the prefix goes through the database's UPPER too, like `istartswith`
+    return (
+        queryset.alias(prefix_key=prefix_key(column))
+        .filter(prefix_key__startswith=Upper(Value(prefix)))
+        .order_by('prefix_key', tie_breaker)[:limit]
+    )
+
+
+def autocomplete_label(row):
+    name = ' '.join(part for part in (row['uid__first_name'], row['uid__last_name']) if part)
+    label = name or row['uid__username']
+    if row['employee_id']:
+        label = f"{label} ({row['employee_id']})"
+    return label
+
+
+def autocomplete_branches(prefix, limit=AUTOCOMPLETE_LIMIT):
+    '''
+    The LIMITed `.values()` querysets, one per matched column, whose union
+    `autocomplete_employees` ranks. `prefix` is already normalized.
+    '''
+    employees = EmployeeData.objects.order_by().values(*AUTOCOMPLETE_VALUES)
+    branches = [
+        _prefix_branch(employees, column, tie_breaker, prefix, limit)
+        for column, tie_breaker in AUTOCOMPLETE_COLUMNS
+    ]
+    first, sep, last = prefix.partition(' ')
+    if sep:
+        branches.append(
+            _prefix_branch(employees.filter(uid__first_name__iexact=first), 'uid__last_name', 'uid', last, limit)
+        )
+    return branches
+
+
+def autocomplete_employees(prefix, limit=AUTOCOMPLETE_LIMIT):
+    '''
+    Employees whose username, first name, last name or employee id starts
+    with `prefix`, as `{'id', 'label'}` dicts. "Ann Sm" matches first and
+    last name together. One query, without loading the serializers.
+    '''
+    prefix = ' '.join((prefix or '').split())
+    if not prefix:
+        return []
+
+    branches = autocomplete_branches(prefix, limit)
+    rows = branches[0].union(*branches[1:])
+    rows = sorted(rows, key=lambda row: (autocomplete_label(row).lower(), row['id']))[:limit]
+    return [{'id': row['id'], 'label': autocomplete_label(row)} for row in rows]
@@ -0,0 +1,186 @@
+'''
+Synthetic employee directory for benchmarks and local development.
+
+`seed_directory(employees, fields)` tops the directory up to that many
+employees and dynamic form fields, so growing a seeded database from 10k
+to 100k employees only inserts the difference. Generated rows look like
+real data: every field type is represented, select/radio values follow a
+skewed distribution, and names repeat the way they do in a real company.
+Values derive from `seed` and the row number only, so the same arguments
+always produce the same directory.
+
+Employees go through `bulk_create_employees` one batch (and transaction) at
+a time, so the search, change log and rollup triggers and the typed value
+table are maintained as they are in production. Every seeded user shares
+one password hash: hashing a million passwords would take days.
+'''
+
+import datetime
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+
+from .models import DynamicFormFields, EmployeeData
+from .ordering import ORDER_GAP
+from .passwords import HASHED
+from .schema import parse_options, schema_change
+from .services import bulk_create_employees
+
+USER_MODEL = get_user_model()
+
+USERNAME_PREFIX = 'seed'
+
+DEFAULT_PASSWORD = 'seed-password'
+
+DEFAULT_BATCH_SIZE = 2000
+
+FIRST_NAMES = (
+    'Aarav', 'Aisha', 'Alex', 'Amara', 'Ana', 'Ben', 'Carlos', 'Chen', 'Chloe', 'Daniel',
+    'Divya', 'Elena', 'Emma', 'Farah', 'Hana', 'Ivan', 'James', 'Kenji', 'Leila', 'Liam',
+    'Lucas', 'Maya', 'Mei', 'Mohammed', 'Nadia', 'Noah', 'Olga', 'Omar', 'Priya', 'Rahul',
+    'Sara', 'Sofia', 'Tariq', 'Yusuf', 'Zoe',
+)
+
+LAST_NAMES = (
+    'Ahmed', 'Brown', 'Chen', 'Costa', 'Das', 'Evans', 'Fischer', 'Garcia', 'Gupta', 'Hansen',
+    'Ivanova', 'Johnson', 'Khan', 'Kim', 'Lee', 'Martin', 'Mensah', 'Nair', 'Novak', 'Okafor',
+    'Patel', 'Rossi', 'Sato', 'Silva', 'Smith', 'Tanaka', 'Wang', 'Williams', 'Yilmaz', 'Zhang',
+)
+
+# (label, type, options) of the fields a seeded directory starts with;
+# more fields cycle through the types
+FIELD_TEMPLATES = (
+    ('Department', 'select', ['Engineering', 'Sales', 'Support', 'Finance', 'People', 'Legal', 'Operations']),
+    ('Location', 'select', ['London', 'Berlin', 'Bangalore', 'New York', 'Singapore', 'Remote']),
+    ('Joining Date', 'date', []),
+    ('Experience', 'number', []),
+    ('Employment Type', 'radio', ['Full time', 'Part time', 'Contractor']),
+    ('Skills', 'text', []),
+    ('Work Email', 'email', []),
+    ('Remote', 'checkbox', []),
+)
+
+SKILLS = (
+    'python', 'django', 'postgres', 'react', 'negotiation', 'accounting', 'recruiting',
+    'kubernetes', 'support', 'design', 'writing', 'sales', 'analytics', 'security',
+)
+
+START_DATE = datetime.date(2010, 1, 1)
+
+
+def field_definitions(count):
+    '''
+    `(label, type, options)` of the first `count` seeded fields.
+    '''
+    definitions = []
+    for i in range(count):
+        label, field_type, options = FIELD_TEMPLATES[i % len(FIELD_TEMPLATES)]
+        if i >= len(FIELD_TEMPLATES):
+            label = f'{label} {i // len(FIELD_TEMPLATES) + 1}'
+        definitions.append((label, field_type, options))
+    return definitions
+
+
+def seed_fields(count):
+    '''
+    Create the seeded fields missing from the first `count`, matched by
+    label. Returns the number of fields created.
+    '''
+    existing = set(DynamicFormFields.objects.values_list('field_label', flat=True))
+    # appended after the existing fields
+    order = DynamicFormFields.objects.aggregate(last=Max('field_order'))['last'] or 0
+    missing = []
+    for label, field_type, options in field_definitions(count):
+        if label in existing:
+            continue
+        extra = {'options': ','.join(options)} if options else {}
+        missing.append(DynamicFormFields(
+            field_label=label, field_type=field_type, field_order=order + ORDER_GAP * (len(missing) + 1), extra=extra,
+        ))
+    if missing:
+        with transaction.atomic(), schema_change():
+            DynamicFormFields.objects.bulk_create(missing)
+    return len(missing)
+
+
+def _skewed(rng, options):
+    # the first options are the most common, like real departments
+    return options[min(int(rng.expovariate(0.6)), len(options) - 1)]
+
+
+def field_value(rng, field_type, options, number):
+    if field_type in ('select', 'radio'):
+        return _skewed(rng, options) if options else None
+    if field_type == 'number':
+        return rng.randint(0, 30)
+    if field_type == 'date':
+        return (START_DATE + datetime.timedelta(days=rng.randint(0, 5800))).isoformat()
+    if field_type == 'email':
+        return f'{USERNAME_PREFIX}{number}@work.example.com'
+    if field_type == 'checkbox':
+        return rng.random() < 0.3
+    return ', '.join(rng.sample(SKILLS, rng.randint(1, 4)))
+
+
+def build_employee(number, fields, password, seed=0):
+    '''
+    Unsaved (User, EmployeeData) pair of seeded employee `number`.
+    '''
+    rng = random.Random(f'{seed}:{number}')
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    user = USER_MODEL(
+        username=f'{USERNAME_PREFIX}{number}',
+        first_name=first_name,
+        last_name=last_name,
+        email=f'{first_name}.{last_name}.{number}@example.com'.lower(),
+        password=password,
+    )
+    extra_data = {}
+    for field in fields:
+        # optional fields are often left empty
+        if not field.field_is_required and rng.random() < 0.1:
+            continue
+        value = field_value(rng, field.field_type, parse_options(field.extra), number)
+        if value is not None:
+            extra_data[field.field_label] = value
+    return user, EmployeeData(employee_id=f'S{number:07d}', extra_data=extra_data)
+
+
+def seed_employees(count, seed=0, batch_size=DEFAULT_BATCH_SIZE, password=DEFAULT_PASSWORD, progress=None):
+    '''
+    Create seeded employees until there are `count` of them, in batches of
+    `batch_size`. `progress(done, count)` is called after every batch.
+    Returns the number of employees created.
+    '''
+    fields = list(DynamicFormFields.objects.all())
+    encoded = make_password(password)
+
+    created = 0
+    for start in range(0, count, batch_size):
+        numbers = range(start, min(start + batch_size, count))
+        names = [f'{USERNAME_PREFIX}{number}' for number in numbers]
+        taken = set(USER_MODEL.objects.filter(username__in=names).values_list('username', flat=True))
+        pairs = [
+            build_employee(number, fields, encoded, seed)
+            for number, name in zip(numbers, names) if name not in taken
+        ]
+        if pairs:
+            with transaction.atomic():
+                bulk_create_employees(pairs, HASHED)
+            created += len(pairs)
+        if progress:
+            progress(numbers[-1] + 1, count)
+    return created
+
+
+def seed_directory(employees, fields, seed=0, batch_size=DEFAULT_BATCH_SIZE, password=DEFAULT_PASSWORD, progress=None):
+    '''
+    Top the directory up to `fields` seeded fields and `employees` seeded
+    employees. Returns `(fields created, employees created)`.
+    '''
+    created_fields = seed_fields(fields)
+    created_employees = seed_employees(employees, seed, batch_size, password, progress)
+    return created_fields, created_employees
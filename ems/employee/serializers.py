@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from .models import DynamicFormFields, EmployeeData
+from .passwords import HASHED, PLAIN, UNUSABLE, is_password_hash
+from .schema import get_schema
 
 User = get_user_model()
 
@@ -12,7 +15,7 @@ class UserSerializer(serializers.ModelSerializer):
 class DynamicFormFieldSerializer(serializers.ModelSerializer):
     class Meta:
         model = DynamicFormFields
-        fields = ['id', 'field_label', 'field_type', 'field_is_required', 'field_order', 'extra', 'created_on', 'updated_on']
+        fields = ['id', 'field_label', 'field_type', 'field_is_required', 'field_order', 'extra', 'indexed', 'created_on', 'updated_on']
 
 class EmployeeDataSerializer(serializers.ModelSerializer):
     uid = UserSerializer()
@@ -30,35 +33,85 @@ class EmployeeCreateUpdateSerializer(serializers.ModelSerializer):
 
 
 
-class EmployeeCreateSerializer(serializers.Serializer):
+DYNAMIC_FIELD_CLASSES = {
+    "text": serializers.CharField,
+    "textarea": serializers.CharField,
+    "password": serializers.CharField,
+    "number": serializers.IntegerField,
+    "checkbox": serializers.BooleanField,
+    "date": serializers.DateField,
+    "email": serializers.EmailField,
+}
+
+
+def build_dynamic_field(field):
+    '''
+    Build the DRF field validating one dynamic form field definition.
+    '''
+    required = field['field_is_required']
+    if field['field_type'] in ["select","radio"]:
+        choices = [(x,x) for x in field['options']]
+        return serializers.ChoiceField(choices=choices, required=required)
+    field_class = DYNAMIC_FIELD_CLASSES.get(field['field_type'], serializers.CharField)
+    return field_class(required=required)
+
+
+class DynamicFieldsSerializer(serializers.Serializer):
+    '''
+    Validator for the dynamic field values of an employee.
+
+    Use `for_schema()` to get the subclass carrying one declared field per
+    dynamic field. It is generated once per schema version and shared by the
+    API serializers and `EmployeeForm`.
+    '''
+    schema = None
+
+    @classmethod
+    def for_schema(cls, schema=None):
+        schema = schema or get_schema()
+
+        def compile_class():
+            attrs = {field['name']: build_dynamic_field(field) for field in schema}
+            attrs['schema'] = schema
+            return type(f"{cls.__name__}V{schema.version}", (cls,), attrs)
+
+        return schema.compiled(cls, compile_class)
+
+    def dynamic_values(self, validated_data, key='name'):
+        '''
+        JSON friendly dynamic values to store in `EmployeeData.extra_data`,
+        keyed by field name (API) or field label (HTML form).
+        '''
+        values = {}
+        for field in self.schema:
+            if field['name'] in validated_data:
+                value = validated_data[field['name']]
+                if value is not None:
+                    value = self.fields[field['name']].to_representation(value)
+                values[field[key]] = value
+        return values
+
+
+class EmployeeCreateSerializer(DynamicFieldsSerializer):
     # User fields
     username = serializers.CharField(max_length=150)
     first_name = serializers.CharField(max_length=150)
     last_name = serializers.CharField(max_length=150)
     password = serializers.CharField(write_only=True)
     email = serializers.EmailField()
-
+    employee_id = serializers.CharField(max_length=15, required=False, allow_blank=True)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        dynamic_fields = DynamicFormFields.objects.all().order_by('field_order')
-
-        for field in dynamic_fields:
-            field_name = field.field_label.lower().replace(" ", "_")
-            field_type = field.field_type.lower()
-
-            if field_type == "text":
-                self.fields[field_name] = serializers.CharField(required=field.field_is_required)
-            elif field_type == "number":
-                self.fields[field_name] = serializers.IntegerField(required=field.field_is_required)
-            elif field_type == "checkbox":
-                self.fields[field_name] = serializers.BooleanField(required=field.field_is_required)
-            elif field_type == "date":
-                self.fields[field_name] = serializers.DateField(required=field.field_is_required)
-            elif field_type in ["select","radio"]:
-                choice_list = field.extra.get('options', '').split(",")
-                choices = [(x,x) for x in choice_list]
-                self.fields[field_name] = serializers.ChoiceField(choices=choices, required=field.field_is_required)
+        # imports may carry hashed passwords, or none at all
+        self.password_mode = self.context.get('password_mode', PLAIN)
+        if self.password_mode == UNUSABLE:
+            self.fields['password'].required = False
+
+    def validate_password(self, value):
+        if self.password_mode == HASHED and not is_password_hash(value):
+            raise serializers.ValidationError("Expected a password hash of a configured hasher.")
+        return value
 
     def create(self, validated_data):
         # Extract user data
@@ -70,13 +123,11 @@ class EmployeeCreateSerializer(serializers.Serializer):
         }
         password = validated_data.pop('password')
 
-        # Create user
-        user = User.objects.create(**user_data)
-        user.set_password(password)
-        user.save()
+        # Create user, hashed up front so the row is written once
+        user = User.objects.create(**user_data, password=make_password(password))
 
         employee_id = validated_data.pop('employee_id','')
-        extra_data = validated_data
+        extra_data = self.dynamic_values(validated_data)
 
         # Create EmployeeData record
         employee = EmployeeData.objects.create(
@@ -86,6 +137,26 @@ class EmployeeCreateSerializer(serializers.Serializer):
             )
         return employee
 
+    def build_instances(self, validated_data):
+        '''
+        Unsaved (User, EmployeeData) pair for `bulk_create_employees`, which
+        hashes the passwords of the whole batch at once. Until then
+        `User.password` holds the password as received.
+        '''
+        data = dict(validated_data)
+        user = User(
+            username=data.pop('username'),
+            first_name=data.pop('first_name'),
+            last_name=data.pop('last_name'),
+            email=data.pop('email'),
+            password=data.pop('password', ''),
+        )
+        employee = EmployeeData(
+            employee_id=data.pop('employee_id', ''),
+            extra_data=self.dynamic_values(data),
+        )
+        return user, employee
+
     def to_representation(self, instance):
         """Custom representation to avoid DRF trying to read 'username' etc. directly from EmployeeData."""
         return {
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+
+from . import versions
+from .models import EmployeeData
+from .passwords import PLAIN, prepare_passwords
+from .values import sync_field_values
+
+USER_MODEL = get_user_model()
+
+
+def bulk_create_employees(pairs, password_mode=PLAIN):
+    '''
+    Insert unsaved (User, EmployeeData) pairs with one bulk insert per
+    table. Run it inside a transaction so a failed batch leaves no users
+    without employee rows.
+
+    `User.password` holds the password as given until then: it is replaced
+    by what `prepare_passwords` makes of it in `password_mode`, the whole
+    batch being hashed at once on every core.
+    '''
+    if not pairs:
+        return []
+
+    users = [user for user, _ in pairs]
+    for user, password in zip(users, prepare_passwords([user.password for user in users], password_mode)):
+        user.password = password
+    users = USER_MODEL.objects.bulk_create(users)
+    employees = []
+    for user, employee in zip(users, (employee for _, employee in pairs)):
+        employee.uid = user
+        employees.append(employee)
+    employees = EmployeeData.objects.bulk_create(employees)
+    sync_field_values(employees)
+    versions.bump(versions.EMPLOYEES)
+    return employees
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import versions
+from .models import DynamicFormFields, EmployeeData
+from .rollups import ROLLUP_FIELD_TYPES, field_dimension, rebuild_rollups
+from .schema import bump_schema_version
+from .values import rebuild_field_values, sync_field_values, typed_values_enabled
+
+
+'''
+Keep the schema version in step with single row writes, including the
+ones made by the model viewsets and the admin.
+'''
+@receiver(post_save, sender=DynamicFormFields)
+@receiver(post_delete, sender=DynamicFormFields)
+def dynamic_field_changed(sender, **kwargs):
+    bump_schema_version()
+
+
+'''
+Employee writes invalidate the caches keyed by the employees version (eg.
+facet counts). Bulk writes don't send signals and bump explicitly, see
+services.py and bulk.py.
+'''
+@receiver(post_save, sender=EmployeeData)
+@receiver(post_delete, sender=EmployeeData)
+def employee_changed(sender, **kwargs):
+    versions.bump(versions.EMPLOYEES)
+
+
+'''
+Employee listings embed the user, but logins only touch `last_login`.
+'''
+@receiver(post_save, sender=get_user_model())
+def user_changed(sender, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    versions.bump(versions.EMPLOYEES)
+
+
+'''
+Keep the typed value table in step with `extra_data`. Bulk writes don't send
+signals and sync explicitly, see services.py and bulk.py.
+'''
+@receiver(post_save, sender=EmployeeData)
+def employee_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'extra_data' in update_fields:
+        sync_field_values([instance])
+
+
+'''
+A new label or type changes how the stored values are found and parsed,
+and which values the field's headcount rollup counts. Other saves leave
+them alone: the label and type are compared with the ones the instance
+was loaded (or last saved) with, and instances not loaded from the
+database are assumed retyped. New fields get their typed values and,
+for select/radio fields, their rollup too: a label added back may already
+have values in `extra_data`.
+'''
+@receiver(post_save, sender=DynamicFormFields)
+def dynamic_field_retyped(sender, instance, created=False, update_fields=None, **kwargs):
+    stored = getattr(instance, '_stored_definition', None)
+    instance._stored_definition = (instance.field_label, instance.field_type)
+    if stored == instance._stored_definition:
+        return
+    if created or update_fields is None or {'field_label', 'field_type'} & set(update_fields):
+        if typed_values_enabled():
+            rebuild_field_values([instance])
+        if not created or instance.field_type in ROLLUP_FIELD_TYPES:
+            rebuild_rollups([field_dimension(instance.id)])
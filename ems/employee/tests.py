@@ -1,8 +1,48 @@
-from django.test import TestCase, Client
+import asyncio
+import csv
+import datetime
+import json
+import logging
+import re
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.db.utils import load_backend
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient, TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.http import QueryDict
+from django.utils.http import urlencode
+from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
-from .models import DynamicFormFields, EmployeeData
+from rest_framework_simplejwt.tokens import AccessToken
+from ems.pooled_postgresql.base import ConnectionPool, close_pools
+from .models import DynamicFormFields, EmployeeData, EmployeeFieldValue, EmployeeRollup
+from .changes import latest_cursor
+from .counting import estimate_count
+from .events import DirectoryBroadcaster, _open_listener, _read_changes
+from .facets import employee_facets
+from .filters import filter_employees
+from .importer import EmployeeImporter, read_rows
+from .metrics import registry
+from .ordering import ORDER_GAP, order_before, spaced_order
+from .pagination import EmployeeCursorPagination
+from .passwords import HASHED, UNUSABLE, hash_passwords
+from .schema import get_schema
+from .routers import PRIMARY_COOKIE, ReplicaRouter, prefer_replica, read_alias, routing_scope
+from .search import autocomplete_branches, autocomplete_employees, search_employees
+from .serializers import EmployeeCreateSerializer
+from .services import bulk_create_employees
+from . import versions
 
 
 class EmployeeModuleTests(TestCase):
@@ -110,4 +150,1901 @@ class EmployeeModuleTests(TestCase):
         employee = EmployeeData.objects.create(uid=self.user, employee_id="EMP200")
         response = self.client.delete(reverse("employee_list", args=[employee.pk]))
         self.assertEqual(response.status_code, 200)
-        self.assertFalse(User.objects.filter(username="admin").exists())
\ No newline at end of file
+        self.assertFalse(User.objects.filter(username="admin").exists())
+
+class SchemaRegistryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        DynamicFormFields.objects.create(
+            field_label="Location",
+            field_type="select",
+            field_order=1,
+            extra={"options": "Kochi, Pune,"}
+        )
+
+    def test_schema_is_parsed_and_cached(self):
+        '''
+        Schema is parsed once and later reads only check the version.
+        '''
+
+        schema = get_schema()
+        self.assertEqual(schema.get("Location")["options"], ["Kochi", "Pune"])
+        self.assertEqual(schema.get("Location")["name"], "location")
+
+        with self.assertNumQueries(1):
+            self.assertIs(get_schema(), schema)
+
+    def test_field_writes_bump_schema_version(self):
+        '''
+        Field API writes bump the version and the registry reloads.
+        '''
+
+        version = get_schema().version
+        response = self.api_client.post(
+            reverse("api-fields-add-field"),
+            {"field_label": "Grade", "field_type": "text", "field_order": 0},
+            format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        schema = get_schema()
+        self.assertEqual(schema.version, version + 1)
+        self.assertEqual([f["field_label"] for f in schema], ["Grade", "Location"])
+
+    def test_form_config_save_bumps_version_once(self):
+        '''
+        Form configuration save bumps the schema version exactly once.
+        '''
+
+        version = versions.current(versions.SCHEMA)[0]
+        payload = {"fields": [
+            {"label": "Team", "field_type": "text", "order": 0},
+            {"label": "Shift", "field_type": "text", "order": 1},
+        ]}
+        response = self.client.post(
+            reverse("employee_form_config"),
+            data=json.dumps(payload),
+            content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(versions.current(versions.SCHEMA)[0], version + 1)
+        self.assertIsNotNone(get_schema().get("Shift"))
+
+
+class CompiledSerializerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        DynamicFormFields.objects.create(field_label="Joining Date", field_type="date", field_order=1)
+        DynamicFormFields.objects.create(field_label="Experience", field_type="number", field_order=2)
+
+    def test_serializer_class_is_compiled_once_per_version(self):
+        '''
+        Compiled serializer is reused until the schema changes.
+        '''
+
+        serializer_class = EmployeeCreateSerializer.for_schema()
+        self.assertIs(EmployeeCreateSerializer.for_schema(), serializer_class)
+        self.assertIn("joining_date", serializer_class().fields)
+
+        DynamicFormFields.objects.create(field_label="Grade", field_type="text", field_order=3)
+        recompiled = EmployeeCreateSerializer.for_schema()
+        self.assertIsNot(recompiled, serializer_class)
+        self.assertIn("grade", recompiled().fields)
+
+    def test_api_stores_typed_dynamic_values(self):
+        '''
+        API - dynamic values are validated and stored JSON friendly.
+        '''
+
+        response = self.api_client.post(reverse("api-employees-list"), {
+            "username": "john", "first_name": "John", "last_name": "Doe",
+            "email": "john@example.com", "password": "Str0ng@123",
+            "employee_id": "E001", "joining_date": "2025-01-02", "experience": "4",
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        employee = EmployeeData.objects.get(uid__username="john")
+        self.assertEqual(employee.employee_id, "E001")
+        self.assertEqual(employee.extra_data, {"joining_date": "2025-01-02", "experience": 4})
+
+    def test_creation_form_uses_compiled_validator(self):
+        '''
+        HTML creation form validates dynamic fields with the compiled schema.
+        '''
+
+        data = {
+            "username": "jane", "first_name": "Jane", "email": "jane@example.com",
+            "employee_id": "E002", "password": "secret123", "Experience": "many",
+        }
+        response = self.client.post(reverse("employee_create"), data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Experience", str(response.json()["errors"]))
+
+        data["Experience"] = "7"
+        response = self.client.post(reverse("employee_create"), data)
+        self.assertEqual(response.status_code, 200)
+        employee = EmployeeData.objects.get(uid__username="jane")
+        self.assertEqual(employee.extra_data, {"Experience": 7})
+
+
+class EmployeeFilterTests(TestCase):
+    def setUp(self):
+        self.team = DynamicFormFields.objects.create(field_label="Team Name", field_type="text", field_order=1)
+        self.joined = DynamicFormFields.objects.create(
+            field_label="Joined", field_type="date", field_order=2, indexed=True
+        )
+        # one saved through the HTML form (label keys), one through the API (name keys)
+        self.html = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="html"), employee_id="E1",
+            extra_data={"Team Name": "Core", "Joined": "2024-03-01"}
+        )
+        self.api = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="api"), employee_id="E2",
+            extra_data={"team_name": "Core", "joined": "2025-06-01"}
+        )
+
+    def test_containment_filter_matches_label_and_name_keys(self):
+        '''
+        Equality filters match values stored by either the form or the API.
+        '''
+
+        employees = filter_employees(EmployeeData.objects.all(), {"Team Name": "Core"})
+        self.assertIn("@>", str(employees.query))
+        self.assertEqual(set(employees), {self.html, self.api})
+
+    def test_indexed_field_equality_and_range(self):
+        '''
+        Indexed fields filter on the indexed expression, with ranges.
+        '''
+
+        employees = filter_employees(EmployeeData.objects.all(), {"Joined__gte": "2025-01-01"})
+        self.assertEqual(list(employees), [self.api])
+
+        employees = filter_employees(EmployeeData.objects.all(), {"Joined": "2024-03-01"})
+        self.assertEqual(list(employees), [self.html])
+
+
+class FieldIndexCommandTests(TransactionTestCase):
+    # restores the rows created by data migrations after the flush
+    serialized_rollback = True
+
+    def test_sync_field_indexes_creates_and_drops(self):
+        '''
+        Indexed fields get a concurrent expression index, removed once unflagged.
+        '''
+
+        field = DynamicFormFields.objects.create(
+            field_label="Band", field_type="select", field_order=1, indexed=True
+        )
+        call_command("sync_field_indexes", stdout=StringIO())
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, EmployeeData._meta.db_table)
+        self.assertTrue(any(name.startswith(f"employee_xd_{field.id}_") for name in indexes))
+
+        field.indexed = False
+        field.save()
+        call_command("sync_field_indexes", stdout=StringIO())
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, EmployeeData._meta.db_table)
+        self.assertFalse(any(name.startswith("employee_xd_") for name in indexes))
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.employees = [
+            EmployeeData.objects.create(uid=User.objects.create_user(username=f"user{i}"), employee_id=f"E{i}")
+            for i in range(12)
+        ]
+
+    def test_api_walks_pages_with_cursor(self):
+        '''
+        API - employees are paged by an opaque cursor keyed on -id.
+        '''
+
+        response = self.api_client.get(reverse("api-employees-list"))
+        self.assertNotIn("count", response.data)
+        self.assertIn("cursor=", response.data["next"])
+        first_ids = [e["id"] for e in response.data["results"]]
+        self.assertEqual(first_ids, [e.id for e in reversed(self.employees)][:10])
+
+        response = self.api_client.get(response.data["next"])
+        self.assertEqual([e["id"] for e in response.data["results"]], [self.employees[1].id, self.employees[0].id])
+        self.assertIsNone(response.data["next"])
+
+    def test_api_count_is_optional(self):
+        '''
+        API - total count is only returned when asked for.
+        '''
+
+        response = self.api_client.get(reverse("api-employees-list"), {"count": "true"})
+        self.assertEqual(response.data["count"], 12)
+
+    def test_list_view_links_keep_filters(self):
+        '''
+        Employee listing next link carries the cursor and the filters.
+        '''
+
+        response = self.client.get(reverse("employee_list"), {"Team": "x"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["employees"]), 3)
+        self.assertIn("cursor=", response.context["next_link"])
+        self.assertIn("Team=x", response.context["next_link"])
+
+        response = self.client.get(reverse("employee_list"), {"cursor": "bogus"})
+        self.assertEqual(response.status_code, 404)
+
+
+class EstimatedCountTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            EmployeeData.objects.create(
+                uid=User.objects.create_user(username=f"user{i}"), employee_id=f"E{i}",
+                extra_data={"Team": "Core" if i % 2 else "Ops"}
+            )
+
+    def test_small_tables_are_counted_exactly(self):
+        '''
+        Below the threshold counts fall back to an exact COUNT(*).
+        '''
+
+        self.assertEqual(estimate_count(EmployeeData.objects.all()), (5, True))
+        self.assertEqual(estimate_count(EmployeeData.objects.filter(extra_data__contains={"Team": "Core"})), (2, True))
+
+    @override_settings(EMPLOYEE_EXACT_COUNT_THRESHOLD=0)
+    def test_large_tables_use_planner_estimates(self):
+        '''
+        Above the threshold filtered counts come from the EXPLAIN estimate.
+        '''
+
+        queryset = EmployeeData.objects.filter(extra_data__contains={"Team": "Core"})
+        with CaptureQueriesContext(connection) as queries:
+            count, exact = estimate_count(queryset)
+        self.assertFalse(exact)
+        self.assertGreaterEqual(count, 0)
+        self.assertTrue(queries[0]["sql"].startswith("EXPLAIN"))
+
+    def test_count_reported_in_list_view(self):
+        '''
+        Employee listing shows the total and whether it is exact.
+        '''
+
+        response = self.client.get(reverse("employee_list"))
+        self.assertEqual(response.context["total_count"], 5)
+        self.assertTrue(response.context["count_is_exact"])
+
+
+class EmployeeImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        DynamicFormFields.objects.create(field_label="Experience", field_type="number", field_order=1)
+
+    def test_csv_import_reports_row_errors(self):
+        '''
+        Valid rows are bulk inserted, bad rows are reported and skipped.
+        '''
+
+        content = (
+            "username,first_name,last_name,email,password,employee_id,Experience\n"
+            "amy,Amy,Lee,amy@example.com,secret123,E1,3\n"
+            "bob,Bob,Ray,not-an-email,secret123,E2,\n"
+            "admin,Ad,Min,admin@example.com,secret123,E3,1\n"
+            "cat,Cat,Roy,cat@example.com,secret123,E4,x\n"
+            "dan,Dan,Ito,dan@example.com,secret123,E5,\n"
+        )
+        result = EmployeeImporter(batch_size=2).run(read_rows(BytesIO(content.encode()), "csv"))
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual([e["row"] for e in result.errors], [2, 3, 4])
+        amy = EmployeeData.objects.get(uid__username="amy")
+        self.assertEqual(amy.extra_data, {"experience": 3})
+        self.assertTrue(amy.uid.check_password("secret123"))
+
+    def test_import_endpoint_and_command(self):
+        '''
+        API and management command import NDJSON files.
+        '''
+
+        lines = [
+            {"username": "eve", "first_name": "Eve", "last_name": "Li", "email": "eve@example.com", "password": "secret123"},
+            "{broken",
+        ]
+        content = "\n".join(l if isinstance(l, str) else json.dumps(l) for l in lines)
+        upload = SimpleUploadedFile("staff.ndjson", content.encode())
+        response = self.api_client.post(reverse("api-employees-import-file"), {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 2)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as handle:
+            handle.write(json.dumps(dict(lines[0], username="fay")))
+            handle.flush()
+            out = StringIO()
+            call_command("import_employees", handle.name, stdout=out, stderr=StringIO())
+        self.assertIn("Imported 1 employee", out.getvalue())
+        self.assertTrue(EmployeeData.objects.filter(uid__username="fay").exists())
+
+    def test_reported_errors_are_capped(self):
+        '''
+        Only the first rejected rows keep their errors, the rest are counted.
+        '''
+
+        content = "username,email\n" + "".join(f"u{i},not-an-email\n" for i in range(5))
+        result = EmployeeImporter(max_errors=2).run(read_rows(BytesIO(content.encode()), "csv")).as_dict()
+        self.assertEqual((result["created"], result["failed"], result["errors_omitted"]), (0, 5, 3))
+        self.assertEqual([e["row"] for e in result["errors"]], [1, 2])
+
+
+class EmployeeExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123", first_name="Ad")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        DynamicFormFields.objects.create(field_label="Team Name", field_type="text", field_order=2)
+        DynamicFormFields.objects.create(field_label="Level", field_type="number", field_order=1)
+        EmployeeData.objects.create(uid=self.user, employee_id="E1", extra_data={"Team Name": "Core", "Level": "2"})
+        EmployeeData.objects.create(
+            uid=User.objects.create_user(username="api"), employee_id="E2", extra_data={"team_name": "Ops", "level": 3}
+        )
+
+    def test_csv_export_streams_flattened_columns(self):
+        '''
+        API - CSV export flattens dynamic fields in form order and filters.
+        '''
+
+        response = self.api_client.get(reverse("api-employees-export"), {"Team Name": "Core"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][-2:], ["Level", "Team Name"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][1:4], ["E1", "admin", "Ad"])
+        self.assertEqual(rows[1][-2:], ["2", "Core"])
+
+    def test_ndjson_export_command(self):
+        '''
+        Export command writes one JSON document per employee.
+        '''
+
+        out = StringIO()
+        call_command("export_employees", "--format", "ndjson", stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row["employee_id"] for row in rows], ["E2", "E1"])
+        self.assertEqual(rows[0]["Team Name"], "Ops")
+        self.assertEqual(rows[0]["Level"], 3)
+
+
+class BulkOperationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        DynamicFormFields.objects.create(field_label="Team Name", field_type="text", field_order=1)
+        self.first = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="first"), employee_id="E1", extra_data={"Team Name": "Core"}
+        )
+        self.second = EmployeeData.objects.create(uid=User.objects.create_user(username="second"), employee_id="E2")
+        self.url = reverse("api-employees-bulk")
+        self.new_employee = {
+            "username": "new", "first_name": "New", "last_name": "Hire",
+            "email": "new@example.com", "password": "secret123", "employee_id": "E3",
+        }
+
+    def test_bulk_applies_mixed_operations(self):
+        '''
+        API - creates, updates and deletes are applied in one call.
+        '''
+
+        operations = [
+            {"op": "create", "data": self.new_employee},
+            {"op": "update", "employee_id": "E1", "data": {"first_name": "Fay", "team_name": "Ops"}},
+            {"op": "delete", "id": self.second.id},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api_client.post(self.url, {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["created", "updated", "deleted"])
+        self.assertLess(len(queries), 25)
+
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.uid.first_name, "Fay")
+        self.assertEqual(self.first.extra_data, {"team_name": "Ops"})
+        self.assertFalse(User.objects.filter(username="second").exists())
+        self.assertTrue(EmployeeData.objects.filter(uid__username="new").exists())
+
+    def test_atomic_batch_with_errors_applies_nothing(self):
+        '''
+        API - an invalid operation rejects an atomic batch.
+        '''
+
+        operations = [
+            {"op": "create", "data": self.new_employee},
+            {"op": "delete", "employee_id": "missing"},
+        ]
+        response = self.api_client.post(self.url, {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data["applied"])
+        self.assertFalse(User.objects.filter(username="new").exists())
+
+        response = self.api_client.post(self.url, {"operations": operations, "atomic": False}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["created", "error"])
+        self.assertTrue(User.objects.filter(username="new").exists())
+
+
+class FormConfigSaveTests(TestCase):
+    def setUp(self):
+        self.keep = DynamicFormFields.objects.create(field_label="Keep", field_type="text", field_order=0)
+        self.rename = DynamicFormFields.objects.create(field_label="Old", field_type="text", field_order=1)
+        self.drop = DynamicFormFields.objects.create(field_label="Drop", field_type="text", field_order=2)
+
+    def save(self, fields):
+        return self.client.post(
+            reverse("employee_form_config"),
+            data=json.dumps({"fields": fields}),
+            content_type="application/json"
+        )
+
+    def test_save_is_set_based_and_returns_ids(self):
+        '''
+        Form configuration save diffs the payload and applies it in bulk.
+        '''
+
+        version = versions.current(versions.SCHEMA)[0]
+        fields = [
+            {"id": self.keep.id, "label": "Keep", "field_type": "text", "order": 0},
+            {"id": self.rename.id, "label": "New", "field_type": "select", "options": "a,b", "order": 1},
+            {"id": self.drop.id, "deleted": 1, "label": "Drop", "field_type": "text", "order": 2},
+        ] + [{"label": f"Extra {i}", "field_type": "text", "order": 3 + i} for i in range(20)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.save(fields)
+        self.assertEqual(response.status_code, 200)
+        # the retyped field also recounts its typed values and rollup
+        self.assertLess(len(queries), 13)
+
+        ids = response.json()["ids"]
+        self.assertEqual(ids[:3], [self.keep.id, self.rename.id, None])
+        self.assertEqual(DynamicFormFields.objects.get(id=ids[-1]).field_label, "Extra 19")
+        self.assertEqual(DynamicFormFields.objects.get(id=self.rename.id).extra, {"options": "a,b"})
+        self.assertFalse(DynamicFormFields.objects.filter(id=self.drop.id).exists())
+        self.assertEqual(versions.current(versions.SCHEMA)[0], version + 1)
+
+    def test_invalid_payload_saves_nothing(self):
+        '''
+        A bad field in the payload leaves the saved schema untouched.
+        '''
+
+        response = self.save([
+            {"id": self.drop.id, "deleted": 1},
+            {"label": "Bad", "field_type": "text", "order": "first"},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(DynamicFormFields.objects.count(), 3)
+
+    def test_field_ids_must_exist(self):
+        '''
+        Ids are coerced to integers, unknown ones conflict instead of
+        creating a copy of a field deleted meanwhile.
+        '''
+
+        response = self.save([{"id": str(self.keep.id), "label": "Kept", "field_type": "text", "order": 0}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["ids"], [self.keep.id])
+        self.assertEqual(DynamicFormFields.objects.get(id=self.keep.id).field_label, "Kept")
+
+        self.assertEqual(self.save([{"id": "one", "label": "Keep", "order": 0}]).status_code, 400)
+
+        gone = self.drop.id
+        self.drop.delete()
+        response = self.save([
+            {"id": self.keep.id, "label": "Keep", "field_type": "text", "order": 0},
+            {"id": gone, "label": "Drop", "field_type": "text", "order": 1},
+        ])
+        self.assertEqual(response.status_code, 409)
+        self.assertCountEqual(DynamicFormFields.objects.values_list("field_label", flat=True), ["Kept", "Old"])
+
+
+class FieldOrderingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.fields = [
+            DynamicFormFields.objects.create(field_label=label, field_type="text", field_order=spaced_order(i))
+            for i, label in enumerate(["A", "B", "C"])
+        ]
+
+    def labels(self):
+        return list(DynamicFormFields.objects.values_list("field_label", flat=True))
+
+    def test_move_writes_only_the_moved_field(self):
+        '''
+        API - reordering takes a free value between the new neighbours.
+        '''
+
+        a, b, c = self.fields
+        response = self.api_client.put(
+            reverse("api-fields-update-order"), {"id": c.id, "field_order": b.field_order}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.labels(), ["A", "C", "B"])
+        self.assertEqual(
+            list(DynamicFormFields.objects.filter(id__in=[a.id, b.id]).values_list("field_order", flat=True)),
+            [a.field_order, b.field_order]
+        )
+
+    def test_exhausted_gap_rebalances(self):
+        '''
+        Neighbours are renumbered only once no free value is left.
+        '''
+
+        a, b, c = self.fields
+        DynamicFormFields.objects.filter(id=b.id).update(field_order=a.field_order + 1)
+        self.assertEqual(order_before(a.field_order + 1, exclude_id=c.id), spaced_order(1) - ORDER_GAP // 2)
+        self.assertEqual(
+            list(DynamicFormFields.objects.values_list("field_order", flat=True)),
+            [spaced_order(0), spaced_order(1), spaced_order(2)]
+        )
+
+        response = self.api_client.post(
+            reverse("api-fields-add-field"), {"field_label": "D", "field_type": "text", "field_order": 0}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.labels(), ["D", "A", "B", "C"])
+
+    def test_inserts_at_the_top_stay_on_top(self):
+        '''
+        Every field inserted at order 0 goes first, and orders stay positive.
+        '''
+
+        for label in ["X", "Y", "Z"]:
+            self.api_client.post(
+                reverse("api-fields-add-field"), {"field_label": label, "field_type": "text", "field_order": 0}, format="json"
+            )
+            self.assertEqual(self.labels()[0], label)
+        self.api_client.put(
+            reverse("api-fields-update-order"), {"id": self.fields[2].id, "field_order": -5}, format="json"
+        )
+        self.assertEqual(self.labels(), ["C", "Z", "Y", "X", "A", "B"])
+        self.assertFalse(DynamicFormFields.objects.filter(field_order__lt=0).exists())
+
+
+class EmployeeSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.alice = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="alice", first_name="Alice", last_name="Smith", email="alice@corp.io"),
+            employee_id="EMP-42", extra_data={"Skills": "python django"}
+        )
+        self.bob = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="bob", first_name="Bob", last_name="Jones"),
+            employee_id="EMP-7", extra_data={"Skills": "Alice in wonderland fan"}
+        )
+
+    def search(self, q):
+        return list(search_employees(EmployeeData.objects.all(), q).order_by("-search_rank", "-id"))
+
+    def test_search_covers_user_employee_and_dynamic_values(self):
+        '''
+        Search matches names, email, employee id and dynamic values.
+        '''
+
+        self.assertEqual(self.search("smith"), [self.alice])
+        self.assertEqual(self.search("alice@corp.io"), [self.alice])
+        self.assertEqual(self.search("emp 42"), [self.alice])
+        self.assertEqual(self.search("djan"), [self.alice])
+        # name matches outrank dynamic value matches
+        self.assertEqual(self.search("alice"), [self.alice, self.bob])
+
+    def test_search_vector_follows_user_changes(self):
+        '''
+        Renaming the user refreshes the employee search document.
+        '''
+
+        User.objects.filter(username="bob").update(last_name="Marley")
+        self.assertEqual(self.search("marley"), [self.bob])
+        self.assertEqual(self.search("jones"), [])
+
+    def test_api_and_list_view_rank_and_paginate(self):
+        '''
+        API and listing accept q and page ranked results by cursor.
+        '''
+
+        response = self.api_client.get(reverse("api-employees-list"), {"q": "alice"})
+        self.assertEqual([e["id"] for e in response.data["results"]], [self.alice.id, self.bob.id])
+
+        response = self.client.get(reverse("employee_list"), {"q": "wonder"})
+        self.assertEqual(list(response.context["employees"]), [self.bob])
+        self.assertEqual(response.context["q"], "wonder")
+
+    def test_equal_ranks_page_through_once(self):
+        '''
+        Search pages are keyed on `(search_rank, id)`: more equal ranks than
+        DRF's offset cutoff still page through once each.
+        '''
+
+        with transaction.atomic():
+            employees = bulk_create_employees([
+                (User(username=f"eng{i}", first_name="Eng", password="x"), EmployeeData(employee_id=f"G{i}"))
+                for i in range(EmployeeCursorPagination.offset_cutoff + 300)
+            ], UNUSABLE)
+
+        ids, url, params = [], reverse("api-employees-list"), {"q": "eng"}
+        with mock.patch.object(EmployeeCursorPagination, "page_size", 100):
+            while url:
+                data = self.api_client.get(url, params).data
+                ids.extend(employee["id"] for employee in data["results"])
+                url, params = data["next"], None
+        self.assertEqual(ids, sorted((employee.id for employee in employees), reverse=True))
+
+
+class EmployeeAutocompleteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.ann = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="asmith", first_name="Ann", last_name="Smith"),
+            employee_id="E100", extra_data={"Skills": "annual reports"}
+        )
+        self.andy = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="andy"), employee_id="X200"
+        )
+
+    def test_prefix_matches_username_names_and_employee_id(self):
+        '''
+        Autocomplete matches prefixes case-insensitively, not dynamic values.
+        '''
+
+        self.assertEqual(autocomplete_employees("an"), [
+            {"id": self.andy.id, "label": "andy (X200)"},
+            {"id": self.ann.id, "label": "Ann Smith (E100)"},
+        ])
+        self.assertEqual([e["id"] for e in autocomplete_employees("SMI")], [self.ann.id])
+        self.assertEqual([e["id"] for e in autocomplete_employees("x2")], [self.andy.id])
+        self.assertEqual([e["id"] for e in autocomplete_employees("ann sm")], [self.ann.id])
+        self.assertEqual(autocomplete_employees("annual"), [])
+        self.assertEqual(autocomplete_employees("%"), [])
+
+    def test_api_returns_id_and_label_in_one_query(self):
+        '''
+        The API action answers with one query and honours the limit.
+        '''
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api_client.get(reverse("api-employees-autocomplete"), {"q": "a", "limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"results": [{"id": self.andy.id, "label": "andy (X200)"}]})
+        self.assertEqual(len(queries), 1)
+
+    def test_branches_are_read_in_prefix_index_order(self):
+        '''
+        Each branch is a Limit over a prefix index scan, without a Sort.
+        '''
+
+        with connection.cursor() as cursor:
+            # a handful of rows would be read whole, ask for the index
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_bitmapscan = off")
+        for branch in autocomplete_branches("ann sm"):
+            plan = branch.explain()
+            self.assertTrue(plan.startswith("Limit"), plan)
+            self.assertRegex(plan, r"Index Scan using employee_(user_\w+|id)_prefix_c", plan)
+            self.assertNotIn("Sort", plan)
+
+
+class TypedFieldValueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.age = DynamicFormFields.objects.create(field_label="Age", field_type="number", field_order=1)
+        self.start = DynamicFormFields.objects.create(field_label="Start", field_type="date", field_order=2)
+        self.young = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="young"), employee_id="E1",
+            extra_data={"Age": "9", "Start": "2024-03-01"}
+        )
+        self.old = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="old"), employee_id="E2", extra_data={"age": 42}
+        )
+
+    def values(self, employee):
+        return {v.field_id: v for v in EmployeeFieldValue.objects.filter(employee=employee)}
+
+    def test_writes_keep_typed_values_in_sync(self):
+        '''
+        Saves, API creates and bulk updates rewrite the typed values.
+        '''
+
+        values = self.values(self.young)
+        self.assertEqual(values[self.age.id].value_num, 9)
+        self.assertEqual(str(values[self.start.id].value_date), "2024-03-01")
+
+        self.young.extra_data = {"Age": "not a number"}
+        self.young.save()
+        values = self.values(self.young)
+        self.assertEqual(list(values), [self.age.id])
+        self.assertIsNone(values[self.age.id].value_num)
+
+        operations = [{"op": "update", "id": self.old.id, "data": {"age": 43}}]
+        self.api_client.post(reverse("api-employees-bulk"), {"operations": operations}, format="json")
+        self.assertEqual(self.values(self.old)[self.age.id].value_num, 43)
+
+        response = self.api_client.post(reverse("api-employees-list"), {
+            "username": "new", "first_name": "New", "last_name": "Hire",
+            "email": "new@example.com", "password": "secret123", "age": 30,
+        }, format="json")
+        self.assertEqual(self.values(response.data["id"])[self.age.id].value_num, 30)
+
+    def test_number_ranges_compare_numerically(self):
+        '''
+        Number ranges use the typed values, so 9 sorts below 42.
+        '''
+
+        employees = filter_employees(EmployeeData.objects.all(), {"Age__gte": "10"})
+        self.assertIn("employee_employeefieldvalue", str(employees.query))
+        self.assertEqual(list(employees), [self.old])
+        employees = filter_employees(EmployeeData.objects.all(), {"Age__gt": "5", "Age__lte": "9"})
+        self.assertEqual(list(employees), [self.young])
+        self.assertEqual(list(filter_employees(EmployeeData.objects.all(), {"Age__gte": "ten"})), [])
+
+    def test_retyping_a_field_rebuilds_its_values(self):
+        '''
+        Changing a field type reparses its stored values, other edits don't.
+        '''
+
+        # other changes keep the values
+        field = DynamicFormFields.objects.get(id=self.age.id)
+        field.field_is_required = True
+        with mock.patch("employee.signals.rebuild_field_values") as rebuild:
+            field.save()
+        rebuild.assert_not_called()
+
+        field.field_type = "text"
+        field.save()
+        self.assertIsNone(self.values(self.old)[self.age.id].value_num)
+
+        EmployeeFieldValue.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_field_values", stdout=out)
+        self.assertIn("Wrote 3 value(s)", out.getvalue())
+
+    def test_fields_added_back_pick_up_stored_values(self):
+        '''
+        A field deleted and added again under a label still in `extra_data`
+        gets the typed values of those entries, from the form configuration
+        save and from the API.
+        '''
+
+        self.client.force_login(self.user)
+        self.age.delete()
+        response = self.client.post(
+            reverse("employee_form_config"),
+            data=json.dumps({"fields": [{"label": "Age", "field_type": "number", "order": 1}]}),
+            content_type="application/json",
+        )
+        age = DynamicFormFields.objects.get(id=response.json()["ids"][0])
+        self.assertEqual(EmployeeFieldValue.objects.filter(field=age).count(), 2)
+        self.assertEqual(list(filter_employees(EmployeeData.objects.all(), {"Age__gte": "10"})), [self.old])
+
+        age.delete()
+        self.api_client.post(
+            reverse("api-fields-add-field"), {"field_label": "Age", "field_type": "number", "field_order": 1}, format="json"
+        )
+        age = DynamicFormFields.objects.get(field_label="Age")
+        self.assertEqual(EmployeeFieldValue.objects.filter(field=age).count(), 2)
+        employees = filter_employees(EmployeeData.objects.all(), {"ordering": "-Age"})
+        self.assertEqual(list(employees.order_by("-sort_value")), [self.old, self.young])
+
+    def test_ordering_by_typed_values_pages_with_cursors(self):
+        '''
+        `ordering=` sorts by a number or date field across cursor pages,
+        employees without a value first, or last when descending.
+        '''
+
+        blank = EmployeeData.objects.create(uid=User.objects.create_user(username="blank"), employee_id="E3")
+        twin = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="twin"), employee_id="E4", extra_data={"Age": 9}
+        )
+
+        def walk(ordering):
+            ids, url, params = [], reverse("api-employees-list"), {"ordering": ordering}
+            with mock.patch.object(EmployeeCursorPagination, "page_size", 1):
+                while url:
+                    data = self.api_client.get(url, params).data
+                    ids.extend(employee["id"] for employee in data["results"])
+                    url, params = data["next"], None
+            return ids
+
+        self.assertEqual(walk("Age"), [blank.id, self.young.id, twin.id, self.old.id])
+        self.assertEqual(walk("-age"), [self.old.id, twin.id, self.young.id, blank.id])
+        # ties, missing values included, fall back to the id
+        self.assertEqual(walk("-Start"), [self.young.id, twin.id, blank.id, self.old.id])
+
+    def test_ordering_pages_through_more_ties_than_the_offset_cutoff(self):
+        '''
+        The cursor keeps `(sort_value, id)`, so more equal values than DRF's
+        offset cutoff page through once each, in both directions.
+        '''
+
+        with transaction.atomic():
+            bulk_create_employees([
+                (User(username=f"tied{i}", password="x"), EmployeeData(employee_id=f"T{i}", extra_data={"Age": 5}))
+                for i in range(EmployeeCursorPagination.offset_cutoff + 300)
+            ], UNUSABLE)
+        expected = list(EmployeeData.objects.order_by("id").values_list("id", flat=True))
+
+        ids, url, params = [], reverse("api-employees-list"), {"ordering": "Age"}
+        with mock.patch.object(EmployeeCursorPagination, "page_size", 100):
+            while url:
+                data = self.api_client.get(url, params).data
+                ids.extend(employee["id"] for employee in data["results"])
+                last, previous, url, params = len(data["results"]), data["previous"], data["next"], None
+            # and back from the last page
+            back = []
+            while previous:
+                data = self.api_client.get(previous).data
+                back[:0] = [employee["id"] for employee in data["results"]]
+                previous = data["previous"]
+        tied = [pk for pk in expected if pk not in (self.young.id, self.old.id)]
+        self.assertEqual(ids, tied + [self.young.id, self.old.id])
+        self.assertEqual(back, ids[:-last])
+
+    @override_settings(EMPLOYEE_TYPED_VALUES=False)
+    def test_disabled_typed_values_fall_back_to_json(self):
+        '''
+        Without the typed values, dates still filter on their ISO text.
+        '''
+
+        EmployeeData.objects.create(
+            uid=User.objects.create_user(username="later"), employee_id="E3", extra_data={"Start": "2025-01-01"}
+        )
+        self.assertEqual(EmployeeFieldValue.objects.filter(employee__employee_id="E3").count(), 0)
+        employees = filter_employees(EmployeeData.objects.all(), {"Start__gte": "2024-06-01"})
+        self.assertEqual([e.employee_id for e in employees], ["E3"])
+
+
+class EmployeeFacetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        DynamicFormFields.objects.create(
+            field_label="Department", field_type="select", field_order=1, extra={"options": "IT,HR,Ops"}
+        )
+        DynamicFormFields.objects.create(
+            field_label="Site", field_type="radio", field_order=2, extra={"options": "North,South"}
+        )
+        DynamicFormFields.objects.create(field_label="Notes", field_type="text", field_order=3)
+        for name, extra_data in [
+            ("a", {"Department": "IT", "Site": "North"}),
+            ("b", {"department": "IT", "site": "South"}),
+            ("c", {"Department": "HR", "Site": "North", "Notes": "x"}),
+        ]:
+            EmployeeData.objects.create(uid=User.objects.create_user(username=name), employee_id=name, extra_data=extra_data)
+
+    def counts(self, facets):
+        return {f["field"]: {o["value"]: o["count"] for o in f["options"]} for f in facets}
+
+    def test_counts_every_option_in_one_query(self):
+        '''
+        Facets count select/radio options under the filters with one query.
+        '''
+
+        with CaptureQueriesContext(connection) as queries:
+            facets = employee_facets({"Site": "North"})
+        self.assertEqual(self.counts(facets), {
+            "Department": {"IT": 1, "HR": 1, "Ops": 0},
+            "Site": {"North": 2, "South": 0},
+        })
+        # schema and employees version lookups, then the grouped count
+        self.assertEqual(len(queries), 3)
+
+        response = self.api_client.get(reverse("api-employees-facets"))
+        self.assertEqual(self.counts(response.data["facets"])["Department"], {"IT": 2, "HR": 1, "Ops": 0})
+
+    def test_cached_counts_are_invalidated_by_employee_writes(self):
+        '''
+        Cached facets are reused until an employee is written.
+        '''
+
+        employee_facets({})
+        with CaptureQueriesContext(connection) as queries:
+            employee_facets({})
+        self.assertEqual(len(queries), 2)
+
+        EmployeeData.objects.get(employee_id="c").uid.delete()
+        self.assertEqual(self.counts(employee_facets({}))["Department"]["HR"], 0)
+
+        operations = [{"op": "update", "employee_id": "a", "data": {"department": "Ops"}}]
+        self.api_client.post(reverse("api-employees-bulk"), {"operations": operations}, format="json")
+        self.assertEqual(self.counts(employee_facets({}))["Department"], {"IT": 1, "HR": 0, "Ops": 1})
+
+    def test_list_view_shows_counts_on_request(self):
+        '''
+        The list view adds option counts to its filter bar in facet mode.
+        '''
+
+        response = self.client.get(reverse("employee_list"))
+        self.assertNotContains(response, "IT (2)")
+        response = self.client.get(reverse("employee_list"), {"facets": "1", "Department": "IT"})
+        self.assertContains(response, "IT (2)")
+        self.assertContains(response, "North (1)")
+
+
+class HeadcountReportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.department = DynamicFormFields.objects.create(
+            field_label="Department", field_type="select", field_order=1, extra={"options": "IT,HR"}
+        )
+        for name, extra_data in [("a", {"Department": "IT"}), ("b", {"department": "IT"}), ("c", {})]:
+            EmployeeData.objects.create(uid=User.objects.create_user(username=name), employee_id=name, extra_data=extra_data)
+
+    def groups(self, name="department"):
+        response = self.api_client.get(reverse("api-reports-detail", args=[name]))
+        self.assertEqual(response.status_code, 200)
+        return {g["bucket"]: g["count"] for g in response.data["groups"]}
+
+    def test_rollups_follow_creates_updates_and_deletes(self):
+        '''
+        Reports reflect every kind of employee write without a recount.
+        '''
+
+        self.assertEqual(self.groups(), {"IT": 2, "HR": 0, None: 1})
+
+        operations = [
+            {"op": "update", "employee_id": "a", "data": {"department": "HR"}},
+            {"op": "create", "data": {
+                "username": "d", "first_name": "D", "last_name": "D", "email": "d@example.com",
+                "password": "secret123", "department": "HR",
+            }},
+        ]
+        self.api_client.post(reverse("api-employees-bulk"), {"operations": operations}, format="json")
+        self.assertEqual(self.groups(), {"IT": 1, "HR": 2, None: 1})
+
+        User.objects.filter(username__in=["b", "c"]).delete()
+        self.assertEqual(self.groups(), {"IT": 0, "HR": 2, None: 0})
+
+        month = EmployeeData.objects.first().created_on.strftime("%Y-%m")
+        self.assertEqual(self.groups("created_month"), {month: 2})
+
+    def test_report_reads_are_one_query(self):
+        '''
+        Reading a report only touches the rollup rows.
+        '''
+
+        get_schema()
+        with CaptureQueriesContext(connection) as queries:
+            self.groups()
+        self.assertEqual(len(queries), 2)
+        self.assertIn("employee_employeerollup", queries[-1]["sql"])
+
+        response = self.api_client.get(reverse("api-reports-list"))
+        self.assertEqual([r["report"] for r in response.data["reports"]], ["created_month", "department"])
+        self.assertEqual(self.api_client.get(reverse("api-reports-detail", args=["nope"])).status_code, 404)
+
+    def test_rebuild_corrects_drift_and_renames_recount(self):
+        '''
+        The rebuild command recounts, and renaming a field recounts it.
+        '''
+
+        EmployeeRollup.objects.update(count=99)
+        out = StringIO()
+        call_command("rebuild_rollups", stdout=out)
+        self.assertIn("Recounted", out.getvalue())
+        self.assertEqual(self.groups(), {"IT": 2, "HR": 0, None: 1})
+
+        self.department.field_label = "Team"
+        self.department.save()
+        self.assertEqual(self.groups("team"), {"IT": 0, "HR": 0, None: 3})
+
+    def test_added_fields_count_stored_values(self):
+        '''
+        A select field added under a label already in `extra_data` counts
+        those values, from the form configuration save and from the API.
+        '''
+
+        self.department.delete()
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("employee_form_config"),
+            data=json.dumps({"fields": [{"label": "Department", "field_type": "select", "options": "IT,HR", "order": 1}]}),
+            content_type="application/json",
+        )
+        self.assertEqual(self.groups(), {"IT": 2, "HR": 0, None: 1})
+
+        DynamicFormFields.objects.get(field_label="Department").delete()
+        self.api_client.post(reverse("api-fields-add-field"), {
+            "field_label": "Department", "field_type": "radio", "options": ["IT", "HR"], "field_order": 1,
+        }, format="json")
+        self.assertEqual(self.groups(), {"IT": 2, "HR": 0, None: 1})
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.field = DynamicFormFields.objects.create(field_label="Team", field_type="text", field_order=1)
+        self.employee = EmployeeData.objects.create(
+            uid=User.objects.create_user(username="emp", first_name="Em"), employee_id="E1"
+        )
+
+    def get(self, url, **headers):
+        return self.api_client.get(url, format="json", **headers)
+
+    def test_unchanged_lists_answer_304_without_querying_rows(self):
+        '''
+        Lists carry an ETag and answer a matching If-None-Match with 304.
+        '''
+
+        for url in (reverse("api-fields-list"), reverse("api-employees-list")):
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+            self.assertTrue(response.has_header("Last-Modified"))
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+            self.assertEqual(len(queries), 1)
+
+            # other query parameters are another representation
+            self.assertEqual(self.get(url + "?page=1", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_writes_change_the_validators(self):
+        '''
+        Field, employee and user writes invalidate the matching ETags.
+        '''
+
+        fields_etag = self.get(reverse("api-fields-list"))["ETag"]
+        self.field.field_label = "Squad"
+        self.field.save()
+        self.assertEqual(self.get(reverse("api-fields-list"), HTTP_IF_NONE_MATCH=fields_etag).status_code, 200)
+
+        url = reverse("api-employees-detail", args=[self.employee.id])
+        list_etag = self.get(reverse("api-employees-list"))["ETag"]
+        response = self.get(url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        User.objects.get(username="emp").save(update_fields=["last_login"])
+        self.assertEqual(self.get(reverse("api-employees-list"), HTTP_IF_NONE_MATCH=list_etag).status_code, 304)
+
+        user = User.objects.get(username="emp")
+        user.first_name = "Emma"
+        user.save()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.get(reverse("api-employees-list"), HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        self.assertEqual(self.get(reverse("api-employees-detail", args=[0])).status_code, 404)
+
+    def test_field_edits_change_the_list_validators(self):
+        '''
+        Renaming a field changes how employee lists filter and sort, their
+        ETags change with it.
+        '''
+
+        urls = [reverse("api-employees-list"), reverse("api-async-employees-list")]
+        etags = [self.get(url, data={"Team": "x"})["ETag"] for url in urls]
+        self.field.field_label = "Squad"
+        self.field.save()
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.get(url, data={"Team": "x"}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_writes_within_a_second_are_not_answered_304(self):
+        '''
+        Last-Modified rounds up to the next second and If-Modified-Since
+        alone never answers 304, so a second write within the same second is
+        not hidden.
+        '''
+
+        url = reverse("api-employees-detail", args=[self.employee.id])
+        written = datetime.datetime(2024, 5, 1, 9, 30, 0, 100000, tzinfo=datetime.timezone.utc)
+        EmployeeData.objects.filter(pk=self.employee.pk).update(updated_on=written)
+        response = self.get(url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        self.assertEqual(last_modified, "Wed, 01 May 2024 09:30:01 GMT")
+
+        EmployeeData.objects.filter(pk=self.employee.pk).update(
+            employee_id="E2", updated_on=written + datetime.timedelta(milliseconds=500),
+        )
+        response = self.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["employee_id"], "E2")
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class EmployeeChangeFeedTests(TransactionTestCase):
+    # changes only reach the feed once their transaction has committed
+    serialized_rollback = True
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.url = reverse("api-employees-changes")
+        self.first = EmployeeData.objects.create(uid=User.objects.create_user(username="first"), employee_id="E1")
+        self.second = EmployeeData.objects.create(uid=User.objects.create_user(username="second"), employee_id="E2")
+
+    def feed(self, since=None, **params):
+        if since:
+            params["since"] = since
+        response = self.api_client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_feed_pages_changes_and_resumes_from_cursor(self):
+        '''
+        The feed lists writes in order and resumes from its cursor.
+        '''
+
+        page = self.feed(limit=1)
+        self.assertEqual([(r["id"], r["action"]) for r in page["results"]], [(self.first.id, "upsert")])
+        self.assertTrue(page["has_more"])
+        page = self.feed(page["cursor"])
+        self.assertEqual([r["employee"]["employee_id"] for r in page["results"]], ["E2"])
+        self.assertFalse(page["has_more"])
+
+        cursor = page["cursor"]
+        self.assertEqual(self.feed(cursor), {"cursor": cursor, "has_more": False, "results": []})
+
+        self.first.employee_id = "E1b"
+        self.first.save()
+        self.first.save()
+        page = self.feed(cursor)
+        self.assertEqual([r["employee"]["employee_id"] for r in page["results"]], ["E1b"])
+
+    def test_deletes_leave_tombstones(self):
+        '''
+        Deleting through the API or the list view is reported in the feed.
+        '''
+
+        cursor = self.feed()["cursor"]
+        self.api_client.delete(reverse("api-employees-detail", args=[self.first.id]))
+        self.client.delete(reverse("employee_list", args=[self.second.id]))
+        page = self.feed(cursor)
+        self.assertEqual(
+            [(r["id"], r["action"], r["employee"]) for r in page["results"]],
+            [(self.first.id, "delete", None), (self.second.id, "delete", None)],
+        )
+
+        # an upsert of a since deleted employee is left to its tombstone
+        self.assertEqual([r["action"] for r in self.feed(limit=1)["results"]], [])
+
+    def test_invalid_cursor_and_prune(self):
+        '''
+        Bad cursors are rejected, old changes can be pruned.
+        '''
+
+        self.assertEqual(self.api_client.get(self.url, {"since": "nope"}).status_code, 400)
+        out = StringIO()
+        call_command("prune_employee_changes", "--days", "0", stdout=out)
+        self.assertIn("Deleted", out.getvalue())
+        self.assertEqual(self.feed()["results"], [])
+
+
+@override_settings(EMPLOYEE_SSE_POLL_INTERVAL=0.05, EMPLOYEE_SSE_KEEPALIVE=0.2, EMPLOYEE_SSE_MAX_AGE=5)
+class DirectoryEventsTests(TransactionTestCase):
+    # changes only reach the feed once their transaction has committed
+    serialized_rollback = True
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.async_client = AsyncClient()
+        self.async_client.force_login(self.user)
+        self.url = reverse("directory_events")
+        EmployeeData.objects.create(uid=self.user, employee_id="E0")
+
+    async def read_events(self, response, count):
+        events = []
+        async for chunk in response.streaming_content:
+            frame = chunk.decode()
+            if frame.startswith("id:"):
+                lines = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+                events.append((lines["event"], json.loads(lines["data"])))
+            if len(events) == count:
+                break
+        await response.streaming_content.aclose()
+        return events
+
+    async def test_resumes_after_last_event_id(self):
+        '''
+        Changes made after the Last-Event-ID are replayed one by one, fields
+        included.
+        '''
+
+        cursor = await sync_to_async(latest_cursor)()
+        employee = await sync_to_async(EmployeeData.objects.create)(
+            uid=await sync_to_async(User.objects.create_user)(username="first"), employee_id="E1"
+        )
+        employee.employee_id = "E1b"
+        await sync_to_async(employee.save)()
+        field = await sync_to_async(DynamicFormFields.objects.create)(
+            field_label="Team", field_type="text", field_order=1, extra={"options": ""}
+        )
+        employee_id = employee.id
+        await sync_to_async(employee.delete)()
+
+        response = await self.async_client.get(self.url, headers={"Last-Event-ID": cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = await self.read_events(response, 4)
+        self.assertEqual(
+            [(resource, data["action"], data["id"]) for resource, data in events],
+            [
+                ("employee", "create", employee_id), ("employee", "update", employee_id),
+                ("field", "create", field.id), ("employee", "delete", employee_id),
+            ],
+        )
+
+    async def test_pushes_new_changes(self):
+        '''
+        A connected client receives changes made while it listens.
+        '''
+
+        response = await self.async_client.get(self.url)
+        chunks = response.streaming_content
+        self.assertEqual(await anext(chunks), b"retry: 3000\n\n")
+
+        def create_and_rename():
+            # one transaction, read by the broadcaster in one batch
+            with transaction.atomic():
+                field = DynamicFormFields.objects.create(
+                    field_label="Team", field_type="text", field_order=1, extra={"options": ""}
+                )
+                field.field_label = "Squad"
+                field.save()
+
+        await sync_to_async(create_and_rename)()
+        events = await self.read_events(response, 2)
+        self.assertEqual(
+            [(resource, data["action"]) for resource, data in events], [("field", "create"), ("field", "update")]
+        )
+
+    def terminate(self, pid):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+
+    async def test_broadcaster_survives_database_errors(self):
+        '''
+        A failed read is retried and a dropped listener reopened.
+        '''
+
+        opened, reads = [], []
+
+        def open_listener():
+            opened.append(_open_listener())
+            return opened[-1]
+
+        def read(cursor):
+            reads.append(cursor)
+            if len(reads) == 1:
+                raise OperationalError("server closed the connection unexpectedly")
+            return _read_changes(cursor)
+
+        async def wait_for(condition):
+            for _ in range(200):
+                if condition():
+                    return
+                await asyncio.sleep(0.01)
+            self.fail("timed out")
+
+        broadcaster = DirectoryBroadcaster()
+        with mock.patch("employee.events._open_listener", open_listener), \
+                mock.patch("employee.events._read_changes", read), mock.patch("employee.events.BACKOFF", 0.01), \
+                self.assertLogs("employee.events", "WARNING") as logs:
+            stream = broadcaster.stream()
+            self.assertEqual(await anext(stream), "retry: 3000\n\n")
+            await wait_for(lambda: len(opened) == 2 and len(reads) > 1)
+            self.assertTrue(opened[0].closed)
+
+            await sync_to_async(self.terminate)(opened[1].info.backend_pid)
+            await wait_for(lambda: len(opened) == 3)
+            self.assertTrue(opened[1].closed)
+
+            await sync_to_async(DynamicFormFields.objects.create)(
+                field_label="Team", field_type="text", field_order=1, extra={"options": ""}
+            )
+            frame = await anext(stream)
+            while not frame.startswith("id:"):
+                frame = await anext(stream)
+            self.assertIn("event: field", frame)
+            await stream.aclose()
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            ["Directory event broadcaster failed, retrying in 0.01s", "Directory event listener lost, reconnecting"],
+        )
+        self.assertIsNone(broadcaster.task)
+
+    def test_rejects_anonymous_invalid_ids_and_wsgi(self):
+        '''
+        Streams need a login, a valid event id and an ASGI server.
+        '''
+
+        self.assertEqual(async_to_sync(AsyncClient().get)(self.url).status_code, 403)
+        response = async_to_sync(self.async_client.get)(self.url, headers={"Last-Event-ID": "nope"})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 501)
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+        DynamicFormFields.objects.create(
+            field_label="Team", field_type="select", field_order=1, extra={"options": "Red,Blue"}
+        )
+        for i, team in enumerate(["Red", "Red", "Blue", "Red"]):
+            EmployeeData.objects.create(
+                uid=User.objects.create_user(username=f"emp{i}"), employee_id=f"E{i}", extra_data={"Team": team}
+            )
+
+    def assertSameResponse(self, sync_url, async_url):
+        expected = self.api_client.get(sync_url, format="json")
+        response = self.client.get(async_url, **self.auth)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response.get("ETag"), expected.get("ETag"))
+        return response
+
+    def test_payloads_match_the_sync_views(self):
+        '''
+        List, detail, facets and fields answer like the router endpoints.
+        '''
+
+        employee = EmployeeData.objects.first()
+        for name, args, query in [
+            ("employees-list", [], "?Team=Red&count=true"),
+            ("employees-detail", [employee.id], ""),
+            ("employees-detail", [0], ""),
+            ("employees-facets", [], "?Team=Red"),
+            ("fields-list", [], ""),
+        ]:
+            with self.subTest(name):
+                self.assertSameResponse(
+                    reverse(f"api-{name}", args=args) + query, reverse(f"api-async-{name}", args=args) + query
+                )
+
+    @override_settings(EMPLOYEE_METRICS=True, DEBUG=True)
+    def test_middleware_keeps_the_views_async(self):
+        '''
+        Under ASGI no middleware is adapted to sync, and the queries of async
+        views are still routed, counted and timed.
+        '''
+
+        with self.assertLogs("django.request", "DEBUG") as logs:
+            ASGIHandler()
+            logging.getLogger("django.request").debug("Middleware loaded.")
+        self.assertEqual([record.getMessage() for record in logs.records], ["Middleware loaded."])
+
+        response = async_to_sync(AsyncClient().get)(
+            reverse("api-async-employees-list"), headers={"Authorization": self.auth["HTTP_AUTHORIZATION"]}
+        )
+        self.assertEqual(response.status_code, 200)
+        queries = re.fullmatch(r"default=(\d+); replica-preferred", response["X-DB-Route"])
+        self.assertIsNotNone(queries, response["X-DB-Route"])
+        self.assertGreater(int(queries[1]), 0)
+        self.assertIn(f'desc="{queries[1]} queries"', response["Server-Timing"])
+
+    def test_cursor_pages_and_304(self):
+        '''
+        Cursor links follow the same pages, unchanged lists answer 304.
+        '''
+
+        def walk(get, url):
+            pages = []
+            while url:
+                payload = get(url).json()
+                pages.append([row["employee_id"] for row in payload["results"]])
+                url = payload["next"]
+            return pages
+
+        url = reverse("api-async-employees-list")
+        with mock.patch.object(EmployeeCursorPagination, "page_size", 3):
+            pages = walk(lambda next_url: self.client.get(next_url, **self.auth), url)
+            self.assertEqual(pages, [["E3", "E2", "E1"], ["E0"]])
+            self.assertEqual(pages, walk(self.api_client.get, reverse("api-employees-list")))
+
+        etag = self.client.get(url, **self.auth)["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 304)
+        # the user lookup and the version stamp
+        self.assertEqual(len(queries), 2)
+
+    def test_requires_authentication(self):
+        '''
+        Anonymous requests get the same 401 as the DRF views.
+        '''
+
+        response = self.client.get(reverse("api-async-employees-list"))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), APIClient().get(reverse("api-employees-list")).json())
+
+
+@skipUnless(ConnectionPool and connection.vendor == "postgresql", "requires psycopg-pool")
+class PooledBackendTests(TestCase):
+    def test_connections_go_back_to_the_pool(self):
+        '''
+        Closing a pooled connection returns it to the pool instead of
+        disconnecting, for the next request to reuse.
+        '''
+
+        backend = load_backend("ems.pooled_postgresql")
+        wrapper = backend.DatabaseWrapper(
+            {**connection.settings_dict, "POOL": {"MIN_SIZE": 1, "MAX_SIZE": 1}}, alias=connection.alias
+        )
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT pg_backend_pid()")
+                first = cursor.fetchone()[0]
+            wrapper.close()
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT pg_backend_pid()")
+                self.assertEqual(cursor.fetchone()[0], first)
+            wrapper.close()
+        finally:
+            close_pools()
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.employee = EmployeeData.objects.create(uid=User.objects.create_user(username="emp"), employee_id="E1")
+
+    @mock.patch("employee.routers.replica_configured", return_value=True)
+    def test_reads_leave_the_replica_after_a_write(self, configured):
+        '''
+        Opted in reads use the replica until the request writes, and never
+        right after the client wrote.
+        '''
+
+        router = ReplicaRouter()
+        self.assertEqual(read_alias(), "default")
+        with routing_scope():
+            self.assertEqual(router.db_for_read(EmployeeData), "default")
+            prefer_replica()
+            self.assertEqual(router.db_for_read(EmployeeData), "replica")
+            self.assertEqual(router.db_for_write(EmployeeData), "default")
+            self.assertEqual(router.db_for_read(EmployeeData), "default")
+        with routing_scope(pinned=True):
+            prefer_replica()
+            self.assertEqual(read_alias(), "default")
+
+    @mock.patch("employee.routers.replica_configured", return_value=True)
+    def test_writes_pin_the_client_to_the_primary(self, configured):
+        '''
+        A response to a write sets the cookie keeping the client on the
+        primary, and reports where its queries ran.
+        '''
+
+        response = self.api_client.patch(
+            reverse("api-employees-detail", args=[self.employee.id]), {"employee_id": "E2"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        self.assertRegex(response["X-DB-Route"], r"^default=\d+; wrote$")
+
+    def test_directory_reads_are_routed(self):
+        '''
+        List, detail, search and export requests ask for the replica and
+        report it, other requests don't.
+        '''
+
+        for url in (
+            reverse("api-employees-list") + "?q=emp",
+            reverse("api-employees-detail", args=[self.employee.id]),
+            reverse("api-employees-autocomplete") + "?q=E",
+            reverse("api-employees-export"),
+        ):
+            with self.subTest(url):
+                response = self.api_client.get(url, format="json")
+                self.assertEqual(response.status_code, 200)
+                self.assertRegex(response["X-DB-Route"], r"^default=\d+; replica-preferred$")
+                self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+        response = self.api_client.get(reverse("api-employees-changes"), format="json")
+        self.assertRegex(response["X-DB-Route"], r"^default=\d+$")
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.client.force_login(self.user)
+
+    @override_settings(EMPLOYEE_PASSWORD_HASH_WORKERS=2)
+    def test_batches_are_hashed_in_worker_processes(self):
+        '''
+        Worker processes hash a batch in order, with the configured hasher.
+        '''
+
+        passwords = [f"secret{i}" for i in range(16)]
+        hashes = hash_passwords(passwords)
+
+        self.assertEqual(len(set(hashes)), len(passwords))
+        for password, encoded in zip(passwords, hashes):
+            self.assertTrue(check_password(password, encoded))
+
+    def test_import_of_hashed_and_unusable_passwords(self):
+        '''
+        Hashed passwords are stored as given, bad hashes rejected, and
+        unusable mode creates users without a password.
+        '''
+
+        encoded = make_password("secret123")
+        content = (
+            "username,first_name,last_name,email,password\n"
+            f"amy,Amy,Lee,amy@example.com,{encoded}\n"
+            "bob,Bob,Ray,bob@example.com,secret123\n"
+        )
+        result = EmployeeImporter(password_mode=HASHED).run(read_rows(BytesIO(content.encode()), "csv"))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors[0]["row"], 2)
+        self.assertEqual(User.objects.get(username="amy").password, encoded)
+
+        content = "username,first_name,last_name,email\ncat,Cat,Roy,cat@example.com\n"
+        upload = SimpleUploadedFile("staff.csv", content.encode())
+        response = self.api_client.post(
+            reverse("api-employees-import-file"), {"file": upload, "password_mode": UNUSABLE}, format="multipart"
+        )
+        self.assertEqual(response.data["created"], 1)
+        self.assertFalse(User.objects.get(username="cat").has_usable_password())
+
+        upload = SimpleUploadedFile("staff.csv", content.encode())
+        response = self.api_client.post(
+            reverse("api-employees-import-file"), {"file": upload, "password_mode": "md5"}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_imported_users_set_their_first_password(self):
+        '''
+        Users imported without a password get a reset email and can log in
+        with the password they set through it. Accounts disabled on purpose
+        get no email.
+        '''
+
+        disabled = User.objects.create_user(username="off", email="off@example.com")
+        disabled.set_unusable_password()
+        disabled.save()
+        content = "username,first_name,last_name,email\ncat,Cat,Roy,cat@example.com\n"
+        EmployeeImporter(password_mode=UNUSABLE).run(read_rows(BytesIO(content.encode()), "csv"))
+        client = Client()
+        client.post(reverse("password_reset"), {"email": "off@example.com"})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(client.login(username="cat", password="N3w-Passw0rd!"))
+
+        response = client.post(reverse("password_reset"), {"email": "CAT@example.com"})
+        self.assertRedirects(response, reverse("password_reset_done"))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["cat@example.com"])
+        link = re.search(r"https?://[^/]+(/reset/\S+/)", mail.outbox[0].body)[1]
+
+        # the token moves to the session, the form lives at .../set-password/
+        response = client.get(link)
+        self.assertEqual(response.status_code, 302)
+        response = client.post(response.url, {"new_password1": "N3w-Passw0rd!", "new_password2": "N3w-Passw0rd!"})
+        self.assertRedirects(response, reverse("password_reset_complete"))
+        self.assertTrue(client.login(username="cat", password="N3w-Passw0rd!"))
+        # the link is single use
+        self.assertFalse(client.get(link, follow=True).context["validlink"])
+
+    def test_created_users_are_written_once(self):
+        '''
+        API and form creations store the hashed password with the insert,
+        without a second UPDATE of the user row.
+        '''
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api_client.post(reverse("api-employees-list"), {
+                "username": "john", "first_name": "John", "last_name": "Doe",
+                "email": "john@example.com", "password": "Str0ng@123",
+            }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([q for q in queries if q["sql"].startswith('UPDATE "auth_user"')])
+        self.assertTrue(User.objects.get(username="john").check_password("Str0ng@123"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("employee_create"), {
+                "username": "jane", "first_name": "Jane", "email": "jane@example.com",
+                "employee_id": "E002", "password": "secret123",
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if q["sql"].startswith('UPDATE "auth_user"')])
+        self.assertTrue(User.objects.get(username="jane").check_password("secret123"))
+
+
+@override_settings(EMPLOYEE_METRICS=True, EMPLOYEE_METRICS_TOKEN="scrape")
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        self.user = User.objects.create_user(username="admin", password="admin123", is_staff=True)
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.client.force_login(self.user)
+        self.employee = EmployeeData.objects.create(uid=User.objects.create_user(username="emp"), employee_id="E1")
+
+    def test_server_timing_header(self):
+        '''
+        Responses report their queries, template and serializer time.
+        '''
+
+        response = self.api_client.get(reverse("api-employees-list"), format="json")
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+, total;dur=[\d.]+$')
+
+        response = self.client.get(reverse("employee_list"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", template;dur=[\d.]+, total;dur=')
+
+    def test_metrics_endpoint(self):
+        '''
+        Requests are aggregated per URL name, for staff users and scrapers
+        holding the token.
+        '''
+
+        self.api_client.get(reverse("api-employees-list"), format="json")
+        self.api_client.get(reverse("api-employees-list"), format="json")
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('ems_request_duration_seconds_count{view="api-employees-list",method="GET"} 2', body)
+        self.assertIn('ems_request_db_queries_bucket{view="api-employees-list",method="GET",le="+Inf"} 2', body)
+        self.assertIn("# TYPE ems_request_serializer_seconds_total counter", body)
+
+        anonymous = Client()
+        self.assertEqual(anonymous.get(reverse("metrics")).status_code, 403)
+        response = anonymous.get(reverse("metrics"), headers={"Authorization": "Bearer scrape"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_disabled(self):
+        '''
+        Without EMPLOYEE_METRICS the middleware drops out and the endpoint
+        is gone.
+        '''
+
+        with override_settings(EMPLOYEE_METRICS=False):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            response = client.get(reverse("api-employees-list"), format="json")
+            self.assertNotIn("Server-Timing", response)
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+
+class QueryBudgetTests(TestCase):
+    '''
+    N+1 guards: every employee and field endpoint runs a fixed number of
+    queries, whatever the size of the directory. Each request is measured
+    with a cold cache, then again after the directory has grown, and both
+    counts must match and stay within the endpoint's budget.
+    '''
+
+    EMPLOYEES = 200
+    FIELDS = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="admin", password="admin123", is_staff=True)
+        cls.seed_fields(0, cls.FIELDS)
+        cls.seed_employees(0, cls.EMPLOYEES)
+        cls.employee = EmployeeData.objects.order_by("id").first()
+
+    @classmethod
+    def seed_fields(cls, start, count):
+        types = ["select", "text", "number", "radio"]
+        DynamicFormFields.objects.bulk_create([
+            DynamicFormFields(
+                field_label=f"Field {i}", field_type=types[i % len(types)], field_order=spaced_order(i),
+                extra={"options": "Red,Blue,Green"} if types[i % len(types)] in ("select", "radio") else {},
+            )
+            for i in range(start, start + count)
+        ])
+        versions.bump(versions.SCHEMA)
+
+    @classmethod
+    def seed_employees(cls, start, count):
+        fields = list(DynamicFormFields.objects.all())
+        pairs = []
+        for i in range(start, start + count):
+            extra_data = {}
+            for field in fields:
+                if field.field_type in ("select", "radio"):
+                    extra_data[field.field_label] = ["Red", "Blue", "Green"][i % 3]
+                elif field.field_type == "number":
+                    extra_data[field.field_label] = i
+                else:
+                    extra_data[field.field_label] = f"value {i}"
+            user = User(username=f"emp{i}", first_name=f"First{i}", last_name=f"Last{i}", email=f"emp{i}@example.com")
+            pairs.append((user, EmployeeData(employee_id=f"E{i}", extra_data=extra_data)))
+        bulk_create_employees(pairs, UNUSABLE)
+
+    def setUp(self):
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.client.force_login(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def count_queries(self, request):
+        # cold caches, the in-process schema included
+        cache.clear()
+        with mock.patch("employee.schema._cached", None), CaptureQueriesContext(connection) as queries:
+            response = request()
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, getattr(response, "content", b"")[:200])
+        return len(queries)
+
+    def assertFlatQueries(self, budget, request, grown_request=None):
+        '''
+        `request()` runs at most `budget` queries, and `grown_request()` (a
+        second `request()` by default) as many once the directory has grown.
+        '''
+        before = self.count_queries(request)
+        self.seed_fields(self.FIELDS, 4)
+        self.seed_employees(self.EMPLOYEES, 150)
+        after = self.count_queries(grown_request or request)
+        self.assertLessEqual(before, budget)
+        self.assertEqual(after, before, "query count grows with the directory")
+
+    def test_html_pages(self):
+        '''
+        HTML - employee list, creation, edit and form configuration pages.
+        '''
+
+        selected = urlencode({DynamicFormFields.objects.filter(field_type="select").first().field_label: "Red"})
+        for budget, url in [
+            (7, reverse("employee_list")),
+            (9, reverse("employee_list") + f"?q=emp&{selected}&facets=1"),
+            (4, reverse("employee_create")),
+            (6, reverse("employee_edit", args=[self.employee.id])),
+            (4, reverse("employee_form_config")),
+        ]:
+            with self.subTest(url), transaction.atomic():
+                self.assertFlatQueries(budget, lambda: self.client.get(url))
+                transaction.set_rollback(True)
+
+    def test_api_reads(self):
+        '''
+        API - employee, field and report reads, sync and async.
+        '''
+
+        field = DynamicFormFields.objects.filter(field_type="select").first()
+        selected = urlencode({field.field_label: "Red"})
+        for budget, url, kwargs in [
+            (3, reverse("api-fields-list"), {}),
+            (2, reverse("api-fields-detail", args=[field.id]), {}),
+            (4, reverse("api-employees-list"), {}),
+            (6, reverse("api-employees-list") + f"?{selected}&count=true&q=emp", {}),
+            (2, reverse("api-employees-detail", args=[self.employee.id]), {}),
+            (1, reverse("api-employees-autocomplete") + "?q=emp", {}),
+            (4, reverse("api-employees-facets") + f"?{selected}", {}),
+            (3, reverse("api-employees-export"), {}),
+            (3, reverse("api-employees-export") + "?export_format=ndjson", {}),
+            (2, reverse("api-employees-changes"), {}),
+            (2, reverse("api-reports-list"), {}),
+            (3, reverse("api-reports-detail", args=["created_month"]), {}),
+            (3, reverse("api-async-fields-list"), self.auth),
+            (5, reverse("api-async-employees-list"), self.auth),
+            (2, reverse("api-async-employees-detail", args=[self.employee.id]), self.auth),
+            (5, reverse("api-async-employees-facets"), self.auth),
+        ]:
+            client = self.client if kwargs else self.api_client
+            with self.subTest(url), transaction.atomic():
+                self.assertFlatQueries(budget, lambda: client.get(url, **kwargs))
+                transaction.set_rollback(True)
+
+    def test_writes(self):
+        '''
+        API and HTML - employee and field writes.
+        '''
+
+        def new_employee(suffix):
+            return {
+                "username": f"new{suffix}", "first_name": "New", "last_name": "Hire",
+                "email": f"new{suffix}@example.com", "password": "secret123", "employee_id": f"N{suffix}",
+                "field_0": "Red", "field_2": "4", "Field 0": "Red", "Field 2": "4",
+            }
+
+        def form_config(label):
+            fields = [
+                {"id": f.id, "label": f.field_label, "field_type": f.field_type, "order": i,
+                 "options": f.extra.get("options", "")}
+                for i, f in enumerate(DynamicFormFields.objects.all())
+            ]
+            fields[1]["label"] = label
+            return json.dumps({"fields": fields})
+
+        def bulk(suffix):
+            operations = [{"op": "create", "data": new_employee(f"{suffix}{i}")} for i in range(5)]
+            operations += [{"op": "update", "id": self.employee.id, "data": {"first_name": f"Bulk{suffix}"}}]
+            return {"operations": operations}
+
+        field = DynamicFormFields.objects.order_by("field_order").last()
+        username = self.employee.uid.username
+        writes = [
+            (8, "api create", lambda suffix: self.api_client.post(
+                reverse("api-employees-list"), new_employee(suffix), format="json")),
+            (7, "api update", lambda suffix: self.api_client.patch(
+                reverse("api-employees-detail", args=[self.employee.id]), {"first_name": f"Name{suffix}"}, format="json")),
+            (17, "bulk", lambda suffix: self.api_client.post(reverse("api-employees-bulk"), bulk(suffix), format="json")),
+            (18, "form create", lambda suffix: self.client.post(reverse("employee_create"), new_employee(suffix))),
+            (15, "form edit", lambda suffix: self.client.post(
+                reverse("employee_edit", args=[self.employee.id]),
+                dict(new_employee(suffix), username=username))),
+            (9, "form config save", lambda suffix: self.client.post(
+                reverse("employee_form_config"), form_config(f"Renamed {suffix}"), content_type="application/json")),
+            (6, "field reorder", lambda suffix: self.api_client.put(
+                reverse("api-fields-update-order"), {"id": field.id, "field_order": 1}, format="json")),
+            # a new field reads the stored values for its typed values
+            (7, "add field", lambda suffix: self.api_client.post(
+                reverse("api-fields-add-field"), {"field_label": f"Added {suffix}", "field_type": "text"}, format="json")),
+        ]
+        for budget, name, write in writes:
+            with self.subTest(name), transaction.atomic():
+                self.assertFlatQueries(budget, lambda: write("a"), lambda: write("b"))
+                transaction.set_rollback(True)
+
+
+class SeedEmployeesTests(TestCase):
+    def test_seeds_up_to_the_totals(self):
+        '''
+        The generator tops the directory up to the requested totals, with
+        the same values for the same seed.
+        '''
+
+        out = StringIO()
+        call_command("seed_employees", "--employees", "30", "--fields", "10", "--batch-size", "8", stdout=out)
+        self.assertIn("Created 10 field(s) and 30 employee(s)", out.getvalue())
+        self.assertEqual(EmployeeData.objects.count(), 30)
+        self.assertEqual(len(get_schema()), 10)
+        employee = EmployeeData.objects.select_related("uid").get(uid__username="seed7")
+        self.assertIn(employee.extra_data.get("Department", "Sales"), get_schema().get("Department")["options"])
+        self.assertTrue(employee.uid.check_password("seed-password"))
+
+        out = StringIO()
+        call_command("seed_employees", "--employees", "40", "--fields", "10", stdout=out)
+        self.assertIn("Created 0 field(s) and 10 employee(s)", out.getvalue())
+        self.assertEqual(EmployeeData.objects.count(), 40)
+
+        extra_data = employee.extra_data
+        User.objects.filter(username__startswith="seed").delete()
+        call_command("seed_employees", "--employees", "8", "--fields", "10", stdout=StringIO())
+        self.assertEqual(EmployeeData.objects.get(uid__username="seed7").extra_data, extra_data)
+
+    def test_benchmarked_api_list_is_filtered(self):
+        '''
+        The api_list benchmark times a list filtered on a select field.
+        '''
+
+        out = StringIO()
+        call_command(
+            "run_benchmarks", "--sizes", "40", "--paths", "api_list", "--repeat", "1", stdout=out, stderr=StringIO()
+        )
+        url = json.loads(out.getvalue())["results"][0]["url"]
+        field, option = next(iter(QueryDict(url.split("?", 1)[1]).items()))
+        api_client = APIClient()
+        api_client.force_authenticate(user=User.objects.get(username="seed0"))
+        with mock.patch.object(EmployeeCursorPagination, "page_size", 100):
+            employees = api_client.get(url).data["results"]
+        self.assertTrue(0 < len(employees) < 40)
+        self.assertTrue(all(employee["extra_data"][field] == option for employee in employees))
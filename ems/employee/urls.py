@@ -1,11 +1,13 @@
 from django.urls import path, include
-from .views import EmployeeFormView, EmployeeCreationView, EmployeeListView
+from .views import EmployeeFormView, EmployeeCreationView, EmployeeListView, DirectoryEventsView
 from rest_framework import routers
-from .api_views import DynamicFormFieldViewSet, EmployeeViewSet
+from .api_views import DynamicFormFieldViewSet, EmployeeReportViewSet, EmployeeViewSet
+from .async_views import AsyncEmployeeDetailView, AsyncEmployeeFacetsView, AsyncEmployeeListView, AsyncFieldListView
 
 router = routers.DefaultRouter()
 router.register(r'api/fields', DynamicFormFieldViewSet, basename='api-fields')
 router.register(r'api/employees', EmployeeViewSet, basename='api-employees')
+router.register(r'api/reports', EmployeeReportViewSet, basename='api-reports')
 
 urlpatterns = [
     path('form/config/', EmployeeFormView.as_view(), name='employee_form_config'),
@@ -13,6 +15,12 @@ urlpatterns = [
     path('edit/<int:pk>/', EmployeeCreationView.as_view(), name='employee_edit'),
     path('list/', EmployeeListView.as_view(), name='employee_list'),
     path('list/<int:pk>/', EmployeeListView.as_view(), name='employee_list'),
+    path('events/', DirectoryEventsView.as_view(), name='directory_events'),
+    # async read endpoints, same payloads as their router counterparts
+    path('api/async/fields/', AsyncFieldListView.as_view(), name='api-async-fields-list'),
+    path('api/async/employees/', AsyncEmployeeListView.as_view(), name='api-async-employees-list'),
+    path('api/async/employees/facets/', AsyncEmployeeFacetsView.as_view(), name='api-async-employees-facets'),
+    path('api/async/employees/<int:pk>/', AsyncEmployeeDetailView.as_view(), name='api-async-employees-detail'),
     # API router
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,149 @@
+'''
+Typed sidecar storage of dynamic field values.
+
+`EmployeeData.extra_data` keeps the raw values. When `EMPLOYEE_TYPED_VALUES`
+is on, every employee write also rewrites that employee's `EmployeeFieldValue`
+rows, parsing each value once by its field type. Filters, sorting and
+aggregates on number and date fields can then use the btree indexes of the
+value table instead of casting JSON over the whole employee table.
+'''
+
+import datetime
+import math
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import DynamicFormFields, EmployeeData, EmployeeFieldValue
+from .schema import describe_field, get_schema
+
+DEFAULT_CHUNK_SIZE = 2000
+
+TRUE_VALUES = ('true', 'on', '1', 'yes')
+FALSE_VALUES = ('false', 'off', '0', 'no')
+
+
+def typed_values_enabled():
+    return getattr(settings, 'EMPLOYEE_TYPED_VALUES', True)
+
+
+def stored_value(extra_data, field):
+    '''
+    Raw value of a dynamic field, form saves key it by label, the API by name.
+    '''
+    extra_data = extra_data or {}
+    value = extra_data.get(field['field_label'])
+    if value is None:
+        value = extra_data.get(field['name'])
+    return value
+
+
+def parse_number(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    return None
+
+
+def typed_columns(field, value):
+    '''
+    Column values of `EmployeeFieldValue` for one raw value. Values that
+    don't parse as the field type keep only their text.
+    '''
+    columns = {'value_text': value if isinstance(value, str) else str(value)}
+    field_type = field['field_type']
+    if field_type == 'number':
+        columns['value_num'] = parse_number(value)
+    elif field_type == 'date':
+        columns['value_date'] = parse_date(value)
+    elif field_type == 'checkbox':
+        columns['value_bool'] = parse_bool(value)
+    return columns
+
+
+def build_field_values(employee_id, extra_data, fields):
+    rows = []
+    for field in fields:
+        value = stored_value(extra_data, field)
+        if value is None or value == '':
+            continue
+        rows.append(EmployeeFieldValue(employee_id=employee_id, field_id=field['id'], **typed_columns(field, value)))
+    return rows
+
+
+def sync_field_values(employees, schema=None):
+    '''
+    Rewrite the typed values of saved `EmployeeData` instances, with one
+    delete and one insert whatever the number of employees.
+    '''
+    if not typed_values_enabled():
+        return
+    employees = [employee for employee in employees if employee.pk is not None]
+    if not employees:
+        return
+
+    schema = schema or get_schema()
+    rows = []
+    for employee in employees:
+        rows.extend(build_field_values(employee.pk, employee.extra_data, schema))
+    # joins the caller's transaction without a savepoint, the bulk paths
+    # already run in one
+    with transaction.atomic(savepoint=False):
+        EmployeeFieldValue.objects.filter(employee_id__in=[employee.pk for employee in employees]).delete()
+        EmployeeFieldValue.objects.bulk_create(rows)
+
+
+def rebuild_field_values(fields=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Recompute the typed values of the given `DynamicFormFields` (all of them
+    by default) for every employee, eg. after a field changed its label or
+    type. Returns the number of rows written.
+    '''
+    stale = EmployeeFieldValue.objects.all()
+    if fields is None:
+        fields = DynamicFormFields.objects.all()
+    else:
+        stale = stale.filter(field_id__in=[field.id for field in fields])
+    fields = [
+        describe_field({'id': field.id, 'field_label': field.field_label, 'field_type': field.field_type, 'extra': field.extra})
+        for field in fields
+    ]
+
+    written = 0
+    with transaction.atomic(savepoint=False):
+        stale.delete()
+        if not fields:
+            return written
+
+        rows = []
+        employees = EmployeeData.objects.order_by().values_list('id', 'extra_data')
+        for employee_id, extra_data in employees.iterator(chunk_size=chunk_size):
+            rows.extend(build_field_values(employee_id, extra_data, fields))
+            if len(rows) >= chunk_size:
+                EmployeeFieldValue.objects.bulk_create(rows)
+                written += len(rows)
+                rows = []
+        EmployeeFieldValue.objects.bulk_create(rows)
+        written += len(rows)
+    return written
@@ -0,0 +1,120 @@
+'''
+DB-backed version counters used to invalidate per-process caches.
+
+Every write that changes cached data bumps the counter of its scope, so any
+worker comparing its cached token with the stored one notices the change on
+its next request. The token is regenerated on every bump so that a bump
+rolled back with its transaction can never be mistaken for a later one.
+'''
+
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CacheVersion
+
+
+SCHEMA = 'schema'
+
+EMPLOYEES = 'employees'
+
+_local = threading.local()
+
+
+def current(scope):
+    '''
+    Return the (version, token) pair currently stored for the scope.
+    '''
+    row = CacheVersion.objects.filter(scope=scope).values_list('version', 'token').first()
+    return row or (0, None)
+
+
+def stamp(scope):
+    '''
+    Return the (token, updated_on) pair of the scope, for HTTP validators.
+    '''
+    row = CacheVersion.objects.filter(scope=scope).values_list('token', 'updated_on').first()
+    return row or (None, None)
+
+
+def _combine(scopes, rows):
+    stamps = {scope: (token, updated_on) for scope, token, updated_on in rows}
+    token = ':'.join(str(stamps.get(scope, (None,))[0]) for scope in scopes)
+    updated = [updated_on for _, updated_on in stamps.values()]
+    return token, max(updated) if updated else None
+
+
+def stamps(*scopes):
+    '''
+    `stamp` of data depending on several scopes, in one query: their tokens
+    joined and the latest update.
+    '''
+    rows = CacheVersion.objects.filter(scope__in=scopes).values_list('scope', 'token', 'updated_on')
+    return _combine(scopes, rows)
+
+
+async def acurrent(scope):
+    '''
+    Async variant of `current`.
+    '''
+    row = await CacheVersion.objects.filter(scope=scope).values_list('version', 'token').afirst()
+    return row or (0, None)
+
+
+async def astamp(scope):
+    '''
+    Async variant of `stamp`.
+    '''
+    row = await CacheVersion.objects.filter(scope=scope).values_list('token', 'updated_on').afirst()
+    return row or (None, None)
+
+
+async def astamps(*scopes):
+    '''
+    Async variant of `stamps`.
+    '''
+    rows = CacheVersion.objects.filter(scope__in=scopes).values_list('scope', 'token', 'updated_on')
+    return _combine(scopes, [row async for row in rows])
+
+
+def bump(scope):
+    '''
+    Increment the version of the scope. Inside a `bump_once` block of the
+    same scope the bump is postponed until the block exits.
+    '''
+    pending = getattr(_local, 'pending', None)
+    if pending is not None and scope in pending:
+        return
+
+    updated = CacheVersion.objects.filter(scope=scope).update(
+        version=F('version') + 1,
+        token=uuid.uuid4(),
+        updated_on=timezone.now(),
+    )
+    if not updated:
+        CacheVersion.objects.get_or_create(scope=scope, defaults={'version': 1})
+
+
+@contextmanager
+def bump_once(scope):
+    '''
+    Collapse every bump of the scope issued inside the block into a single
+    bump when the block completes.
+    '''
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = set()
+    if scope in pending:
+        # Nested block, the outermost one bumps.
+        yield
+        return
+
+    pending.add(scope)
+    try:
+        yield
+    finally:
+        pending.discard(scope)
+    bump(scope)
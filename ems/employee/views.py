@@ -1,12 +1,33 @@
-from django.http import JsonResponse, HttpResponseRedirect
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, HttpResponseRedirect, Http404, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.views import View
 from django.urls import reverse
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param
+import hmac
 import json
+import logging
 
 from .models import DynamicFormFields, EmployeeData
 from .forms import EmployeeForm
+from .schema import get_schema, schema_change
+from .events import get_broadcaster, valid_event_id
+from .facets import employee_facets
+from .filters import filter_employees
+from .metrics import registry
+from .ordering import spaced_order
+from .pagination import EmployeeListPagination
+from .rollups import ROLLUP_FIELD_TYPES, field_dimension, rebuild_rollups
+from .routers import prefer_replica
+from .values import rebuild_field_values, typed_values_enabled
 
+logger = logging.getLogger('employee.views')
 
 '''
 Employee form customization view
@@ -15,22 +36,14 @@ class EmployeeFormView(View):
 
     template = "employee/form_config.html"
     form = EmployeeForm
+    update_fields = ['field_label', 'field_type', 'field_is_required', 'field_order', 'extra', 'updated_on']
 
     def get(self, request):
-        dynamic_fields = list(DynamicFormFields.objects.all().order_by('field_order').values())
-
-        # prepare options as list for template convenience
-        for d in dynamic_fields:
-            if d.get('extra') and isinstance(d['extra'], dict):
-                opts = d['extra'].get('options', '')
-                if isinstance(opts, str):
-                    d['options'] = opts
-                elif isinstance(opts, list):
-                    d['options'] = ','.join(opts)
-                else:
-                    d['options'] = ''
-            else:
-                d['options'] = ''
+        # the editor expects options back as a comma separated string
+        dynamic_fields = [
+            dict(field, options=','.join(field['options']))
+            for field in get_schema()
+        ]
 
         contexts = {
             "form": self.form(),
@@ -48,44 +61,82 @@ class EmployeeFormView(View):
             return JsonResponse({"status": "error", "message": "fields missing"}, status=400)
 
         fields = data['fields']
+        current = {field.id: field for field in DynamicFormFields.objects.all()}
 
-        # Process deletions and creates/updates
-        processed_ids = []
+        # Diff the payload against the saved rows
+        delete_ids, to_update, to_create = [], [], []
+        retyped = []
+        saved = []
         for f in fields:
+            fid = f.get('id')
+            if fid is not None:
+                try:
+                    fid = int(fid)
+                except (TypeError, ValueError):
+                    return JsonResponse({"status": "error", "message": "Invalid field id"}, status=400)
 
             #Delete
-            if f.get('deleted') and f.get('id'):
-                DynamicFormFields.objects.filter(id=f['id']).delete()
+            if f.get('deleted'):
+                if fid:
+                    delete_ids.append(fid)
+                saved.append(None)
                 continue
 
-            fid = f.get('id')
             extra = {}
-
             if f.get('options'):
                 # store options as comma-separated string for backward compatibility
                 extra['options'] = f.get('options')
+            try:
+                values = {
+                    'field_label': f.get('label', ''),
+                    'field_type': f.get('field_type', 'text'),
+                    'field_is_required': bool(f.get('required', False)),
+                    'field_order': spaced_order(int(f.get('order', 0))),
+                    'extra': extra,
+                }
+            except (TypeError, ValueError):
+                return JsonResponse({"status": "error", "message": "Invalid field order"}, status=400)
 
-            if fid:
-                # update
-                DynamicFormFields.objects.filter(id=fid).update(
-                    field_label=f.get('label', ''),
-                    field_type=f.get('field_type', 'text'),
-                    field_is_required=bool(f.get('required', False)),
-                    field_order=int(f.get('order', 0)),
-                    extra=extra
-                )
-                processed_ids.append(fid)
-            else:
-                obj = DynamicFormFields.objects.create(
-                    field_label=f.get('label', ''),
-                    field_type=f.get('field_type', 'text'),
-                    field_is_required=bool(f.get('required', False)),
-                    field_order=int(f.get('order', 0)),
-                    extra=extra
-                )
-                processed_ids.append(obj.id)
+            obj = current.get(fid)
+            if fid is None:
+                obj = DynamicFormFields(**values)
+                to_create.append(obj)
+            elif obj is None:
+                # removed by another editor meanwhile, don't bring it back
+                # under a new id
+                return JsonResponse({
+                    "status": "error",
+                    "message": "A field was deleted by someone else, reload the page to see the current form.",
+                }, status=409)
+            elif any(getattr(obj, name) != value for name, value in values.items()):
+                if (obj.field_label, obj.field_type) != (values['field_label'], values['field_type']):
+                    retyped.append(obj)
+                for name, value in values.items():
+                    setattr(obj, name, value)
+                obj.updated_on = timezone.now()
+                to_update.append(obj)
+            saved.append(obj)
+
+        with transaction.atomic(), schema_change():
+            if delete_ids:
+                DynamicFormFields.objects.filter(id__in=delete_ids).delete()
+            if to_update:
+                DynamicFormFields.objects.bulk_update(to_update, self.update_fields)
+            if to_create:
+                DynamicFormFields.objects.bulk_create(to_create)
+            # stored values are found by label and parsed by type, a new
+            # field may take over values left by a deleted one
+            if typed_values_enabled() and (retyped or to_create):
+                rebuild_field_values(retyped + to_create)
+            recount = retyped + [field for field in to_create if field.field_type in ROLLUP_FIELD_TYPES]
+            if recount:
+                rebuild_rollups([field_dimension(field.id) for field in recount])
 
-        return JsonResponse({"status": "success", "message": "Saved Successfully"})
+        return JsonResponse({
+            "status": "success",
+            "message": "Saved Successfully",
+            "ids": [obj.id if obj else None for obj in saved],
+        })
 
 '''
 Employee Creation flow
@@ -101,25 +152,7 @@ class EmployeeCreationView(View):
         return super().dispatch(request, *args, **kwargs)
 
     def get(self, request, pk=None):
-        dynamic_fields_qs = DynamicFormFields.objects.all().order_by('field_order')
-        dynamic_fields = []
-
-        for dyn_field in dynamic_fields_qs:
-            options = dyn_field.extra.get('options', '') if isinstance(dyn_field.extra, dict) else ''
-            opts_list = []
-
-            if isinstance(options, str) and options:
-                opts_list = [o.strip() for o in options.split(',') if o.strip()]
-            elif isinstance(options, list):
-                opts_list = options
-                
-            dynamic_fields.append({
-                'id': dyn_field.id,
-                'field_label': dyn_field.field_label,
-                'field_type': dyn_field.field_type,
-                'field_is_required': dyn_field.field_is_required,
-                'options': opts_list,
-            })
+        dynamic_fields = get_schema().fields
 
         initial = {}
         edit_employee = None
@@ -149,47 +182,67 @@ class EmployeeCreationView(View):
         if data:
             form = self.form(data or None,is_update=self.is_update)
             if form.is_valid():
+                # dynamic field values are validated and saved by the form
                 user, employee = form.save()
-                # save extras
-                extra = {}
-                for key, value in data.items():
-                    if key not in ['username', 'first_name', 'last_name', 'email', 'employee_id', 'password']:
-                        extra[key] = value
-                employee.extra_data = extra
-                employee.save()
 
                 return JsonResponse({"status": "success", "message": "Employee Created/Updated successfully", "id": employee.id})
             else:
                 errors = form.errors.get_json_data()
-                print(errors)
+                logger.info("Employee form rejected: %s", json.dumps(errors))
                 return JsonResponse({"status": "error", "message": "Validation errors", "errors": errors}, status=400)
         return JsonResponse({"status": "error", "message": "No data received"}, status=400)
 
 class EmployeeListView(View):
     template = "employee/employee_list.html"
+    pagination_class = EmployeeListPagination
+
     def get(self, request):
-        filter_args = {}
-        dynamic_fields = DynamicFormFields.objects.values().all()
-        for dyn in dynamic_fields:
-            if request.GET.get(dyn['field_label']):
-                filter_args[f"extra_data__{dyn['field_label']}"] = request.GET[dyn['field_label']]
-            if dyn['field_type'] in ["select","radio"]:
-                dyn["options"] = dyn["extra"].get("options","").split(",")
+        prefer_replica()
+        schema = get_schema()
+
         # server-side search
         employees = EmployeeData.objects.select_related('uid').all()
-        print(filter_args)
-        employees = employees.filter(**filter_args)
+        employees = filter_employees(employees, request.GET, schema)
 
-        # pagination
-        from django.core.paginator import Paginator
-        paginator = Paginator(employees.order_by('-id'), 3)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        # keyset pagination, links keep the current filters
+        paginator = self.pagination_class()
+        try:
+            page = paginator.paginate_queryset(employees, Request(request))
+        except NotFound:
+            raise Http404("Invalid cursor")
 
-                
+        # option counts next to the select/radio filters
+        show_facets = request.GET.get('facets', '') in ('1', 'true', 'on')
+        counts = {}
+        if show_facets:
+            counts = {facet['field']: facet['options'] for facet in employee_facets(request.GET, schema)}
 
-        context = {'page_obj': page_obj, 'employees': page_obj.object_list,'dynamic_fields':dynamic_fields}
+        context = {
+            'employees': page,
+            'next_link': paginator.get_next_link(),
+            'previous_link': paginator.get_previous_link(),
+            'first_link': remove_query_param(request.get_full_path(), paginator.cursor_query_param),
+            'total_count': paginator.count,
+            'count_is_exact': paginator.count_is_exact,
+            'dynamic_fields': self.filter_fields(request, schema, counts),
+            'q': request.GET.get('q', ''),
+            'show_facets': show_facets,
+        }
         return render(request, self.template, context)
+
+    def filter_fields(self, request, schema, counts=None):
+        '''
+        Schema fields with their current filter value and, for select/radio
+        fields, the options with their counts when facets are shown.
+        '''
+        fields = []
+        for field in schema:
+            value = request.GET.get(field['field_label'], '')
+            choices = counts.get(field['field_label']) if counts else None
+            if choices is None:
+                choices = [{'value': option, 'count': None} for option in field['options']]
+            fields.append(dict(field, value=value, choices=choices))
+        return fields
     
     def delete(self,request,pk):
         if pk:
@@ -197,4 +250,44 @@ class EmployeeListView(View):
             if employee:
                 uid = employee.uid
                 uid.delete()
-                return JsonResponse({"status":"success"})
\ No newline at end of file
+                return JsonResponse({"status":"success"})
+
+
+'''
+Server-sent events of employee and form field changes
+'''
+class DirectoryEventsView(View):
+
+    async def get(self, request):
+        # a streaming response would hold a WSGI worker for its whole life
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"status": "error", "message": "Events are served under ASGI only"}, status=501)
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return JsonResponse({"status": "error", "message": "Authentication required"}, status=403)
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        if last_event_id and not valid_event_id(last_event_id):
+            return JsonResponse({"status": "error", "message": "Invalid Last-Event-ID"}, status=400)
+
+        response = StreamingHttpResponse(get_broadcaster().stream(last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+'''
+Request metrics of this process in the Prometheus text format, for staff
+users or a scraper sending `Authorization: Bearer <EMPLOYEE_METRICS_TOKEN>`
+'''
+class MetricsView(View):
+
+    def get(self, request):
+        if not settings.EMPLOYEE_METRICS:
+            raise Http404("Metrics are disabled")
+        token = settings.EMPLOYEE_METRICS_TOKEN
+        authorization = request.headers.get('Authorization', '')
+        scraper = token and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+        if not scraper and not request.user.is_staff:
+            return HttpResponse("Forbidden", status=403, content_type='text/plain')
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
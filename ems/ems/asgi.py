@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ems.settings')
+# Under ASGI every request runs on a thread of its own, so a persistent
+# connection is never reused. Close them after each request, or set
+# DB_POOL=true to reuse connections from a pool.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,99 @@
+'''
+PostgreSQL backend borrowing its connections from a psycopg 3 pool.
+
+Selected with `DB_POOL=true` (see settings.py). Django opens and closes
+connections as usual, but opening takes an idle connection from a
+process-wide `psycopg_pool.ConnectionPool` and closing gives it back, so
+requests skip the TCP/TLS handshake and authentication of a fresh
+connection. Unlike `CONN_MAX_AGE` this also holds under ASGI, where a
+request may run on any thread: connections are only held while in use.
+Requires the `psycopg` and `psycopg-pool` packages.
+'''
+
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import DatabaseCreation as BaseDatabaseCreation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+DEFAULT_POOL = {'MIN_SIZE': 2, 'MAX_SIZE': 10, 'TIMEOUT': 10}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(alias, conn_params, options):
+    target = tuple(conn_params.get(key) for key in ('dbname', 'host', 'port', 'user'))
+    return (alias, *target, tuple(sorted(options.items())))
+
+
+def close_pools(dbname=None):
+    '''
+    Close the pools of one database, all of them by default.
+    '''
+    with _pools_lock:
+        for key in [key for key in _pools if dbname is None or key[1] == dbname]:
+            _pools.pop(key).close()
+
+
+class DatabaseCreation(BaseDatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # idle pooled connections would block DROP DATABASE
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params):
+        # keyed by the target database too, the test runner switches NAME
+        options = {**DEFAULT_POOL, **self.settings_dict.get('POOL', {})}
+        key = _pool_key(self.alias, conn_params, options)
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    pool = _pools[key] = ConnectionPool(
+                        kwargs=conn_params,
+                        min_size=options['MIN_SIZE'],
+                        max_size=options['MAX_SIZE'],
+                        timeout=options['TIMEOUT'],
+                        check=ConnectionPool.check_connection,
+                        name=f"ems-{self.alias}",
+                        open=True,
+                    )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        if not is_psycopg3 or ConnectionPool is None:
+            raise ImproperlyConfigured("DB_POOL requires the psycopg and psycopg-pool packages.")
+
+        # as in the base backend, minus the connect call
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        try:
+            self.isolation_level = IsolationLevel(isolation_level or IsolationLevel.READ_COMMITTED)
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {isolation_level} "
+                f"specified. Use one of the psycopg.IsolationLevel values."
+            )
+        self._pool = self.get_pool(conn_params)
+        connection = self._pool.getconn()
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # rolled back by the pool when left in a transaction
+                return self._pool.putconn(self.connection)
@@ -22,12 +22,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-$)m9a(qc-q%)e94c3mwu7u411c%ry7r2-q25d2=l6^9nbwf16r'
+SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-$)m9a(qc-q%)e94c3mwu7u411c%ry7r2-q25d2=l6^9nbwf16r')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'true').lower() in ('1', 'true', 'yes')
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.getenv('ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third-party packages
     'rest_framework',
@@ -51,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so the timings cover the other middleware too
+    'employee.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -59,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'employee.routers.DatabaseRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'ems.urls'
@@ -86,17 +90,51 @@ WSGI_APPLICATION = 'ems.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds ('none' for ever,
+# 0 to close them after every request) and pinged before reuse when
+# DB_CONN_HEALTH_CHECKS is on. Under ASGI, where a request may run on any
+# thread, prefer DB_POOL: connections come from a psycopg 3 pool shared by
+# the process (needs the psycopg and psycopg-pool packages) and go back to
+# it after each request.
+DB_POOL = os.getenv('DB_POOL', 'false').lower() in ('1', 'true', 'yes')
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '60')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'ems.pooled_postgresql' if DB_POOL else 'django.db.backends.postgresql_psycopg2',
         'NAME': os.getenv('DB_NAME','postgres'),
         'USER': os.getenv('DB_USER','postgres'),
         'PASSWORD': os.getenv('DB_PASSWORD','postgres'),
         'HOST': os.getenv('DB_HOST','db'),
-        'PORT': 5432
+        'PORT': int(os.getenv('DB_PORT', 5432)),
+        'CONN_MAX_AGE': 0 if DB_POOL else None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes'),
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
     }
 }
 
+# Optional streaming replica for directory reads (see employee/routers.py).
+# Connection settings default to the primary's. Clients stay on the primary
+# for DB_REPLICA_STICKY_SECONDS after they wrote.
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': int(os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT'])),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['employee.routers.ReplicaRouter']
+
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -151,6 +189,44 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10
 }
 
+# Employee counts above this many rows are estimated from planner statistics
+EMPLOYEE_EXACT_COUNT_THRESHOLD = int(os.getenv('EMPLOYEE_EXACT_COUNT_THRESHOLD', 10000))
+
+# Keep the typed copy of dynamic field values (employee.EmployeeFieldValue)
+# in sync on writes. Run `rebuild_field_values` after turning it back on.
+EMPLOYEE_TYPED_VALUES = os.getenv('EMPLOYEE_TYPED_VALUES', 'true').lower() in ('1', 'true', 'yes')
+
+# Seconds a facet count stays cached, employee writes invalidate it earlier
+EMPLOYEE_FACET_CACHE_TIMEOUT = int(os.getenv('EMPLOYEE_FACET_CACHE_TIMEOUT', 300))
+
+# Processes hashing passwords of bulk created users, 0 for one per core
+EMPLOYEE_PASSWORD_HASH_WORKERS = int(os.getenv('EMPLOYEE_PASSWORD_HASH_WORKERS', 0))
+
+# Server-sent directory events (served under ASGI only): seconds between
+# change log polls when no notification arrives, between keepalive comments,
+# and before a stream ends so the client reconnects with its Last-Event-ID
+EMPLOYEE_SSE_POLL_INTERVAL = float(os.getenv('EMPLOYEE_SSE_POLL_INTERVAL', 2))
+EMPLOYEE_SSE_KEEPALIVE = float(os.getenv('EMPLOYEE_SSE_KEEPALIVE', 15))
+EMPLOYEE_SSE_MAX_AGE = float(os.getenv('EMPLOYEE_SSE_MAX_AGE', 300))
+
+# Per request query, template and serializer timings in Server-Timing
+# headers, aggregated per URL name at /metrics. Scrapers authenticate with
+# the token, staff users with their session.
+EMPLOYEE_METRICS = os.getenv('EMPLOYEE_METRICS', 'false').lower() in ('1', 'true', 'yes')
+EMPLOYEE_METRICS_TOKEN = os.getenv('EMPLOYEE_METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        # employee.routing logs where each request's queries ran at INFO,
+        # employee.views the rejected form posts, employee.events the
+        # database errors of the server-sent event broadcaster
+        'employee': {'handlers': ['console'], 'level': os.getenv('EMPLOYEE_LOG_LEVEL', 'WARNING')},
+    },
+}
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -159,4 +235,15 @@ SIMPLE_JWT = {
 
 LOGIN_REDIRECT_URL = 'profile'
 LOGOUT_REDIRECT_URL = 'login'
-LOGIN_URL = 'login'
\ No newline at end of file
+LOGIN_URL = 'login'
+
+# Password reset emails, also how imported employees set their first
+# password. The console backend prints them, set EMAIL_BACKEND to
+# django.core.mail.backends.smtp.EmailBackend and EMAIL_HOST to send them.
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'false').lower() in ('1', 'true', 'yes')
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'webmaster@localhost')